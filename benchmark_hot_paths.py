@@ -0,0 +1,466 @@
+#!/usr/bin/env python3
+"""
+Hot Path Benchmarks - Throughput, latency and allocations of the PC-side receive paths
+
+Each benchmark runs one unit of work (a receive chunk, a datagram, a frame)
+many times on synthetic data and reports items/s, MB/s, per-item latency
+percentiles and tracemalloc allocations per item. Results are written as
+JSON and can be compared against a stored baseline; a throughput drop, p99
+rise or allocation growth beyond the thresholds is flagged as a regression
+(exit status 1).
+"""
+
+import json
+import os
+import platform
+import socket
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+from depth_codecs import DELTA_ZLIB, DepthDecoder, encode_pixels
+from depth_receiver import DepthStreamReceiver, DepthFrame, DEPTH_HEADER, FRAME_SIZE_PREFIX
+from h264_analyzer import H264StreamAnalyzer
+from imu_preintegration import IMUProcessor
+from imu_protocol import decode_datagram, encode_binary, encode_json, MAX_SAMPLES_PER_DATAGRAM
+from imu_ring import IMURing
+from imu_telemetry import IMULinkTelemetry
+from point_cloud import Deprojector
+from session_recorder import SessionRecorder
+from stream_scanner import H264AccessUnitScanner, LengthPrefixedFrameScanner
+from synthetic_data import SyntheticDepth, SyntheticH264, SyntheticIMU
+
+CHUNK_SIZE = 65536  # what the stream engine asks recv_into for
+
+# Default regression thresholds (fractions of the baseline)
+THROUGHPUT_DROP = 0.15
+LATENCY_RISE = 0.30
+ALLOC_RISE = 0.25
+ALLOC_SLACK_BYTES = 256  # ignore allocation changes smaller than this per item
+
+
+class Benchmark:
+    """One benchmark: setup() builds the data, step(i) processes item i"""
+
+    name = None
+    unit = 'item'
+
+    def __init__(self, config):
+        self.config = config
+        self.items = config['items'].get(self.name, 1000)
+        self.bytes_per_item = 0.0
+
+    def setup(self):
+        pass
+
+    def step(self, i):
+        raise NotImplementedError
+
+    def teardown(self):
+        pass
+
+
+class H264ScanBenchmark(Benchmark):
+    """Stream engine path: one 64KB receive chunk through the access-unit scanner"""
+
+    name = 'h264_scan'
+    unit = 'chunk'
+
+    def setup(self):
+        c = self.config
+        synthetic = SyntheticH264(c['width'], c['height'], c['fps'], c['bitrate'], c['gop'])
+        stream = synthetic.stream(4 * c['gop'])
+        self.chunks = [memoryview(stream)[i:i + CHUNK_SIZE] for i in range(0, len(stream), CHUNK_SIZE)]
+        self.frames_per_byte = 4 * c['gop'] / len(stream)
+        self.bytes_per_item = len(stream) / len(self.chunks)
+        self.scanner = H264AccessUnitScanner(CHUNK_SIZE)
+
+    def step(self, i):
+        self.scanner.feed(self.chunks[i % len(self.chunks)])
+
+
+class H264AnalyzeBenchmark(H264ScanBenchmark):
+    """Same chunks through the analyzer the monitor runs on 5000-5002 (NAL types, GOP, frame sizes)"""
+
+    name = 'h264_analyze'
+
+    def setup(self):
+        super().setup()
+        self.scanner = H264StreamAnalyzer(CHUNK_SIZE)
+
+
+class DepthScanBenchmark(Benchmark):
+    """Stream engine path on 5003: 64KB chunks through the length-prefix scanner"""
+
+    name = 'depth_scan'
+    unit = 'chunk'
+
+    def setup(self):
+        c = self.config
+        frames = [frame_bytes(frame) for frame in SyntheticDepth(c['width'], c['height'], pool_size=2).frames]
+        stream = b''.join(frames)
+        self.chunks = [memoryview(stream)[i:i + CHUNK_SIZE] for i in range(0, len(stream), CHUNK_SIZE)]
+        self.bytes_per_item = len(stream) / len(self.chunks)
+        self.scanner = LengthPrefixedFrameScanner(CHUNK_SIZE)
+
+    def step(self, i):
+        self.scanner.feed(self.chunks[i % len(self.chunks)])
+
+
+class IMUDecodeBenchmark(Benchmark):
+    """IMUHub.receive_loop body: decode, ring append, link telemetry"""
+
+    unit = 'datagram'
+    fmt = 'binary'
+
+    def setup(self):
+        c = self.config
+        samples = SyntheticIMU(c['imu_rate']).samples(0, 4096)
+        if self.fmt == 'json':
+            self.datagrams = [encode_json(sample) for sample in samples]
+        else:
+            batch = c['imu_batch']
+            self.datagrams = [encode_binary(seq, samples[start:start + batch])
+                              for seq, start in enumerate(range(0, len(samples) - batch + 1, batch))]
+        self.bytes_per_item = float(np.mean([len(d) for d in self.datagrams]))
+        self.ring = IMURing()
+        self.telemetry = IMULinkTelemetry()
+
+    def step(self, i):
+        batch = decode_datagram(self.datagrams[i % len(self.datagrams)])
+        now = time.time()
+        self.ring.append(batch.samples, now)
+        self.telemetry.on_batch(batch.seq, batch.samples, now)
+
+
+class IMUDecodeBinaryBenchmark(IMUDecodeBenchmark):
+    name = 'imu_decode_binary'
+
+
+class IMUDecodeJSONBenchmark(IMUDecodeBenchmark):
+    name = 'imu_decode_json'
+    fmt = 'json'
+
+
+class IMUPreintegrationBenchmark(Benchmark):
+    """IMUProcessor on one datagram-sized batch: bias estimate and orientation filter per 32-sample chunk"""
+
+    name = 'imu_preintegration'
+    unit = 'batch'
+
+    def setup(self):
+        c = self.config
+        batch = c['imu_batch']
+        self.samples = SyntheticIMU(c['imu_rate']).samples(0, 4096)
+        self.batches = [self.samples[start:start + batch] for start in range(0, len(self.samples) - batch + 1, batch)]
+        self.bytes_per_item = float(self.batches[0].nbytes)
+        self.processor = IMUProcessor()
+        self.period = batch / c['imu_rate']
+
+    def step(self, i):
+        # Sensor time keeps increasing across passes over the batches
+        batch = self.batches[i % len(self.batches)].copy()
+        batch[:, 0] += (i // len(self.batches)) * len(self.batches) * self.period
+        self.processor.add(batch)
+
+
+class DepthReceiveBenchmark(Benchmark):
+    """DepthStreamReceiver.receive_frame over a local socket pair (feeder thread sends)"""
+
+    name = 'depth_receive'
+    unit = 'frame'
+
+    def setup(self):
+        c = self.config
+        self.payloads = [frame_bytes(frame) for frame in SyntheticDepth(c['width'], c['height'], pool_size=2).frames]
+        self.bytes_per_item = float(len(self.payloads[0]))
+        send_sock, recv_sock = socket.socketpair()
+        self.send_sock = send_sock
+        self.receiver = DepthStreamReceiver('127.0.0.1')  # socket replaced below, never connects
+        self.receiver.sock = recv_sock
+        self.receiver.running = True
+        # Warmup runs too, so send enough for every step() call
+        total = self.items + self.config['warmup'] + self.config['alloc_items']
+        self.feeder = threading.Thread(target=self.feed, args=(total,), daemon=True)
+        self.feeder.start()
+
+    def feed(self, count):
+        try:
+            for n in range(count):
+                self.send_sock.sendall(self.payloads[n % len(self.payloads)])
+        except OSError:
+            pass
+
+    def step(self, i):
+        if self.receiver.receive_frame() is None:
+            raise RuntimeError("Depth feeder ended early")
+
+    def teardown(self):
+        self.send_sock.close()
+        self.receiver.close()
+
+
+class DepthDecodeBenchmark(Benchmark):
+    """DepthDecoder.decode of delta-zlib payloads into a reused frame array"""
+
+    name = 'depth_decode_zlib'
+    unit = 'frame'
+
+    def setup(self):
+        c = self.config
+        frames = SyntheticDepth(c['width'], c['height'], pool_size=4).frames
+        self.payloads = [encode_pixels(frame, DELTA_ZLIB) for frame in frames]
+        self.bytes_per_item = float(frames[0].nbytes)
+        self.out = np.empty_like(frames[0])
+        self.decoder = DepthDecoder()
+
+    def step(self, i):
+        self.decoder.decode(DELTA_ZLIB, self.payloads[i % len(self.payloads)], self.out)
+
+
+class PointCloudBenchmark(Benchmark):
+    """Deprojector.deproject of a full-resolution frame (cached rays, reused output)"""
+
+    name = 'point_cloud'
+    unit = 'frame'
+
+    def setup(self):
+        c = self.config
+        self.frames = SyntheticDepth(c['width'], c['height'], pool_size=4).frames
+        self.bytes_per_item = float(self.frames[0].nbytes)
+        self.deprojector = Deprojector()
+        self.deprojector.deproject(self.frames[0])
+
+    def step(self, i):
+        self.deprojector.deproject(self.frames[i % len(self.frames)])
+
+
+class DepthColorizeBenchmark(Benchmark):
+    """DepthViewer render path: uint16 -> BGRA lookup with range tracking"""
+
+    name = 'depth_colorize'
+    unit = 'frame'
+
+    def setup(self):
+        # OpenCV is only needed for this benchmark
+        from depth_viewer import DepthColorizer
+        c = self.config
+        self.frames = SyntheticDepth(c['width'], c['height'], pool_size=4).frames
+        self.bytes_per_item = float(self.frames[0].nbytes)
+        self.colorizer = DepthColorizer()
+
+    def step(self, i):
+        self.colorizer.colorize(self.frames[i % len(self.frames)])
+
+
+class DepthRecordBenchmark(Benchmark):
+    """SessionRecorder.write_depth (receive-thread side) with the writer thread draining to disk"""
+
+    name = 'depth_record'
+    unit = 'frame'
+
+    def setup(self):
+        c = self.config
+        frame = SyntheticDepth(c['width'], c['height'], pool_size=1).frames[0]
+        raw = memoryview(frame_bytes(frame))[FRAME_SIZE_PREFIX.size:]
+        self.frame = DepthFrame(1, c['width'], c['height'], 2, 0, frame, raw)
+        self.bytes_per_item = float(len(raw))
+        self.directory = tempfile.mkdtemp(prefix='bench_rec_')
+        self.recorder = SessionRecorder(self.directory)
+
+    def step(self, i):
+        while not self.recorder.free_buffers:
+            # Pool empty: the disk is the bottleneck, so the sustained rate is the disk's
+            time.sleep(0.0005)
+        self.recorder.write_depth(self.frame)
+
+    def teardown(self):
+        self.recorder.close()
+        for filename in os.listdir(self.directory):
+            os.remove(os.path.join(self.directory, filename))
+        os.rmdir(self.directory)
+
+
+BENCHMARKS = [H264ScanBenchmark, H264AnalyzeBenchmark, DepthScanBenchmark, IMUDecodeBinaryBenchmark,
+              IMUDecodeJSONBenchmark, IMUPreintegrationBenchmark, DepthReceiveBenchmark, DepthDecodeBenchmark,
+              PointCloudBenchmark, DepthColorizeBenchmark, DepthRecordBenchmark]
+
+DEFAULT_ITEMS = {
+    'h264_scan': 20000, 'h264_analyze': 20000, 'depth_scan': 20000, 'imu_decode_binary': 50000, 'imu_decode_json': 50000,
+    'imu_preintegration': 5000, 'depth_receive': 600, 'depth_decode_zlib': 200, 'point_cloud': 200, 'depth_colorize': 300, 'depth_record': 300,
+}
+
+
+def frame_bytes(depth):
+    """One depth frame exactly as sent on 5003"""
+    height, width = depth.shape
+    return (FRAME_SIZE_PREFIX.pack(DEPTH_HEADER.size + depth.nbytes) +
+            DEPTH_HEADER.pack(width, height, 2, 0) + depth.tobytes())
+
+
+def run_benchmark(bench):
+    """Timed pass (perf_counter_ns per item), then a shorter tracemalloc pass"""
+    config = bench.config
+    bench.setup()
+    try:
+        for i in range(config['warmup']):
+            bench.step(i)
+
+        latencies = np.empty(bench.items, dtype=np.int64)
+        clock = time.perf_counter_ns
+        start = clock()
+        for i in range(bench.items):
+            t = clock()
+            bench.step(i)
+            latencies[i] = clock() - t
+        elapsed = (clock() - start) / 1e9
+
+        alloc_items = config['alloc_items']
+        peaks = np.empty(alloc_items, dtype=np.int64)
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        for i in range(alloc_items):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            bench.step(i)
+            peaks[i] = tracemalloc.get_traced_memory()[1] - before
+        retained = tracemalloc.get_traced_memory()[0] - baseline
+        tracemalloc.stop()
+    finally:
+        bench.teardown()
+
+    p50, p95, p99 = np.percentile(latencies, (50, 95, 99)) / 1000.0
+    result = {
+        'unit': bench.unit,
+        'items': bench.items,
+        'seconds': elapsed,
+        'items_per_s': bench.items / elapsed,
+        'mb_per_s': bench.items * bench.bytes_per_item / elapsed / 1e6,
+        'p50_us': p50,
+        'p95_us': p95,
+        'p99_us': p99,
+        'alloc_peak_bytes': float(peaks.mean()) if alloc_items else 0.0,
+        'alloc_retained_bytes': retained / alloc_items if alloc_items else 0.0,
+    }
+    if isinstance(bench, H264ScanBenchmark):
+        result['frames_per_s'] = result['mb_per_s'] * 1e6 * bench.frames_per_byte
+    return result
+
+
+def compare(results, baseline, throughput_drop=THROUGHPUT_DROP, latency_rise=LATENCY_RISE, alloc_rise=ALLOC_RISE):
+    """List of (benchmark, message) regressions of results against baseline"""
+    regressions = []
+    for name, current in results['benchmarks'].items():
+        old = baseline.get('benchmarks', {}).get(name)
+        if old is None:
+            continue
+        if current['items_per_s'] < old['items_per_s'] * (1 - throughput_drop):
+            regressions.append((name, f"throughput {current['items_per_s']:.0f}/s vs "
+                                      f"{old['items_per_s']:.0f}/s baseline"))
+        if current['p99_us'] > old['p99_us'] * (1 + latency_rise):
+            regressions.append((name, f"p99 {current['p99_us']:.1f}us vs {old['p99_us']:.1f}us baseline"))
+        limit = old['alloc_peak_bytes'] * (1 + alloc_rise) + ALLOC_SLACK_BYTES
+        if current['alloc_peak_bytes'] > limit:
+            regressions.append((name, f"allocations {current['alloc_peak_bytes']:.0f}B/{current['unit']} vs "
+                                      f"{old['alloc_peak_bytes']:.0f}B baseline"))
+    return regressions
+
+
+def print_results(results, baseline=None):
+    print(f"{'benchmark':18s} {'items/s':>12s} {'MB/s':>9s} {'p50 us':>9s} {'p95 us':>9s} "
+          f"{'p99 us':>9s} {'alloc B':>9s} {'vs base':>8s}")
+    for name, r in results['benchmarks'].items():
+        change = ''
+        old = (baseline or {}).get('benchmarks', {}).get(name)
+        if old:
+            change = f"{(r['items_per_s'] / old['items_per_s'] - 1) * 100:+.1f}%"
+        print(f"{name:18s} {r['items_per_s']:12.0f} {r['mb_per_s']:9.1f} {r['p50_us']:9.1f} {r['p95_us']:9.1f} "
+              f"{r['p99_us']:9.1f} {r['alloc_peak_bytes']:9.0f} {change:>8s}")
+
+
+def run_all(config, only=None):
+    results = {
+        'meta': {
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+            'config': {k: v for k, v in config.items() if k != 'items'},
+        },
+        'benchmarks': {},
+    }
+    for cls in BENCHMARKS:
+        if only and cls.name not in only:
+            continue
+        print(f"⏱  {cls.name}...", flush=True)
+        try:
+            results['benchmarks'][cls.name] = run_benchmark(cls(config))
+        except ImportError as e:
+            print(f"   skipped ({e})")
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='PC hot path benchmarks with baseline regression check')
+    parser.add_argument('--out', default='benchmark_results.json', help='Results file (default: benchmark_results.json)')
+    parser.add_argument('--baseline', help='Compare against this results file and flag regressions')
+    parser.add_argument('--save-baseline', metavar='FILE', help='Also write the results to FILE as the new baseline')
+    parser.add_argument('--only', action='append', help='Run only this benchmark (repeatable)')
+    parser.add_argument('--quick', action='store_true', help='10x fewer items (smoke test)')
+    parser.add_argument('--size', default='1280x720', help='Frame size (default: 1280x720)')
+    parser.add_argument('--fps', type=float, default=30.0, help='H.264 frame rate (default: 30)')
+    parser.add_argument('--bitrate', type=int, default=3000000, help='H.264 bitrate (default: 3000000)')
+    parser.add_argument('--gop', type=int, default=30, help='H.264 GOP length (default: 30)')
+    parser.add_argument('--imu-rate', type=float, default=200.0, help='IMU sample rate (default: 200)')
+    parser.add_argument('--imu-batch', type=int, default=8, help='Samples per binary IMU datagram (default: 8)')
+    parser.add_argument('--throughput-drop', type=float, default=THROUGHPUT_DROP,
+                        help=f'Allowed throughput drop vs baseline (default: {THROUGHPUT_DROP})')
+    parser.add_argument('--latency-rise', type=float, default=LATENCY_RISE,
+                        help=f'Allowed p99 rise vs baseline (default: {LATENCY_RISE})')
+    parser.add_argument('--alloc-rise', type=float, default=ALLOC_RISE,
+                        help=f'Allowed allocation growth vs baseline (default: {ALLOC_RISE})')
+
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.lower().split('x'))
+    scale = 10 if args.quick else 1
+    config = {
+        'width': width, 'height': height, 'fps': args.fps, 'bitrate': args.bitrate, 'gop': args.gop,
+        'imu_rate': args.imu_rate, 'imu_batch': min(args.imu_batch, MAX_SAMPLES_PER_DATAGRAM),
+        'items': {name: max(count // scale, 10) for name, count in DEFAULT_ITEMS.items()},
+        'warmup': 20, 'alloc_items': 50,
+    }
+
+    results = run_all(config, args.only)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    print()
+    print_results(results, baseline)
+
+    with open(args.out, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Results written to {args.out}")
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Baseline written to {args.save_baseline}")
+
+    if baseline:
+        regressions = compare(results, baseline, args.throughput_drop, args.latency_rise, args.alloc_rise)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s):")
+            for name, message in regressions:
+                print(f"   {name}: {message}")
+            sys.exit(1)
+        print("\n✅ No regressions against baseline")
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Clock Sync - Pi/PC clock offset and drift, and true one-way latency per depth
+frame and IMU sample
+
+Depth timestamp_us and IMU timestamps are in the device clock. ClockSync
+sends NTP-style CLOCK_PROBE datagrams on the IMU port (5004) and keeps the
+exchanges with the smallest round trip (queueing only ever adds delay), then
+fits offset + drift to them, so device times map onto the PC clock with an
+error bound of half the best RTT.
+
+Devices that do not answer probes fall back to PassiveClock: a lower
+envelope over (arrival - device time), which tracks drift exactly but only
+knows the offset up to the fastest delivery, so its latencies are "above
+best case" rather than absolute.
+
+PC times are time.monotonic() seconds throughout.
+"""
+
+import socket
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from depth_receiver import DepthStreamReceiver
+from device_config import add_device_arguments, apply_device
+from imu_protocol import (CLOCK_REPLY_MAGIC, decode_clock_reply, decode_datagram,
+                          encode_clock_probe, register_imu)
+from log_histogram import LogHistogram
+
+# Unanswered probes before falling back to the passive estimate
+PROBES_BEFORE_FALLBACK = 20
+
+
+class ClockSync:
+    """
+    Offset/drift from probe exchanges: device_time = pc_time + offset(pc_time),
+    offset(pc) = intercept + skew * (pc - reference). The model tuple is
+    replaced as a whole, so other threads can convert times without a lock.
+    """
+
+    def __init__(self, window=256, best_fraction=0.25, min_exchanges=8, min_fit_span=2.0):
+        self.exchanges = deque(maxlen=window)  # (pc midpoint, offset, delay)
+        self.best_fraction = best_fraction
+        self.min_exchanges = min_exchanges
+        self.min_fit_span = min_fit_span
+
+        self.model = None   # (reference, intercept, skew)
+        self.min_delay = None
+        self.error = None   # offset error bound: half the best round trip
+
+    @property
+    def valid(self):
+        return self.model is not None
+
+    def add_exchange(self, t1, t2, t3, t4):
+        """t1/t4: PC send/receive, t2/t3: device receive/send"""
+        delay = (t4 - t1) - (t3 - t2)
+        offset = ((t2 - t1) + (t3 - t4)) / 2
+        if delay < 0:
+            return
+        self.exchanges.append(((t1 + t4) / 2, offset, delay))
+        if len(self.exchanges) >= self.min_exchanges:
+            self.update()
+
+    def update(self):
+        data = np.array(self.exchanges)
+        times, offsets, delays = data[:, 0], data[:, 1], data[:, 2]
+
+        # Min-RTT filtering: only the least-queued exchanges carry a clean offset
+        keep = delays <= np.quantile(delays, self.best_fraction)
+        times, offsets, delays = times[keep], offsets[keep], delays[keep]
+
+        reference = float(times[-1])
+        if len(times) >= 3 and times[-1] - times[0] >= self.min_fit_span:
+            skew, intercept = np.polyfit(times - reference, offsets, 1)
+        else:
+            skew, intercept = 0.0, offsets[np.argmin(delays)]
+        self.min_delay = float(delays.min())
+        self.error = self.min_delay / 2
+        self.model = (reference, float(intercept), float(skew))
+
+    def to_pc(self, device_time):
+        """PC monotonic time corresponding to device time(s)"""
+        reference, intercept, skew = self.model
+        # device = pc + intercept + skew * (pc - reference), solved for pc
+        return (np.asarray(device_time) - intercept + skew * reference) / (1 + skew)
+
+    def offset(self):
+        return self.model[1] if self.model else None
+
+    def skew_ppm(self):
+        return self.model[2] * 1e6 if self.model else None
+
+    def describe(self):
+        if not self.model:
+            return "waiting for probe replies"
+        return (f"offset {self.offset():+.6f}s | drift {self.skew_ppm():+.1f} ppm | "
+                f"min RTT {self.min_delay * 1000:.2f} ms (±{self.error * 1000:.2f} ms)")
+
+
+class PassiveClock:
+    """
+    Lower-envelope regression of d = arrival - device_time (= latency -
+    offset): the fastest delivery per bucket traces the clock line, the rest
+    only adds delay. Latencies it produces are relative to that best case.
+    """
+
+    def __init__(self, bucket=1.0, window=300, min_buckets=3):
+        self.bucket = bucket
+        self.buckets = deque(maxlen=window)  # (pc time of the minimum, minimum d)
+        self.min_buckets = min_buckets
+        self.current = None  # [bucket start, pc time, minimum d]
+        self.model = None    # (reference, intercept, slope) of d(pc)
+
+    @property
+    def valid(self):
+        return self.model is not None
+
+    def add(self, device_times, arrival):
+        """Device times of data that arrived at PC time arrival"""
+        d = arrival - float(np.max(device_times))  # newest sample bounds the delivery delay
+        if self.current is None or arrival - self.current[0] >= self.bucket:
+            if self.current is not None:
+                self.buckets.append((self.current[1], self.current[2]))
+                self.update()
+            self.current = [arrival, arrival, d]
+        elif d < self.current[2]:
+            self.current[1], self.current[2] = arrival, d
+
+    def update(self):
+        if len(self.buckets) < self.min_buckets:
+            return
+        data = np.array(self.buckets)
+        times, minima = data[:, 0], data[:, 1]
+        reference = float(times[-1])
+        slope, intercept = np.polyfit(times - reference, minima, 1)
+        # Shift down onto the envelope: no bucket minimum below the line
+        intercept += float((minima - (intercept + slope * (times - reference))).min())
+        self.model = (reference, float(intercept), float(slope))
+
+    def to_pc(self, device_time):
+        """PC time at which device time(s) would arrive on the fastest path"""
+        reference, intercept, slope = self.model
+        # pc = device + intercept + slope * (pc - reference), solved for pc
+        return (np.asarray(device_time) + intercept - slope * reference) / (1 - slope)
+
+    def describe(self):
+        if not self.model:
+            return "passive: collecting arrivals"
+        return f"passive (no CLOCK_REPLY): drift {-self.model[2] * 1e6:+.1f} ppm | latencies relative to best case"
+
+
+class LatencyStats:
+    """One-way latency histogram (seconds) for one stream, plus a per-report window"""
+
+    def __init__(self, name):
+        self.name = name
+        self.total = LogHistogram(min_value=1e-5, max_value=10.0)
+        self.window = LogHistogram(min_value=1e-5, max_value=10.0)
+        self.negative = 0  # device time after arrival: clock estimate still off
+
+    def record(self, latencies):
+        latencies = np.atleast_1d(latencies)
+        negative = latencies < 0
+        if negative.any():
+            self.negative += int(negative.sum())
+            latencies = latencies[~negative]
+        self.total.record_many(latencies)
+        self.window.record_many(latencies)
+
+    def describe(self, histogram=None):
+        histogram = histogram or self.window
+        if not histogram.count:
+            return f"{self.name} -"
+        p50, p95, p99 = (v * 1000 for v in histogram.percentiles())
+        return f"{self.name} p50 {p50:.1f} p95 {p95:.1f} p99 {p99:.1f} ms (n={histogram.count})"
+
+
+class LatencyMonitor:
+    """
+    Probes the device clock over the IMU socket and turns depth/IMU arrival
+    times into one-way latencies. IMU and depth run on their own threads.
+    """
+
+    def __init__(self, pi_ip, depth_port=5003, imu_port=5004, probe_interval=0.2, passive=False):
+        self.pi_ip = pi_ip
+        self.depth_port = depth_port
+        self.imu_port = imu_port
+        self.probe_interval = probe_interval
+        self.passive_only = passive
+
+        self.clock = ClockSync()
+        self.passive = PassiveClock()
+        self.depth = LatencyStats('Depth')
+        self.imu = LatencyStats('IMU')
+        self.probes_sent = 0
+        self.replies = 0
+
+        self.running = threading.Event()
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.settimeout(1.0)
+        self.receiver = None
+
+    def active_clock(self):
+        """ClockSync once it has replies, PassiveClock if the device never answers"""
+        if self.clock.valid:
+            return self.clock
+        if self.passive_only or (self.probes_sent >= PROBES_BEFORE_FALLBACK and not self.replies):
+            return self.passive if self.passive.valid else None
+        return None
+
+    def probe_loop(self):
+        seq = 0
+        while self.running.is_set():
+            try:
+                self.sock.sendto(encode_clock_probe(seq, time.monotonic()), (self.pi_ip, self.imu_port))
+            except OSError:
+                break
+            seq += 1
+            self.probes_sent += 1
+            time.sleep(self.probe_interval)
+
+    def imu_loop(self):
+        recv_buffer = bytearray(65535)
+        recv_view = memoryview(recv_buffer)
+        while self.running.is_set():
+            try:
+                nbytes = self.sock.recv_into(recv_view)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            arrival = time.monotonic()
+            data = recv_view[:nbytes]
+            if data[:4] == CLOCK_REPLY_MAGIC:
+                try:
+                    _, t1, t2, t3 = decode_clock_reply(data)
+                except ValueError:
+                    continue
+                self.replies += 1
+                self.clock.add_exchange(t1, t2, t3, arrival)
+                continue
+            try:
+                batch = decode_datagram(data)
+            except ValueError:
+                continue
+            device_times = batch.samples[:, 0]
+            self.passive.add(device_times, arrival)
+            clock = self.active_clock()
+            if clock is not None:
+                self.imu.record(arrival - clock.to_pc(device_times))
+
+    def depth_loop(self):
+        try:
+            self.receiver.connect()
+            for frame in self.receiver.frames():
+                arrival = time.monotonic()
+                clock = self.active_clock()
+                if clock is not None:
+                    self.depth.record(arrival - clock.to_pc(frame.timestamp_us / 1e6))
+                if not self.running.is_set():
+                    break
+        except Exception as e:
+            print(f"❌ Depth error: {e}")
+
+    def run(self, duration=0, depth=True):
+        if not register_imu(self.sock, self.pi_ip, self.imu_port):
+            print(f"❌ No response from IMU server at {self.pi_ip}:{self.imu_port}")
+            return
+        self.running.set()
+        threads = [threading.Thread(target=self.imu_loop, daemon=True)]
+        if not self.passive_only:
+            threads.append(threading.Thread(target=self.probe_loop, daemon=True))
+        if depth:
+            self.receiver = DepthStreamReceiver(pi_ip=self.pi_ip, port=self.depth_port)
+            threads.append(threading.Thread(target=self.depth_loop, daemon=True))
+        for thread in threads:
+            thread.start()
+
+        print(f"✅ Measuring latency from {self.pi_ip} (Ctrl+C to stop)")
+        start = time.monotonic()
+        try:
+            while not duration or time.monotonic() - start < duration:
+                time.sleep(1.0)
+                clock = self.active_clock()
+                state = clock.describe() if clock is not None else self.clock.describe()
+                print(f"Clock: {state}")
+                print(f"       {self.depth.describe()} | {self.imu.describe()}")
+                self.depth.window.reset()
+                self.imu.window.reset()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.running.clear()
+            self.sock.close()
+            if self.receiver is not None:
+                self.receiver.close()
+            self.print_summary()
+
+    def print_summary(self):
+        print("")
+        print("Latency over the whole run:")
+        for stats in (self.depth, self.imu):
+            line = stats.describe(stats.total)
+            if stats.total.count:
+                line += f" | min {stats.total.min * 1000:.2f} max {stats.total.max * 1000:.1f} ms"
+            if stats.negative:
+                line += f" | {stats.negative} negative (clock error)"
+            print(f"  {line}")
+        clock = self.active_clock()
+        print(f"  Clock: {clock.describe() if clock is not None else 'no estimate'}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Pi/PC clock sync and end-to-end depth/IMU latency')
+    ports = (('--depth-port', 'depth'), ('--imu-port', 'imu'))
+    add_device_arguments(parser, ports=ports)
+    parser.add_argument('--interval', type=float, default=0.2, help='Seconds between clock probes (default: 0.2)')
+    parser.add_argument('--passive', action='store_true', help='No probes: lower-envelope estimate from IMU arrivals')
+    parser.add_argument('--no-depth', action='store_true', help='IMU latency only')
+    parser.add_argument('--duration', type=float, default=0, help='Stop after N seconds (default: run until Ctrl+C)')
+
+    args = parser.parse_args()
+    apply_device(args, ports[1:] if args.no_depth else ports)
+
+    monitor = LatencyMonitor(args.ip, args.depth_port, args.imu_port, args.interval, args.passive)
+    monitor.run(args.duration, depth=not args.no_depth)
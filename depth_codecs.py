@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Depth Codecs - Lossless depth payload codecs for the port 5003 stream
+
+The codec id travels in the upper bits of the '>IIIQ' header's itemsize
+field (itemsize & 0xFF is still the pixel size), so every frame says how it
+is encoded and a server can switch codecs between frames. Frames from a
+server that never heard a codec request are raw, and old receivers reject
+compressed frames as a bad header instead of misreading them.
+
+Negotiation: right after connecting, the receiver sends one line
+    DEPTH_CODECS delta-lz4,delta-zlib,raw\n
+in order of preference; the server uses the first one it supports.
+
+delta-* codecs: each row is replaced by zigzag-coded differences to its left
+neighbour (small unsigned residuals: depth is smooth along a row), then
+compressed. png16 leaves filtering to PNG itself.
+"""
+
+import zlib
+
+import numpy as np
+
+try:
+    import lz4.block
+except ImportError:
+    lz4 = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+RAW, DELTA_ZLIB, DELTA_LZ4, DELTA_ZSTD, PNG16 = range(5)
+CODEC_NAMES = {RAW: 'raw', DELTA_ZLIB: 'delta-zlib', DELTA_LZ4: 'delta-lz4', DELTA_ZSTD: 'delta-zstd', PNG16: 'png16'}
+CODEC_IDS = {name: codec for codec, name in CODEC_NAMES.items()}
+
+CODEC_SHIFT = 8
+ITEMSIZE_MASK = (1 << CODEC_SHIFT) - 1
+
+NEGOTIATION_PREFIX = b'DEPTH_CODECS '
+# Fastest to decode first: what a receiver offers when asked for "auto"
+PREFERENCE = ('delta-lz4', 'delta-zstd', 'delta-zlib', 'raw')
+
+SIGNED = {1: np.int8, 2: np.int16, 4: np.int32}
+
+
+def available_codecs():
+    """Names of the codecs whose libraries are installed"""
+    missing = {DELTA_LZ4: lz4, DELTA_ZSTD: zstandard, PNG16: cv2}
+    return [name for codec, name in CODEC_NAMES.items() if missing.get(codec, True) is not None]
+
+
+def resolve_codecs(spec):
+    """'auto' or 'a,b,c' -> list of available codec names in order (ValueError for unknown names)"""
+    if spec == 'auto':
+        available = available_codecs()
+        return [name for name in PREFERENCE if name in available]
+    names = []
+    available = available_codecs()
+    for name in (name.strip() for name in spec.split(',')):
+        if not name:
+            continue
+        if name not in CODEC_IDS:
+            raise ValueError(f"Unknown depth codec '{name}' (known: {', '.join(CODEC_IDS)})")
+        if name in available:
+            names.append(name)
+        else:
+            print(f"⚠️  Depth codec '{name}' needs a library that is not installed - not offered")
+    return names
+
+
+def pack_itemsize(itemsize, codec):
+    return (codec << CODEC_SHIFT) | itemsize
+
+
+def unpack_itemsize(value):
+    """Header itemsize field -> (itemsize, codec)"""
+    return value & ITEMSIZE_MASK, value >> CODEC_SHIFT
+
+
+def negotiation_message(names):
+    return NEGOTIATION_PREFIX + ','.join(names).encode() + b'\n'
+
+
+def parse_negotiation(data):
+    """Offered codec names from a DEPTH_CODECS line, or None if data is not one"""
+    data = bytes(data)
+    if not data.startswith(NEGOTIATION_PREFIX):
+        return None
+    line = data[len(NEGOTIATION_PREFIX):].split(b'\n', 1)[0]
+    return [name.strip() for name in line.decode(errors='replace').split(',') if name.strip()]
+
+
+def choose_codec(offered, supported):
+    """Id of the first offered codec the server supports (raw if none)"""
+    for name in offered:
+        if name in supported and name in CODEC_IDS:
+            return CODEC_IDS[name]
+    return RAW
+
+
+def zigzag_row_delta(pixels):
+    """(H, W) unsigned pixels -> zigzag-coded left-neighbour residuals, same dtype"""
+    signed = SIGNED[pixels.itemsize]
+    residual = np.empty_like(pixels)
+    residual[:, 0] = pixels[:, 0]
+    np.subtract(pixels[:, 1:], pixels[:, :-1], out=residual[:, 1:])  # wraps modulo 2^bits
+    value = residual.view(signed)
+    bits = pixels.itemsize * 8
+    return ((value << 1) ^ (value >> (bits - 1))).view(pixels.dtype)
+
+
+def undo_zigzag_row_delta(residual, out, scratch):
+    """Inverse of zigzag_row_delta written into out; scratch is an array like out"""
+    np.bitwise_and(residual, 1, out=scratch)
+    np.negative(scratch, out=scratch)  # 0 -> 0, 1 -> all ones
+    np.right_shift(residual, 1, out=out)
+    np.bitwise_xor(out, scratch, out=out)
+    np.cumsum(out, axis=1, dtype=out.dtype, out=out)  # wraps back modulo 2^bits
+
+
+def encode_pixels(pixels, codec, level=None):
+    """Reference encoder: (H, W) unsigned pixels -> payload bytes for codec"""
+    pixels = np.ascontiguousarray(pixels)
+    if codec == RAW:
+        return pixels.tobytes()
+    if codec == PNG16:
+        ok, png = cv2.imencode('.png', pixels, [cv2.IMWRITE_PNG_COMPRESSION, 1 if level is None else level])
+        if not ok:
+            raise ValueError("PNG encoding failed")
+        return png.tobytes()
+
+    residual = zigzag_row_delta(pixels)
+    if codec == DELTA_ZLIB:
+        return zlib.compress(residual, 1 if level is None else level)
+    if codec == DELTA_LZ4:
+        return lz4.block.compress(residual, store_size=False)
+    if codec == DELTA_ZSTD:
+        return zstandard.ZstdCompressor(level=1 if level is None else level).compress(residual)
+    raise ValueError(f"Unknown depth codec {codec}")
+
+
+class DepthDecoder:
+    """
+    Decodes payloads into a caller-provided (H, W) array - the receiver's
+    frame buffer. The entropy stage returns one bytes object (none of zlib,
+    lz4 or zstandard can decompress into a buffer); the delta stage then
+    writes straight into out with a reused scratch array.
+    """
+
+    def __init__(self):
+        self.scratch = None
+        self.zstd = zstandard.ZstdDecompressor() if zstandard is not None else None
+
+    def _scratch_like(self, out):
+        if self.scratch is None or self.scratch.shape != out.shape or self.scratch.dtype != out.dtype:
+            self.scratch = np.empty_like(out)
+        return self.scratch
+
+    def decode(self, codec, payload, out):
+        """Decode payload (bytes-like) of codec into out (H, W unsigned array)"""
+        size = out.nbytes
+        if codec == RAW:
+            out.reshape(-1).view(np.uint8)[:] = np.frombuffer(payload, dtype=np.uint8, count=size)
+            return
+        if codec == PNG16:
+            if cv2 is None:
+                raise ValueError("png16 depth needs OpenCV")
+            image = cv2.imdecode(np.frombuffer(payload, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+            if image is None or image.shape != out.shape:
+                raise ValueError("Bad png16 depth payload")
+            np.copyto(out, image, casting='unsafe')
+            return
+
+        if codec == DELTA_ZLIB:
+            # Capped output: a decompression bomb stops at size instead of expanding in full
+            decompressor = zlib.decompressobj()
+            decompressed = decompressor.decompress(payload, size)
+            if decompressor.unconsumed_tail:
+                raise ValueError(f"Depth payload decodes to more than {size} bytes")
+        elif codec == DELTA_LZ4:
+            if lz4 is None:
+                raise ValueError("delta-lz4 depth needs the lz4 package")
+            decompressed = lz4.block.decompress(payload, uncompressed_size=size)
+        elif codec == DELTA_ZSTD:
+            if self.zstd is None:
+                raise ValueError("delta-zstd depth needs the zstandard package")
+            decompressed = self.zstd.decompress(payload, max_output_size=size)
+        else:
+            raise ValueError(f"Unknown depth codec {codec}")
+        if len(decompressed) != size:
+            raise ValueError(f"Depth payload decodes to {len(decompressed)} bytes, expected {size}")
+
+        residual = np.frombuffer(decompressed, dtype=out.dtype).reshape(out.shape)
+        undo_zigzag_row_delta(residual, out, self._scratch_like(out))
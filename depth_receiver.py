@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Raw 16-bit Depth Stream Receiver for OAK-D Pro
+Receives the length-prefixed SLAM-ready depth stream (port 5003) into
+preallocated buffers and hands out zero-copy numpy views. Compressed frames
+(see depth_codecs.py) are decoded into the same buffers.
+"""
+
+import socket
+import struct
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from depth_codecs import (RAW, CODEC_NAMES, DepthDecoder, negotiation_message, pack_itemsize,
+                          resolve_codecs, unpack_itemsize)
+from device_config import add_device_arguments, apply_device
+
+# Wire format: '>I' frame size, then a '>IIIQ' header followed by the pixels
+# (raw, or encoded with the codec in the upper bits of itemsize)
+FRAME_SIZE_PREFIX = struct.Struct('>I')
+DEPTH_HEADER = struct.Struct('>IIIQ')  # width, height, itemsize, timestamp_us
+
+DEPTH_DTYPES = {1: np.uint8, 2: np.uint16, 4: np.uint32}
+# Upper bound for a decoded frame and for the wire payload, so a corrupt header or
+# length prefix cannot force a huge allocation
+MAX_DECODED_SIZE = 64 * 1024 * 1024
+
+# depth (and raw, the header + raw pixels, as a raw frame would have been
+# received) are views into a receive buffer: valid until num_buffers more
+# frames arrive
+DepthFrame = namedtuple('DepthFrame', ['seq', 'width', 'height', 'itemsize', 'timestamp_us', 'depth', 'raw'])
+
+
+class DepthStreamReceiver:
+    """
+    Receives depth frames with recv_into into a small ring of reusable buffers.
+
+    Each frame's depth array is an np.frombuffer view (no copy). The buffer
+    behind it is reused after num_buffers further frames, so consumers that
+    keep a frame longer than that must copy it.
+    """
+
+    def __init__(self, pi_ip, port=5003, num_buffers=3, timeout=5.0, codecs=None):
+        self.pi_ip = pi_ip
+        self.port = port
+        self.timeout = timeout
+        self.codecs = codecs  # codec names to ask for, in order; None: raw without negotiation
+        self.sock = None
+        self.running = False
+
+        self.prefix = bytearray(FRAME_SIZE_PREFIX.size)
+        self.prefix_view = memoryview(self.prefix)
+        self.header = bytearray(DEPTH_HEADER.size)
+        self.header_view = memoryview(self.header)
+        self.payload = bytearray(0)  # encoded pixels of compressed frames
+        self.decoder = DepthDecoder()
+        self.buffers = [bytearray(0) for _ in range(num_buffers)]
+        self.views = [None] * num_buffers  # cached (shape, dtype, ndarray) per buffer
+        self.next_buffer = 0
+
+        self.frame_count = 0
+        self.byte_count = 0     # on the wire
+        self.pixel_bytes = 0    # decoded
+        self.last_codec = RAW
+        self.start_time = None
+
+    def connect(self):
+        """Connect to the Pi depth stream"""
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        # Room for a few full frames in the kernel while the consumer catches up
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 8 * 1024 * 1024)
+        self.sock.connect((self.pi_ip, self.port))
+        if self.codecs:
+            self.sock.sendall(negotiation_message(self.codecs))
+        self.running = True
+        self.start_time = time.time()
+
+    def close(self):
+        """Close the connection"""
+        self.running = False
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+
+    def stop(self):
+        """Ask frames()/run() to return after the current frame"""
+        self.running = False
+
+    def _recv_exact(self, view):
+        """Fill view completely; False on EOF"""
+        got = 0
+        size = len(view)
+        while got < size:
+            nbytes = self.sock.recv_into(view[got:], size - got)
+            if not nbytes:
+                return False
+            got += nbytes
+        return True
+
+    def _buffer_for(self, frame_size):
+        index = self.next_buffer
+        self.next_buffer = (index + 1) % len(self.buffers)
+        if len(self.buffers[index]) < frame_size:
+            # Grow once (e.g. first frame or a resolution change), then reuse
+            self.buffers[index] = bytearray(frame_size)
+            self.views[index] = None
+        return index
+
+    def _depth_view(self, index, width, height, itemsize):
+        dtype = DEPTH_DTYPES[itemsize]
+        cached = self.views[index]
+        if cached is not None and cached[0] == (height, width) and cached[1] == dtype:
+            return cached[2]
+        depth = np.frombuffer(self.buffers[index], dtype=dtype, count=width * height,
+                              offset=DEPTH_HEADER.size).reshape((height, width))
+        self.views[index] = ((height, width), dtype, depth)
+        return depth
+
+    def receive_frame(self):
+        """Receive the next frame, returns a DepthFrame or None when the stream ends"""
+        if not self._recv_exact(self.prefix_view):
+            return None
+        frame_size = FRAME_SIZE_PREFIX.unpack_from(self.prefix)[0]
+        if frame_size < DEPTH_HEADER.size:
+            raise ValueError(f"Depth frame too short: {frame_size} bytes")
+        if frame_size > DEPTH_HEADER.size + MAX_DECODED_SIZE:
+            # Checked before any allocation, so a corrupt prefix cannot force a huge buffer
+            raise ValueError(f"Depth frame too large: {frame_size} bytes")
+        if not self._recv_exact(self.header_view):
+            return None
+
+        width, height, packed_itemsize, timestamp_us = DEPTH_HEADER.unpack_from(self.header)
+        itemsize, codec = unpack_itemsize(packed_itemsize)
+        pixel_size = width * height * itemsize
+        if itemsize not in DEPTH_DTYPES or codec not in CODEC_NAMES or \
+                (codec == RAW and DEPTH_HEADER.size + pixel_size != frame_size) or pixel_size > MAX_DECODED_SIZE:
+            raise ValueError(f"Bad depth header: {width}x{height}x{packed_itemsize} in {frame_size} bytes")
+
+        # Raw pixels land straight in the frame buffer; encoded ones are decoded into it
+        index = self._buffer_for(frame_size if codec == RAW else DEPTH_HEADER.size + pixel_size)
+        buffer = self.buffers[index]
+        buffer[:DEPTH_HEADER.size] = self.header
+        if codec == RAW:
+            raw = memoryview(buffer)[:frame_size]
+            if not self._recv_exact(raw[DEPTH_HEADER.size:]):
+                return None
+            depth = self._depth_view(index, width, height, itemsize)
+        else:
+            payload_size = frame_size - DEPTH_HEADER.size
+            if len(self.payload) < payload_size:
+                self.payload = bytearray(payload_size)
+            payload = memoryview(self.payload)[:payload_size]
+            if not self._recv_exact(payload):
+                return None
+            depth = self._depth_view(index, width, height, itemsize)
+            self.decoder.decode(codec, payload, depth)
+            # Consumers (e.g. the session recorder) see the frame as if it had been sent raw
+            DEPTH_HEADER.pack_into(buffer, 0, width, height, pack_itemsize(itemsize, RAW), timestamp_us)
+            raw = memoryview(buffer)[:DEPTH_HEADER.size + pixel_size]
+
+        self.frame_count += 1
+        self.byte_count += frame_size + FRAME_SIZE_PREFIX.size
+        self.pixel_bytes += pixel_size
+        self.last_codec = codec
+        return DepthFrame(self.frame_count, width, height, itemsize, timestamp_us, depth, raw)
+
+    def frames(self):
+        """Iterate over frames until the stream ends or stop() is called"""
+        while self.running:
+            frame = self.receive_frame()
+            if frame is None:
+                break
+            yield frame
+
+    __iter__ = frames
+
+    def run(self, callback):
+        """Call callback(frame) for every frame until the stream ends or stop() is called"""
+        for frame in self.frames():
+            callback(frame)
+
+    def get_rate(self):
+        """Average frames per second since connect"""
+        elapsed = time.time() - self.start_time if self.start_time else 0
+        return self.frame_count / elapsed if elapsed > 0 else 0
+
+
+def receive_raw_depth_stream(pi_ip, port, codecs=None):
+    """Headless ingest: receive frames and print the rate (see depth_viewer.py for display)"""
+    receiver = DepthStreamReceiver(pi_ip=pi_ip, port=port, codecs=codecs)
+    try:
+        receiver.connect()
+        print(f'Connected to raw 16-bit depth stream on port {port}' +
+              (f" (offered codecs: {','.join(codecs)})" if codecs else ''))
+
+        last_report = time.time()
+        for frame in receiver.frames():
+            now = time.time()
+            if now - last_report >= 1.0:
+                mbps = receiver.byte_count * 8 / ((now - receiver.start_time) * 1000 * 1000)
+                ratio = receiver.pixel_bytes / receiver.byte_count if receiver.byte_count else 0
+                print(f'Frame {frame.seq}: {frame.width}x{frame.height} | '
+                      f'{receiver.get_rate():.1f} fps | {mbps:.1f} Mbps | '
+                      f'{CODEC_NAMES[receiver.last_codec]} {ratio:.2f}x | '
+                      f'Timestamp: {frame.timestamp_us/1000000:.3f}s')
+                last_report = now
+
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print(f'Raw depth stream error: {e}')
+    finally:
+        receiver.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='OAK-D Pro Raw Depth Stream Receiver')
+    ports = (('--port', 'depth'),)
+    add_device_arguments(parser, ports=ports)
+    parser.add_argument('--codec', metavar='A,B',
+                        help='Ask for compressed depth: codec names in order of preference, or "auto" '
+                             '(e.g. delta-lz4,delta-zlib; default: raw)')
+
+    args = parser.parse_args()
+    apply_device(args, ports)
+
+    receive_raw_depth_stream(args.ip, args.port, resolve_codecs(args.codec) if args.codec else None)
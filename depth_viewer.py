@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Depth Viewer - SLAM-ready depth display decoupled from the receive path
+Frames are received on a background thread and handed over through a
+latest-wins mailbox; colorization is a single uint16 -> BGRA table lookup
+"""
+
+import threading
+
+import cv2
+import numpy as np
+
+from depth_codecs import resolve_codecs
+from depth_receiver import DepthStreamReceiver
+from device_config import add_device_arguments, apply_device
+from frame_mailbox import LatestFrameMailbox
+
+
+class DepthColorizer:
+    """
+    Colorizes uint16 depth (mm) through a precomputed 65536-entry BGRA table.
+
+    The range is either fixed (min_mm/max_mm) or tracked from percentiles of
+    a subsampled grid, smoothed over frames. The table is only rebuilt when
+    the tracked range moves noticeably. Depth 0 (no measurement) is black.
+    Entries are packed as uint32 so the lookup moves one word per pixel.
+    """
+
+    def __init__(self, min_mm=None, max_mm=None, percentiles=(2, 98), grid_step=8,
+                 smoothing=0.2, rebuild_tolerance=0.02, colormap=cv2.COLORMAP_JET):
+        self.fixed = min_mm is not None and max_mm is not None
+        self.percentiles = percentiles
+        self.grid_step = grid_step
+        self.smoothing = smoothing
+        self.rebuild_tolerance = rebuild_tolerance
+
+        ramp = np.arange(256, dtype=np.uint8).reshape(256, 1)
+        palette = np.full((256, 4), 255, dtype=np.uint8)
+        palette[:, :3] = cv2.applyColorMap(ramp, colormap).reshape(256, 3)
+        self.palette = palette.view(np.uint32).reshape(256)
+        self.lut = np.zeros(65536, dtype=np.uint32)
+        self.out = None
+        self.out_packed = None
+
+        self.range = None        # (lo, hi) the table was built for
+        self.tracked = None      # smoothed percentile range
+        self.sample_range = (0, 0)  # valid min/max of the last sampled grid, for overlays
+        if self.fixed:
+            self.build_lut(min_mm, max_mm)
+
+    def build_lut(self, lo, hi):
+        """Rebuild the table for depth range [lo, hi] mm"""
+        values = np.arange(65536, dtype=np.float32)
+        scale = 255.0 / max(hi - lo, 1.0)
+        index = np.clip((values - lo) * scale, 0, 255).astype(np.uint8)
+        np.take(self.palette, index, axis=0, out=self.lut)
+        self.lut[0] = 0
+        self.range = (lo, hi)
+
+    def update_range(self, depth):
+        """Track the display range from a subsampled grid of the frame"""
+        sample = depth[::self.grid_step, ::self.grid_step]
+        valid = sample[sample > 0]
+        if valid.size < 16:
+            return
+        self.sample_range = (int(valid.min()), int(valid.max()))
+        if self.fixed:
+            return
+
+        lo, hi = np.percentile(valid, self.percentiles)
+        if self.tracked is None:
+            self.tracked = (lo, hi)
+        else:
+            a = self.smoothing
+            self.tracked = (self.tracked[0] + a * (lo - self.tracked[0]),
+                            self.tracked[1] + a * (hi - self.tracked[1]))
+
+        lo, hi = self.tracked
+        if self.range is not None:
+            tolerance = self.rebuild_tolerance * max(hi - lo, 1.0)
+            if abs(lo - self.range[0]) < tolerance and abs(hi - self.range[1]) < tolerance:
+                return
+        self.build_lut(lo, hi)
+
+    def colorize(self, depth):
+        """Return a BGRA image for depth; the output array is reused between calls"""
+        self.update_range(depth)
+        if self.range is None:
+            self.build_lut(0, 10000)
+        if self.out is None or self.out.shape[:2] != depth.shape:
+            self.out = np.empty(depth.shape + (4,), dtype=np.uint8)
+            self.out_packed = self.out.view(np.uint32).reshape(depth.shape)
+        np.take(self.lut, depth, out=self.out_packed)
+        return self.out
+
+
+class DepthViewer:
+    """Receive thread feeds a latest-wins mailbox; the calling thread renders"""
+
+    def __init__(self, receiver, colorizer=None, window_name='SLAM-Ready Depth Stream'):
+        self.receiver = receiver
+        self.colorizer = colorizer or DepthColorizer()
+        self.window_name = window_name
+        self.mailbox = LatestFrameMailbox()
+        self.running = False
+        self.shown = 0
+
+    def receive_loop(self):
+        """Receive frames as fast as the Pi sends them, never waiting on the display"""
+        try:
+            for frame in self.receiver.frames():
+                self.mailbox.put(frame)
+        except Exception as e:
+            print(f'Raw depth stream error: {e}')
+        finally:
+            self.mailbox.close()
+
+    def draw_overlay(self, image, frame):
+        lo, hi = self.colorizer.sample_range
+        cv2.putText(image, 'Raw 16-bit Depth (SLAM-Ready)', (10, 30),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+        cv2.putText(image, f'Range: {lo}-{hi}mm', (10, 60),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        cv2.putText(image, f'Timestamp: {frame.timestamp_us/1000000:.3f}s | '
+                          f'RX {self.receiver.get_rate():.1f} fps | Skipped {self.mailbox.dropped}',
+                   (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+
+    def run(self):
+        """Render the newest frame until the stream ends or 'q' is pressed"""
+        self.running = True
+        receive_thread = threading.Thread(target=self.receive_loop, daemon=True)
+        receive_thread.start()
+
+        try:
+            while self.running:
+                frame = self.mailbox.get(timeout=0.1)
+                if frame is None:
+                    if not receive_thread.is_alive():
+                        break
+                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                        break
+                    continue
+
+                image = self.colorizer.colorize(frame.depth)
+                self.draw_overlay(image, frame)
+                cv2.imshow(self.window_name, image)
+                self.shown += 1
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+        finally:
+            self.running = False
+            self.receiver.stop()
+            self.receiver.close()
+            cv2.destroyAllWindows()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='OAK-D Pro Raw Depth Viewer')
+    ports = (('--port', 'depth'),)
+    add_device_arguments(parser, ports=ports)
+    parser.add_argument('--min-mm', type=float, help='Fixed display range minimum (default: track percentiles)')
+    parser.add_argument('--max-mm', type=float, help='Fixed display range maximum (default: track percentiles)')
+    parser.add_argument('--codec', metavar='A,B',
+                        help='Ask for compressed depth: codec names in order of preference, or "auto" (default: raw)')
+
+    args = parser.parse_args()
+    apply_device(args, ports)
+
+    codecs = resolve_codecs(args.codec) if args.codec else None
+    receiver = DepthStreamReceiver(pi_ip=args.ip, port=args.port, num_buffers=4, codecs=codecs)
+    try:
+        receiver.connect()
+    except OSError as e:
+        print(f'Raw depth stream error: {e}')
+        raise SystemExit(1)
+    print(f'Connected to raw 16-bit depth stream on port {args.port}')
+
+    DepthViewer(receiver, DepthColorizer(min_mm=args.min_mm, max_mm=args.max_mm)).run()
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Device Config - The Pis/cameras served by this PC, read from devices.json
+
+Receivers, monitors and scripts get the Pi addresses and ports from here
+instead of hard-coding them. The file describes the PC interfaces and N
+devices. Each device has a stream IP, SSH details and stream ports by kind:
+
+    rgb, left, right   H.264 over TCP
+    depth              '>I' length-prefixed depth frames over TCP
+    imu                IMU datagrams over UDP (imu_protocol.py)
+
+OAK_DEVICES (or --config) points at another file. Without a file the
+built-in defaults apply: one device at 192.168.1.201 on ports 5000-5004.
+A device's relay serves its streams on 127.0.0.1 at port + relay_offset.
+The offset defaults to 10000 plus 100 per device, which keeps the local
+ports of identical rigs apart.
+
+    python3 device_config.py list
+    python3 device_config.py names
+    python3 device_config.py get [--device NAME] FIELD    (for the shell scripts)
+"""
+
+import json
+import os
+from collections import namedtuple
+
+CONFIG_ENV = 'OAK_DEVICES'
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'devices.json')
+
+# (kind, display name) in display order
+STREAM_KINDS = (('rgb', 'RGB'), ('left', 'Left'), ('right', 'Right'), ('depth', 'Depth'), ('imu', 'IMU'))
+KIND_NAMES = dict(STREAM_KINDS)
+DEFAULT_STREAMS = (('rgb', 5000), ('left', 5001), ('right', 5002), ('depth', 5003), ('imu', 5004))
+DEFAULT_RELAY_OFFSET = 10000
+RELAY_OFFSET_STEP = 100
+
+DEFAULT_CONFIG = {
+    'pc': {
+        'ethernet': {'interface': 'eno2', 'ip': '192.168.1.50'},
+        'wifi': {'interface': 'wlo1', 'ip': '192.168.1.233'},
+    },
+    'devices': [{
+        'name': 'rig1',
+        'ip': '192.168.1.201',
+        'ssh_host': 'pi',
+        'ssh_ip': '192.168.1.202',
+        'project_dir': '/home/ivyspec/ivy_streamer',
+        'streams': dict(DEFAULT_STREAMS),
+    }],
+}
+
+DeviceConfig = namedtuple('DeviceConfig', ['path', 'pc', 'devices'])
+
+
+class Device(namedtuple('Device', ['name', 'ip', 'ssh_host', 'ssh_ip', 'project_dir',
+                                   'streams', 'relay_offset', 'adhoc'])):
+    """One Pi + camera; streams is ((kind, port), ...) in STREAM_KINDS order"""
+
+    __slots__ = ()
+
+    def port(self, kind):
+        """Port of a stream kind, None if the device does not have it"""
+        for stream_kind, port in self.streams:
+            if stream_kind == kind:
+                return port
+        return None
+
+    def tcp_streams(self):
+        """(port, display name, kind) of the TCP streams"""
+        return [(port, KIND_NAMES[kind], kind) for kind, port in self.streams if kind != 'imu']
+
+    def relayed(self):
+        """The same device as seen through its local relay (stream_relay.py)"""
+        return self._replace(ip='127.0.0.1', relay_offset=0,
+                             streams=tuple((kind, port + self.relay_offset) for kind, port in self.streams))
+
+
+def adhoc_device(ip):
+    """A device given only by --ip: default ports, named after its address"""
+    return Device(ip, ip, None, None, None, DEFAULT_STREAMS, DEFAULT_RELAY_OFFSET, True)
+
+
+def parse_device(entry, index):
+    """Device from one "devices" entry (raises ValueError)"""
+    if not entry.get('name') or not entry.get('ip'):
+        raise ValueError(f"device #{index + 1} needs a name and an ip")
+    streams = entry.get('streams', dict(DEFAULT_STREAMS))
+    unknown = set(streams) - set(KIND_NAMES)
+    if unknown:
+        raise ValueError(f"device {entry['name']}: unknown stream kinds {sorted(unknown)} "
+                         f"(known: {', '.join(KIND_NAMES)})")
+    return Device(
+        name=str(entry['name']),
+        ip=entry['ip'],
+        ssh_host=entry.get('ssh_host'),
+        ssh_ip=entry.get('ssh_ip'),
+        project_dir=entry.get('project_dir'),
+        streams=tuple((kind, int(streams[kind])) for kind, _ in STREAM_KINDS if kind in streams),
+        relay_offset=int(entry.get('relay_offset', DEFAULT_RELAY_OFFSET + index * RELAY_OFFSET_STEP)),
+        adhoc=False,
+    )
+
+
+def validate(devices):
+    """Names, Pi addresses and local relay ports must not collide (raises ValueError)"""
+    names = set()
+    remote = {}
+    local = {}
+    for device in devices:
+        if device.name in names:
+            raise ValueError(f"duplicate device name {device.name}")
+        names.add(device.name)
+        for kind, port in device.streams:
+            transport = 'udp' if kind == 'imu' else 'tcp'
+            other = remote.setdefault((device.ip, port, transport), device.name)
+            if other != device.name:
+                raise ValueError(f"{device.name} and {other} both use {device.ip}:{port}")
+            relay_port = port + device.relay_offset
+            if not 0 < relay_port < 65536:
+                raise ValueError(f"{device.name}: relay port {relay_port} out of range")
+            other = local.setdefault((relay_port, transport), device.name)
+            if other != device.name:
+                raise ValueError(f"{device.name} and {other} both relay on port {relay_port} "
+                                 f"(give them different relay_offset values)")
+
+
+def load_config(path=None):
+    """DeviceConfig from path, $OAK_DEVICES or devices.json; built-in defaults if none exists"""
+    path = path or os.environ.get(CONFIG_ENV) or DEFAULT_PATH
+    if os.path.exists(path) or path != DEFAULT_PATH:
+        with open(path) as f:
+            try:
+                data = json.load(f)
+            except ValueError as e:
+                raise ValueError(f"{path}: {e}")
+    else:
+        data = DEFAULT_CONFIG
+        path = None
+
+    entries = data.get('devices') or []
+    if not entries:
+        raise ValueError(f"{path}: no devices")
+    devices = tuple(parse_device(entry, index) for index, entry in enumerate(entries))
+    validate(devices)
+    return DeviceConfig(path, data.get('pc', DEFAULT_CONFIG['pc']), devices)
+
+
+def select_devices(config, names):
+    """The named devices, in the order given (raises ValueError for unknown names)"""
+    by_name = {device.name: device for device in config.devices}
+    for name in names:
+        if name not in by_name:
+            raise ValueError(f"unknown device {name} (configured: {', '.join(by_name)})")
+    return [by_name[name] for name in names]
+
+
+def add_device_arguments(parser, ports=(), multiple=False, relayed=False):
+    """
+    --config, --device and --ip, plus (option, kind) port options such as
+    ('--port', 'depth'); their defaults come from the device config.
+    relayed adds --relayed for receivers that can go through the relays.
+    """
+    parser.add_argument('--config', help=f'Device config file (default: ${CONFIG_ENV} or devices.json)')
+    if multiple:
+        parser.add_argument('--device', action='append', metavar='NAME',
+                            help='Configured device to serve, repeatable (default: all)')
+    else:
+        parser.add_argument('--device', metavar='NAME', help='Configured device (default: the first)')
+    if relayed:
+        parser.add_argument('--relayed', action='store_true',
+                            help='Connect through the devices\' local relays (dual_interface_monitor.py --relay)')
+    parser.add_argument('--ip', help='Pi stream IP address (default: from the device config)')
+    for option, kind in ports:
+        parser.add_argument(option, type=int, help=f'{KIND_NAMES[kind]} port (default: from the device config)')
+
+
+def devices_from_args(args):
+    """
+    Devices selected by the add_device_arguments options: --ip alone is a
+    device with the default ports, --ip with one --device overrides its
+    address. Exits with a message if the config cannot be used.
+    """
+    names = args.device if isinstance(args.device, list) else [args.device] if args.device else None
+    try:
+        if args.ip and names and len(names) > 1:
+            raise ValueError(f"--ip overrides the address of one device, not {len(names)} "
+                             f"({', '.join(names)}): give it with a single --device")
+        if args.ip and not names:
+            devices = [adhoc_device(args.ip)]
+        else:
+            config = load_config(args.config)
+            devices = select_devices(config, names) if names else list(config.devices)
+            if args.ip:
+                devices = [devices[0]._replace(ip=args.ip)]
+    except (OSError, ValueError) as e:
+        print(f"❌ Device config: {e}")
+        raise SystemExit(1)
+    if getattr(args, 'relayed', False):
+        devices = [device.relayed() for device in devices]
+    return devices
+
+
+def apply_device(args, ports=()):
+    """Fill in args.ip and the port options from the selected device; returns the device"""
+    device = devices_from_args(args)[0]
+    args.ip = device.ip
+    for option, kind in ports:
+        dest = option.lstrip('-').replace('-', '_')
+        if getattr(args, dest) is None:
+            port = device.port(kind)
+            if port is None:
+                print(f"❌ Device {device.name} has no {KIND_NAMES[kind]} stream")
+                raise SystemExit(1)
+            setattr(args, dest, port)
+    return device
+
+
+def device_arguments(devices, relayed=False):
+    """Options selecting these devices in another tool's add_device_arguments"""
+    args = []
+    for device in devices:
+        args += ['--ip', device.ip] if device.adhoc else ['--device', device.name]
+    if len(devices) == 1 and not devices[0].adhoc:
+        args += ['--ip', devices[0].ip]  # keeps an --ip override of the device
+    return args + (['--relayed'] if relayed else [])
+
+
+def get_field(config, device, field):
+    """Value for 'get': a device field, port.KIND or pc.SECTION.KEY"""
+    if field.startswith('pc.'):
+        value = config.pc
+        for key in field.split('.')[1:]:
+            value = value.get(key) if isinstance(value, dict) else None
+    elif field.startswith('port.'):
+        value = device.port(field[5:])
+    elif field in Device._fields and field not in ('streams', 'adhoc'):
+        value = getattr(device, field)
+    else:
+        raise ValueError(f"unknown field {field}")
+    if value is None:
+        raise ValueError(f"{field} is not set for {device.name}")
+    return value
+
+
+def print_devices(config):
+    print(f"Config: {config.path or 'built-in defaults'}")
+    print(f"{'Device':<10} {'Stream IP':<16} {'SSH':<22} {'Relay':>6}  Streams")
+    for device in config.devices:
+        ssh = f"{device.ssh_host or '-'} ({device.ssh_ip})" if device.ssh_ip else (device.ssh_host or '-')
+        streams = ' '.join(f"{kind}:{port}" for kind, port in device.streams)
+        print(f"{device.name:<10} {device.ip:<16} {ssh:<22} {'+' + str(device.relay_offset):>6}  {streams}")
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description='Show the device config (one Pi + camera per device)')
+    parser.add_argument('command', choices=('list', 'names', 'get'), help='list: table, names: one per line, get: one value')
+    parser.add_argument('field', nargs='?',
+                        help='For get: name, ip, ssh_host, ssh_ip, project_dir, relay_offset, port.KIND or pc.SECTION.KEY')
+    parser.add_argument('--config', help=f'Device config file (default: ${CONFIG_ENV} or devices.json)')
+    parser.add_argument('--device', metavar='NAME', help='For get: the device (default: the first)')
+
+    # Options may come between 'get' and FIELD
+    args = parser.parse_intermixed_args()
+
+    try:
+        config = load_config(args.config)
+        if args.command == 'list':
+            print_devices(config)
+        elif args.command == 'names':
+            print('\n'.join(device.name for device in config.devices))
+        else:
+            if not args.field:
+                parser.error('get needs a FIELD')
+            device = select_devices(config, [args.device])[0] if args.device else config.devices[0]
+            print(get_field(config, device, args.field))
+    except (OSError, ValueError) as e:
+        print(f"❌ Device config: {e}", file=sys.stderr)
+        sys.exit(1)
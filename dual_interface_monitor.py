@@ -1,61 +1,41 @@
 #!/usr/bin/env python3
 """
-Dual Interface Monitor - Check both ethernet and WiFi to see which carries Pi traffic
+Dual Interface Monitor - Check ethernet, WiFi and any other interface to see which carries Pi traffic
+Tk view over a MonitorCollector; --headless runs the collector without a display
+and serves the same metrics over HTTP (Prometheus text and JSON)
+One window and one engine thread cover every device in the device config
 """
 
-import tkinter as tk
-import time
+import signal
 import threading
 from datetime import datetime
-from collections import deque
-import socket
-import struct
+
+try:
+    import tkinter as tk
+except ImportError:
+    tk = None
+
+from device_config import DEFAULT_CONFIG, add_device_arguments, devices_from_args, load_config
+from h264_analyzer import format_summary
+from metrics_server import MetricsServer
+from monitor_collector import MonitorCollector
 
 class DualInterfaceMonitor:
-    def __init__(self):
+    def __init__(self, devices, pc=None, collector=None):
         self.root = tk.Tk()
         self.root.title("Dual Interface & Video Stream Monitor")
         self.root.geometry("800x600")
 
         self.running = True
-        self.pi_ip = "192.168.1.201"
-
-        # Monitor both interfaces
-        self.interfaces = {
-            'eno2': {'name': 'Ethernet', 'prev_rx': 0, 'prev_tx': 0, 'history': deque(maxlen=15)},
-            'wlo1': {'name': 'WiFi', 'prev_rx': 0, 'prev_tx': 0, 'history': deque(maxlen=15)}
-        }
-
-        # Video stream monitoring
-        self.video_streams = {
-            5000: {'name': 'RGB', 'frame_count': 0, 'last_frame_time': 0, 'fps_history': deque(maxlen=10), 'active': False, 'monitor_bandwidth': 0},
-            5001: {'name': 'Left', 'frame_count': 0, 'last_frame_time': 0, 'fps_history': deque(maxlen=10), 'active': False, 'monitor_bandwidth': 0},
-            5002: {'name': 'Right', 'frame_count': 0, 'last_frame_time': 0, 'fps_history': deque(maxlen=10), 'active': False, 'monitor_bandwidth': 0},
-            5003: {'name': 'Depth', 'frame_count': 0, 'last_frame_time': 0, 'fps_history': deque(maxlen=10), 'active': False, 'monitor_bandwidth': 0}
-        }
+        self.devices = devices
+        self.pc = pc or DEFAULT_CONFIG['pc']
 
-        self.fps_lock = threading.Lock()
+        # Sampling and stream monitoring live in the collector; this class only draws its snapshots
+        self.collector = collector or MonitorCollector(devices)
 
         self.setup_gui()
         self.start_monitoring()
 
-    def get_interface_stats(self, interface):
-        """Get interface statistics"""
-        try:
-            with open('/proc/net/dev', 'r') as f:
-                for line in f:
-                    if f'{interface}:' in line:
-                        parts = line.split()
-                        rx_bytes = int(parts[1])
-                        tx_bytes = int(parts[9])
-                        rx_packets = int(parts[2])
-                        tx_packets = int(parts[10])
-                        return rx_bytes, tx_bytes, rx_packets, tx_packets
-        except Exception as e:
-            print(f"Error reading {interface} stats: {e}")
-
-        return 0, 0, 0, 0
-
     def setup_gui(self):
         """Setup GUI"""
         self.text = tk.Text(self.root, font=('Courier', 9), bg='black', fg='green')
@@ -67,186 +47,23 @@ class DualInterfaceMonitor:
 
     def start_monitoring(self):
         """Initialize monitoring"""
-        # Get initial values
-        for iface in self.interfaces:
-            rx, tx, _, _ = self.get_interface_stats(iface)
-            self.interfaces[iface]['prev_rx'] = rx
-            self.interfaces[iface]['prev_tx'] = tx
-
-        # Start monitoring threads
-        threading.Thread(target=self.monitor_loop, daemon=True).start()
-        threading.Thread(target=self.fps_monitor_loop, daemon=True).start()
-
-    def monitor_loop(self):
-        """Main monitoring loop"""
-        while self.running:
-            try:
-                time.sleep(2)  # 2 second intervals
-
-                interface_data = {}
-
-                for iface in self.interfaces:
-                    current_rx, current_tx, rx_packets, tx_packets = self.get_interface_stats(iface)
-
-                    # Calculate deltas
-                    rx_diff = current_rx - self.interfaces[iface]['prev_rx']
-                    tx_diff = current_tx - self.interfaces[iface]['prev_tx']
-
-                    # Convert to Mbps (2 second interval)
-                    rx_mbps = (rx_diff * 8) / (2 * 1000 * 1000)
-                    tx_mbps = (tx_diff * 8) / (2 * 1000 * 1000)
-                    total_mbps = rx_mbps + tx_mbps
-
-                    # Store data
-                    interface_data[iface] = {
-                        'rx_mbps': rx_mbps,
-                        'tx_mbps': tx_mbps,
-                        'total_mbps': total_mbps,
-                        'rx_packets': rx_packets,
-                        'tx_packets': tx_packets,
-                        'total_rx_gb': current_rx / (1024**3),
-                        'total_tx_gb': current_tx / (1024**3)
-                    }
-
-                    # Add to history
-                    self.interfaces[iface]['history'].append(total_mbps)
-
-                    # Update for next iteration
-                    self.interfaces[iface]['prev_rx'] = current_rx
-                    self.interfaces[iface]['prev_tx'] = current_tx
-
-                self.update_display(interface_data)
-
-            except Exception as e:
-                print(f"Monitor loop error: {e}")
-                time.sleep(2)
-
-    def fps_monitor_loop(self):
-        """Monitor FPS for all video streams - SINGLE THREAD PER PORT"""
-        # Start one persistent thread per port (no continuous spawning)
-        for port in self.video_streams:
-            threading.Thread(target=self.monitor_stream_fps, args=(port,), daemon=True).start()
-
-        # Simple keepalive loop
-        while self.running:
-            try:
-                time.sleep(5)  # Just keep the main thread alive
-            except Exception as e:
-                print(f"FPS monitor loop error: {e}")
-                time.sleep(5)
-
-    def monitor_stream_fps(self, port):
-        """Monitor FPS for a specific video stream port - AGGRESSIVE MODE for best video quality"""
-        try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(2.0)
-            sock.connect((self.pi_ip, port))
-
-            with self.fps_lock:
-                self.video_streams[port]['active'] = True
-
-            frame_start_time = time.time()
-            frame_count = 0
-            buffer = b''
-            bytes_read = 0
-
-            while self.running:
-                try:
-                    # AGGRESSIVE: Read large chunks to maximize data consumption and improve video quality
-                    data = sock.recv(8192)  # Back to aggressive reading for video quality
-                    if not data:
-                        break
-
-                    bytes_read += len(data)
-                    buffer += data
-
-                    # For H.264 streams (ports 5000-5002), look for NAL unit start codes
-                    # For JPEG stream (port 5003), look for JPEG markers
-                    if port in [5000, 5001, 5002]:
-                        # H.264 NAL unit start code: 0x00000001 or 0x000001
-                        while True:
-                            # Look for 4-byte start code
-                            pos = buffer.find(b'\x00\x00\x00\x01')
-                            if pos == -1:
-                                # Look for 3-byte start code
-                                pos = buffer.find(b'\x00\x00\x01')
-                                if pos == -1:
-                                    break
-                                buffer = buffer[pos + 3:]
-                            else:
-                                buffer = buffer[pos + 4:]
-
-                            frame_count += 1
-                            current_time = time.time()
-
-                            # Calculate FPS every second
-                            if current_time - frame_start_time >= 1.0:
-                                fps = frame_count / (current_time - frame_start_time)
-                                mbps_consumed = (bytes_read * 8) / (1000 * 1000)  # Track our consumption
-
-                                with self.fps_lock:
-                                    self.video_streams[port]['fps_history'].append(fps)
-                                    self.video_streams[port]['frame_count'] += frame_count
-                                    self.video_streams[port]['last_frame_time'] = current_time
-                                    self.video_streams[port]['monitor_bandwidth'] = mbps_consumed
-
-                                frame_count = 0
-                                frame_start_time = current_time
-                                bytes_read = 0
-
-                    elif port == 5003:
-                        # JPEG stream - look for JPEG SOI marker (0xFFD8)
-                        while True:
-                            pos = buffer.find(b'\xff\xd8')
-                            if pos == -1:
-                                break
-                            buffer = buffer[pos + 2:]
-
-                            frame_count += 1
-                            current_time = time.time()
-
-                            # Calculate FPS every second
-                            if current_time - frame_start_time >= 1.0:
-                                fps = frame_count / (current_time - frame_start_time)
-                                mbps_consumed = (bytes_read * 8) / (1000 * 1000)
-
-                                with self.fps_lock:
-                                    self.video_streams[port]['fps_history'].append(fps)
-                                    self.video_streams[port]['frame_count'] += frame_count
-                                    self.video_streams[port]['last_frame_time'] = current_time
-                                    self.video_streams[port]['monitor_bandwidth'] = mbps_consumed
-
-                                frame_count = 0
-                                frame_start_time = current_time
-                                bytes_read = 0
-
-                    # Keep buffer size larger for aggressive data consumption
-                    if len(buffer) > 16384:  # Increased buffer size
-                        buffer = buffer[-8192:]
-
-                    # NO DELAY - maximum aggressive polling for best video performance
-
-                except socket.timeout:
-                    # Connection timeout is normal when stream is not active
-                    break
-                except Exception as e:
-                    print(f"Stream monitor error for port {port}: {e}")
-                    break
-
-            sock.close()
-
-        except (ConnectionRefusedError, socket.timeout, OSError):
-            # Stream not available - this is normal when Pi is not streaming
-            pass
-        except Exception as e:
-            print(f"FPS monitor error for port {port}: {e}")
-        finally:
-            with self.fps_lock:
-                self.video_streams[port]['active'] = False
+        self.collector.start()
+
+        # Tk widgets are only touched from the Tk thread
+        self.root.after(1000, self.refresh_display)
+
+    def refresh_display(self):
+        """Redraw from the latest published snapshot"""
+        if not self.running:
+            return
+        if self.collector.snapshot is not None:
+            self.update_display(self.collector.snapshot)
+        self.root.after(1000, self.refresh_display)
 
-    def update_display(self, data):
+    def update_display(self, snapshot):
         """Update display"""
         try:
+            data = snapshot['interfaces']
             self.text.delete(1.0, tk.END)
 
             display_text = f"""
@@ -256,132 +73,234 @@ DUAL INTERFACE & VIDEO STREAM MONITOR
 
 """
 
-            total_system_mbps = 0
-            active_interface = None
-            max_mbps = 0
-
-            for iface in ['eno2', 'wlo1']:
-                if iface in data:
-                    info = self.interfaces[iface]
-                    d = data[iface]
-
-                    # Calculate averages
-                    if info['history']:
-                        avg_mbps = sum(info['history']) / len(info['history'])
-                        peak_mbps = max(info['history'])
-                    else:
-                        avg_mbps = peak_mbps = 0
-
-                    # Determine if this interface is active for streaming
-                    if avg_mbps > max_mbps:
-                        max_mbps = avg_mbps
-                        active_interface = iface
-
-                    display_text += f"{info['name'].upper()} ({iface}):\n"
-                    display_text += f"  Current:    RX {d['rx_mbps']:.2f} Mbps | TX {d['tx_mbps']:.2f} Mbps | Total {d['total_mbps']:.2f} Mbps\n"
-                    display_text += f"  Average:    {avg_mbps:.2f} Mbps (last {len(info['history'])} samples)\n"
-                    display_text += f"  Peak:       {peak_mbps:.2f} Mbps\n"
-                    display_text += f"  Packets:    RX {d['rx_packets']:,} | TX {d['tx_packets']:,}\n"
-                    display_text += f"  Total Data: RX {d['total_rx_gb']:.2f} GB | TX {d['total_tx_gb']:.2f} GB\n"
-
-                    # Activity indicator
-                    if avg_mbps > 5:
-                        display_text += f"  🟢 ACTIVE - Significant traffic\n"
-                    elif avg_mbps > 1:
-                        display_text += f"  🟡 LIGHT - Some traffic\n"
-                    else:
-                        display_text += f"  ⚪ IDLE - Minimal traffic\n"
-
-                    display_text += "\n"
-                    total_system_mbps += d['total_mbps']
+            total_system_mbps = snapshot['total_mbps']
+            active_interface = snapshot['primary_interface']
+
+            for iface, d in data.items():
+                avg_mbps = d['avg_mbps']
+                peak_mbps = d['peak_mbps']
+
+                display_text += f"{d['name'].upper()} ({iface}):\n"
+                display_text += f"  Current:    RX {d['rx_mbps']:.2f} Mbps | TX {d['tx_mbps']:.2f} Mbps | Total {d['total_mbps']:.2f} Mbps\n"
+                display_text += f"  Average:    {avg_mbps:.2f} Mbps (last {d['window_seconds']:.0f}s)\n"
+                display_text += f"  Peak:       {peak_mbps:.2f} Mbps (100ms burst)\n"
+                display_text += f"  Packets:    RX {d['rx_pps']:,.0f}/s | TX {d['tx_pps']:,.0f}/s | Drops {d['drops']} | Errors {d['errors']}\n"
+                display_text += f"  Total Data: RX {d['total_rx_gb']:.2f} GB | TX {d['total_tx_gb']:.2f} GB\n"
+
+                # Activity indicator
+                if avg_mbps > 5:
+                    display_text += f"  🟢 ACTIVE - Significant traffic\n"
+                elif avg_mbps > 1:
+                    display_text += f"  🟡 LIGHT - Some traffic\n"
+                else:
+                    display_text += f"  ⚪ IDLE - Minimal traffic\n"
+
+                display_text += "\n"
 
             # Analysis
             display_text += f"ANALYSIS:\n"
             if active_interface:
-                iface_name = self.interfaces[active_interface]['name']
+                iface_name = data[active_interface]['name']
                 display_text += f"🎯 PRIMARY INTERFACE: {iface_name} ({active_interface})\n"
                 display_text += f"   This interface appears to carry the streaming traffic\n"
 
-                if active_interface == 'wlo1':
+                if iface_name == 'WiFi':
                     display_text += f"   ⚠️  Streaming over WiFi - consider using ethernet for stability\n"
                 else:
                     display_text += f"   ✅ Streaming over Ethernet - good for stability\n"
             else:
-                display_text += f"❓ No significant traffic detected on either interface\n"
+                display_text += f"❓ No significant traffic detected on any interface\n"
 
             display_text += f"\nSYSTEM TOTAL: {total_system_mbps:.2f} Mbps across all interfaces\n"
 
             # Video Stream FPS Information
             display_text += f"\nVIDEO STREAM FPS MONITORING:\n"
-            with self.fps_lock:
-                active_streams = 0
-                total_fps = 0
-                total_monitor_bandwidth = 0
-
-                for port, stream_info in self.video_streams.items():
-                    name = stream_info['name']
-
-                    if stream_info['active'] and stream_info['fps_history']:
-                        current_fps = stream_info['fps_history'][-1] if stream_info['fps_history'] else 0
-                        avg_fps = sum(stream_info['fps_history']) / len(stream_info['fps_history'])
-                        max_fps = max(stream_info['fps_history'])
-                        total_frames = stream_info['frame_count']
-                        monitor_bw = stream_info.get('monitor_bandwidth', 0)
-
-                        display_text += f"🎥 {name} (Port {port}): {current_fps:.1f} FPS (avg: {avg_fps:.1f}, max: {max_fps:.1f}) - {total_frames:,} frames\n"
-                        display_text += f"    Monitor overhead: {monitor_bw:.2f} Mbps\n"
-                        active_streams += 1
-                        total_fps += current_fps
-                        total_monitor_bandwidth += monitor_bw
-
-                    elif stream_info['active']:
-                        display_text += f"🟡 {name} (Port {port}): Connecting... (active but no frames detected)\n"
-                    else:
-                        display_text += f"⚪ {name} (Port {port}): Not streaming\n"
-
-                if active_streams > 0:
-                    display_text += f"\n📊 STREAMING SUMMARY: {active_streams}/4 streams active, Total FPS: {total_fps:.1f}\n"
-                    display_text += f"📈 MONITORING MODE: AGGRESSIVE ({total_monitor_bandwidth:.1f} Mbps) - High video quality\n"
-                    display_text += f"🚀 BENEFIT: Reduced video latency, improved frame quality via aggressive buffering\n"
-                else:
-                    display_text += f"\n❌ No video streams detected - Pi may not be streaming\n"
+            active_streams = snapshot['active_streams']
+            stream_count = snapshot['stream_count']
+            total_fps = snapshot['total_fps']
+            total_monitor_bandwidth = 0
+
+            for device in snapshot['devices'].values():
+                display_text += (f"📷 {device['name']} ({device['pi_ip']}): {device['active_streams']}/"
+                                 f"{device['stream_count']} streams, {device['total_fps']:.1f} FPS\n")
+                stream_text, monitor_bw = self.format_streams(device)
+                display_text += stream_text
+                total_monitor_bandwidth += monitor_bw
+
+            if active_streams > 0:
+                display_text += (f"\n📊 STREAMING SUMMARY: {active_streams}/{stream_count} streams active "
+                                 f"on {len(snapshot['devices'])} device(s), Total FPS: {total_fps:.1f}\n")
+                display_text += f"📈 MONITORING MODE: AGGRESSIVE ({total_monitor_bandwidth:.1f} Mbps) - High video quality\n"
+                display_text += f"🚀 BENEFIT: Reduced video latency, improved frame quality via aggressive buffering\n"
+            else:
+                display_text += f"\n❌ No video streams detected - Pi may not be streaming\n"
 
             # Network configuration
             display_text += f"\nNETWORK CONFIGURATION:\n"
-            display_text += f"Ethernet (eno2): 192.168.1.50/24\n"
-            display_text += f"WiFi (wlo1):     192.168.1.233/24\n"
-            display_text += f"Pi SSH (WiFi):   192.168.1.202\n"
-            display_text += f"Pi Stream (Eth): 192.168.1.201\n"
+            for kind, label in (('ethernet', 'Ethernet'), ('wifi', 'WiFi')):
+                iface = self.pc.get(kind)
+                if iface:
+                    display_text += f"{label} ({iface['interface']}):".ljust(17) + f"{iface['ip']}/24\n"
+            for device in self.devices:
+                ssh = f" | SSH (WiFi) {device.ssh_ip}" if device.ssh_ip else ""
+                display_text += f"Pi {device.name}:".ljust(17) + f"stream (Eth) {device.ip}{ssh}\n"
 
             display_text += f"\n{'='*80}\n"
-            display_text += "Monitoring interfaces (2s intervals) + video streams (1s intervals)\n"
+            display_text += "Monitoring interfaces (100ms samples, 1 min window) + video streams (1s intervals)\n"
             display_text += "Real-time network bandwidth and video stream FPS monitoring"
 
             self.text.insert(1.0, display_text)
 
             # Update status bar with video stream info
-            active_name = self.interfaces[active_interface]['name'] if active_interface else 'Unknown'
-
-            with self.fps_lock:
-                active_video_streams = sum(1 for s in self.video_streams.values() if s['active'])
-                total_fps = sum(s['fps_history'][-1] if s['fps_history'] else 0 for s in self.video_streams.values())
+            active_name = data[active_interface]['name'] if active_interface else 'Unknown'
+            samples = snapshot['samples']
+            active_video_streams = sum(1 for d in snapshot['devices'].values()
+                                       for s in d['streams'].values() if s['active'])
 
-            self.status.config(text=f"Network: {active_name} ({total_system_mbps:.1f}Mbps) | Video: {active_video_streams}/4 streams ({total_fps:.1f}fps total) | Samples: {len(self.interfaces['eno2']['history'])}")
+            self.status.config(text=f"Network: {active_name} ({total_system_mbps:.1f}Mbps) | Video: {active_video_streams}/{stream_count} streams ({total_fps:.1f}fps total) | Samples: {samples}")
 
         except Exception as e:
             print(f"Display update error: {e}")
 
+    def format_streams(self, device):
+        """Per-stream lines of one device; returns the text and the device's monitor bandwidth"""
+        display_text = ""
+        monitor_bandwidth = 0
+        relays = {row['port']: row for row in device['relay'] or ()}
+
+        for port, stream_info in device['streams'].items():
+            name = stream_info['name']
+
+            if stream_info['streaming']:
+                current_fps = stream_info['fps']
+                avg_fps = stream_info['avg_fps']
+                max_fps = stream_info['max_fps']
+                total_frames = stream_info['frame_count']
+                monitor_bw = stream_info.get('monitor_bandwidth', 0)
+
+                display_text += f"🎥 {name} (Port {port}): {current_fps:.1f} FPS (avg: {avg_fps:.1f}, max: {max_fps:.1f}) - {total_frames:,} frames\n"
+                display_text += f"    Monitor overhead: {monitor_bw:.2f} Mbps\n"
+                stall_warning = " ⚠️ STUTTERING" if stream_info['recent_stalls'] else ""
+                display_text += (f"    Frame interval: p50 {stream_info['interval_p50'] * 1000:.1f} ms | "
+                                 f"p99 {stream_info['interval_p99'] * 1000:.1f} ms | "
+                                 f"max {stream_info['interval_max'] * 1000:.0f} ms | "
+                                 f"stalls (>{stream_info['stall_threshold'] * 1000:.0f} ms) "
+                                 f"{stream_info['recent_stalls']} in 10s, {stream_info['stalls']} total{stall_warning}\n")
+                if stream_info.get('h264'):
+                    for line in format_summary(stream_info['h264']):
+                        display_text += f"    {line}\n"
+                relay = relays.get(port)
+                if relay:
+                    display_text += (f"    Relay :{relay['local_port']}: {relay['consumers']} consumers | "
+                                     f"queued {relay['queued'] / 1024:.0f} KB | overflows {relay['overflows']}\n")
+                tcp = stream_info.get('transport')
+                if tcp:
+                    queue_warning = " ⚠️ GROWING" if tcp['queue_growing'] else ""
+                    display_text += (f"    TCP: rtt {tcp['rtt_ms']:.1f}±{tcp['rttvar_ms']:.1f} ms (rcv {tcp['rcv_rtt_ms']:.1f} ms) | "
+                                     f"retrans {tcp['retrans_window']} ({tcp['total_retrans']} total) | "
+                                     f"rcv space {tcp['rcv_space_kb']:.0f} KB\n")
+                    display_text += (f"    Kernel queue: {tcp['queue_bytes'] / 1024:.1f} KB "
+                                     f"(max {tcp['queue_max_bytes'] / 1024:.1f} KB, "
+                                     f"{tcp['queue_growth'] / 1024:+.1f} KB/s){queue_warning}\n")
+                monitor_bandwidth += monitor_bw
+
+            elif stream_info['active']:
+                display_text += f"🟡 {name} (Port {port}): Connecting... (active but no frames detected)\n"
+            else:
+                display_text += f"⚪ {name} (Port {port}): Not streaming\n"
+
+        imu_relay = next((row for row in relays.values() if 'datagrams' in row), None)
+        if imu_relay:
+            state = 'registered' if imu_relay['registered'] else 'waiting for the Pi'
+            display_text += (f"📡 IMU relay :{imu_relay['local_port']}: {imu_relay['consumers']} consumers | "
+                             f"{imu_relay['datagrams']:,} datagrams | {state}\n")
+        return display_text, monitor_bandwidth
+
     def run(self):
         try:
             self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
             self.root.mainloop()
         finally:
             self.running = False
+            self.collector.stop()
 
     def on_closing(self):
         self.running = False
+        self.collector.stop()
         self.root.destroy()
 
+def run_headless(collector, metrics):
+    """Collect and serve metrics until SIGINT/SIGTERM (no display needed)"""
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    collector.start()
+    names = ', '.join(device.name for device in collector.devices)
+    print(f"✅ Headless monitor for {names}: "
+          f"http://{metrics.bind}:{metrics.port}/metrics and /metrics.json (Ctrl+C to stop)")
+    try:
+        stop.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        metrics.stop()
+        collector.stop()
+
 if __name__ == "__main__":
-    monitor = DualInterfaceMonitor()
-    monitor.run()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Dual Interface & Video Stream Monitor')
+    add_device_arguments(parser, multiple=True)
+    parser.add_argument('--headless', action='store_true', help='No window: collect and serve metrics over HTTP only')
+    parser.add_argument('--metrics-port', type=int,
+                        help='Serve /metrics and /metrics.json on this port (default: 9105 when headless, off otherwise)')
+    parser.add_argument('--metrics-bind', default='127.0.0.1', help='Metrics listen address (default: 127.0.0.1)')
+    parser.add_argument('--relay', action='store_true',
+                        help='Relay the streams to local viewers on port+relay_offset (one Pi connection per stream)')
+    parser.add_argument('--relay-unix-dir', help='With --relay: also serve DIR/oak-DEVICE-PORT.sock')
+
+    args = parser.parse_args()
+
+    headless = args.headless
+    if not headless and tk is None:
+        print("⚠️  tkinter is not available - running headless")
+        headless = True
+
+    devices = devices_from_args(args)
+    try:
+        pc = load_config(args.config).pc
+    except (OSError, ValueError):
+        pc = None  # --ip without a usable config file
+
+    collector = MonitorCollector(devices)
+    if args.relay:
+        try:
+            collector.add_relay(unix_dir=args.relay_unix_dir)
+        except OSError as e:
+            print(f"❌ Cannot listen on the relay ports: {e}")
+            raise SystemExit(1)
+        for device in devices:
+            ports = [port + device.relay_offset for kind, port in device.streams]
+            print(f"✅ Relaying {device.name} ({device.ip}) streams on 127.0.0.1 ports {min(ports)}-{max(ports)}")
+    metrics = None
+    if headless or args.metrics_port is not None:
+        metrics = MetricsServer(collector, args.metrics_bind, args.metrics_port if args.metrics_port is not None else 9105)
+        try:
+            metrics.start()
+        except OSError as e:
+            print(f"❌ Cannot serve metrics on {args.metrics_bind}:{metrics.port}: {e}")
+            raise SystemExit(1)
+
+    if headless:
+        run_headless(collector, metrics)
+    else:
+        try:
+            monitor = DualInterfaceMonitor(devices, pc=pc, collector=collector)
+        except tk.TclError as e:
+            print(f"❌ Cannot open a window ({e}) - use --headless")
+            collector.stop()
+            if metrics:
+                metrics.stop()
+            raise SystemExit(1)
+        monitor.run()
+        if metrics:
+            metrics.stop()
\ No newline at end of file
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Frame Mailbox - Single-slot, latest-wins handoff between a producer and a slower consumer
+"""
+
+import threading
+
+import numpy as np
+
+
+class LatestMailbox:
+    """
+    Holds at most one item. put() never blocks and replaces any item the
+    consumer has not taken yet, so the consumer always gets the newest one
+    and a slow consumer can never back up the producer.
+    """
+
+    def __init__(self):
+        self.cond = threading.Condition(threading.Lock())
+        self.item = None
+        self.has_item = False
+        self.closed = False
+        self.put_count = 0
+        self.dropped = 0  # items replaced before the consumer took them
+
+    def put(self, item):
+        """Publish item, replacing any untaken one"""
+        with self.cond:
+            if self.has_item:
+                self.dropped += 1
+            self.item = item
+            self.has_item = True
+            self.put_count += 1
+            self.cond.notify()
+
+    def get(self, timeout=None):
+        """Take the newest item, waiting up to timeout; None on timeout or close"""
+        with self.cond:
+            if not self.has_item and not self.closed:
+                self.cond.wait(timeout)
+            if not self.has_item:
+                return None
+            item = self.item
+            self.item = None
+            self.has_item = False
+            return item
+
+    def get_nowait(self):
+        """Take the newest item if there is one, else None"""
+        return self.get(timeout=0)
+
+    def close(self):
+        """Wake any waiting consumer; later gets return None once drained"""
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+class LatestFrameMailbox(LatestMailbox):
+    """
+    LatestMailbox for DepthFrames whose depth is a view into the receiver's
+    buffer ring. put() copies the depth into one of three buffers owned by
+    the mailbox, so the receiver may reuse its buffer at once. A taken
+    frame stays valid until the consumer's next get(): the producer only
+    writes the buffer that is neither waiting nor being read.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.buffers = [None, None, None]
+        self.waiting = None   # buffer index of the untaken frame
+        self.reading = None   # buffer index of the frame the consumer took last
+
+    def put(self, frame):
+        """Copy frame.depth into a free buffer and publish it (frame.raw is dropped)"""
+        with self.cond:
+            index = next(i for i in range(len(self.buffers)) if i != self.waiting and i != self.reading)
+        buffer = self.buffers[index]
+        if buffer is None or buffer.shape != frame.depth.shape or buffer.dtype != frame.depth.dtype:
+            buffer = self.buffers[index] = np.empty_like(frame.depth)
+        np.copyto(buffer, frame.depth)
+        item = frame._replace(depth=buffer, raw=None)
+        with self.cond:
+            if self.has_item:
+                self.dropped += 1
+            self.item = item
+            self.has_item = True
+            self.waiting = index
+            self.put_count += 1
+            self.cond.notify()
+
+    def get(self, timeout=None):
+        """Take the newest frame; the previously taken one may be overwritten from now on"""
+        with self.cond:
+            if not self.has_item and not self.closed:
+                self.cond.wait(timeout)
+            if not self.has_item:
+                return None
+            item = self.item
+            self.item = None
+            self.has_item = False
+            self.reading = self.waiting
+            self.waiting = None
+            return item
@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""
+H.264 Analyzer - NAL types, GOP structure, frame sizes and SPS parameters
+of the Annex B streams on 5000-5002, measured in the monitor's single pass
+
+Extends the access-unit scanner: every NAL unit the scanner finds is also
+classified, frame sizes are the distances between access-unit starts in the
+byte stream, and only the few header bytes that are parsed (SPS, slice_type)
+are ever copied, so no frame is buffered.
+"""
+
+import socket
+import time
+
+from device_config import add_device_arguments, apply_device
+from log_histogram import LogHistogram
+from stream_scanner import H264AccessUnitScanner, START_CODE
+
+NAL_NAMES = {1: 'non-IDR', 5: 'IDR', 6: 'SEI', 7: 'SPS', 8: 'PPS', 9: 'AUD'}
+
+PROFILE_NAMES = {
+    66: 'Baseline', 77: 'Main', 88: 'Extended', 100: 'High', 110: 'High 10',
+    122: 'High 4:2:2', 244: 'High 4:4:4', 44: 'CAVLC 4:4:4',
+}
+# Profiles whose SPS carries chroma format / bit depth / scaling matrices
+HIGH_PROFILES = frozenset((100, 110, 122, 244, 44, 83, 86, 118, 128, 138, 139, 134, 135))
+
+# slice_type % 5
+SLICE_KINDS = {0: 'P', 1: 'B', 2: 'I', 3: 'P', 4: 'I'}  # SP/SI counted as P/I
+FRAME_KINDS = ('I', 'P', 'B')
+
+# Bytes after a start code needed to read the NAL header, first_mb_in_slice and slice_type
+SLICE_LOOKAHEAD = 8
+# An SPS is a few dozen bytes; stop collecting after this many
+MAX_SPS_BYTES = 256
+
+
+class BitReader:
+    """MSB-first bit reader with Exp-Golomb codes over an RBSP (IndexError past the end)"""
+
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def u(self, nbits):
+        value = 0
+        for _ in range(nbits):
+            value = (value << 1) | ((self.data[self.pos >> 3] >> (7 - (self.pos & 7))) & 1)
+            self.pos += 1
+        return value
+
+    def ue(self, limit=31):
+        zeros = 0
+        while not self.u(1):
+            zeros += 1
+            if zeros > limit:
+                raise ValueError("Exp-Golomb code too long")
+        return (1 << zeros) - 1 + self.u(zeros)
+
+    def se(self):
+        code = self.ue()
+        return (code + 1) // 2 if code & 1 else -(code // 2)
+
+
+def unescape_rbsp(data):
+    """Drop emulation prevention bytes (00 00 03 -> 00 00)"""
+    data = bytes(data)
+    if b'\x00\x00\x03' not in data:
+        return data
+    out = bytearray()
+    zeros = 0
+    for byte in data:
+        if zeros >= 2 and byte == 3:
+            zeros = 0
+            continue
+        out.append(byte)
+        zeros = zeros + 1 if byte == 0 else 0
+    return bytes(out)
+
+
+def _skip_scaling_list(bits, size):
+    last = next_scale = 8
+    for _ in range(size):
+        if next_scale:
+            next_scale = (last + bits.se() + 256) % 256
+        last = next_scale or last
+
+
+def parse_sps(rbsp):
+    """SPS payload (after the NAL header byte) -> dict of profile, level and cropped size"""
+    bits = BitReader(unescape_rbsp(rbsp))
+    profile_idc = bits.u(8)
+    constraints = bits.u(8)
+    level_idc = bits.u(8)
+    bits.ue()                                   # seq_parameter_set_id
+    chroma_format_idc = 1
+    separate_colour_plane = 0
+    if profile_idc in HIGH_PROFILES:
+        chroma_format_idc = bits.ue()
+        if chroma_format_idc == 3:
+            separate_colour_plane = bits.u(1)
+        bits.ue()                               # bit_depth_luma_minus8
+        bits.ue()                               # bit_depth_chroma_minus8
+        bits.u(1)                               # qpprime_y_zero_transform_bypass_flag
+        if bits.u(1):                           # seq_scaling_matrix_present_flag
+            for i in range(8 if chroma_format_idc != 3 else 12):
+                if bits.u(1):
+                    _skip_scaling_list(bits, 16 if i < 6 else 64)
+    bits.ue()                                   # log2_max_frame_num_minus4
+    poc_type = bits.ue()
+    if poc_type == 0:
+        bits.ue()                               # log2_max_pic_order_cnt_lsb_minus4
+    elif poc_type == 1:
+        bits.u(1)
+        bits.se()
+        bits.se()
+        for _ in range(bits.ue()):
+            bits.se()
+    bits.ue()                                   # max_num_ref_frames
+    bits.u(1)                                   # gaps_in_frame_num_value_allowed_flag
+    width_mbs = bits.ue() + 1
+    height_units = bits.ue() + 1
+    frame_mbs_only = bits.u(1)
+    if not frame_mbs_only:
+        bits.u(1)                               # mb_adaptive_frame_field_flag
+    bits.u(1)                                   # direct_8x8_inference_flag
+    crop = (0, 0, 0, 0)
+    if bits.u(1):                               # frame_cropping_flag
+        crop = (bits.ue(), bits.ue(), bits.ue(), bits.ue())
+
+    # Crop offsets are in chroma sample units (Table 6-1)
+    if chroma_format_idc == 0 or separate_colour_plane:
+        crop_x, crop_y = 1, 2 - frame_mbs_only
+    else:
+        crop_x = 1 if chroma_format_idc == 3 else 2
+        crop_y = (2 if chroma_format_idc == 1 else 1) * (2 - frame_mbs_only)
+    width = width_mbs * 16 - crop_x * (crop[0] + crop[1])
+    height = (2 - frame_mbs_only) * height_units * 16 - crop_y * (crop[2] + crop[3])
+
+    profile = PROFILE_NAMES.get(profile_idc, f'profile {profile_idc}')
+    if profile_idc == 66 and constraints & 0x40:
+        profile = 'Constrained Baseline'
+    return {
+        'profile': profile,
+        'profile_idc': profile_idc,
+        'level': level_idc / 10.0,
+        'width': width,
+        'height': height,
+        'interlaced': not frame_mbs_only,
+    }
+
+
+class H264StreamAnalyzer(H264AccessUnitScanner):
+    """
+    Access-unit scanner that also measures the stream structure.
+
+    A frame ends where the next access unit starts, so its size, type (from
+    the slice_type of its first slice; IDR counted as I) and GOP position are
+    recorded one frame late. GOP length counts frames from one I frame to
+    the next; IDR spacing only counts IDR frames.
+
+    Everything runs on the thread that feeds the scanner; summary() is meant
+    to be called from that thread too, once per reporting interval, and
+    starts a new window for the I/P/B bitrate split.
+    """
+
+    overlap = SLICE_LOOKAHEAD
+
+    def __init__(self, chunk_size=65536):
+        super().__init__(chunk_size)
+        self.base = 0                      # stream offset of buffer[0] during a scan
+        self.scan_end = 0                  # valid bytes in the buffer during a scan
+        self.nal_counts = [0] * 32
+
+        self.frame_start = None            # stream offset of the current access unit
+        self.frame_kind = None
+        self.frame_idr = False
+        self.sizes = LogHistogram(min_value=64, max_value=16e6)
+        self.kind_frames = dict.fromkeys(FRAME_KINDS, 0)
+        self.kind_bytes = dict.fromkeys(FRAME_KINDS, 0)
+
+        self.since_i = None                # frames since the last I frame (None until the first)
+        self.since_idr = None
+        self.last_idr_time = None
+        self.gop = 0
+        self.gop_count = 0
+        self.gop_total = 0
+        self.idr_spacing = 0
+        self.idr_interval = 0.0            # seconds between the last two IDR frames (arrival)
+
+        self.sps = None                    # parsed SPS dict
+        self.sps_data = None               # SPS bytes being collected, None when not collecting
+        self.sps_next = 0                  # stream offset of the next SPS byte to collect
+        self.sps_limit = 0                 # stream offset where collection stops
+
+        self.window_start = time.monotonic()
+        self.window_bytes = dict.fromkeys(FRAME_KINDS, 0)
+
+    def reset(self):
+        """New connection: partial frame, GOP position and SPS collection start over"""
+        super().reset()
+        self.frame_start = None
+        self.frame_kind = None
+        self.frame_idr = False
+        self.since_i = None
+        self.since_idr = None
+        self.last_idr_time = None
+        self.sps_data = None
+        self.window_start = time.monotonic()
+        self.window_bytes = dict.fromkeys(FRAME_KINDS, 0)
+
+    def _scan(self, end):
+        buf = self.buffer
+        find = buf.find
+        self.base = self.byte_count - end
+        self.scan_end = end
+        if self.sps_data is not None:
+            self._collect_sps(self.sps_next - self.base)
+
+        pos = 0
+        consumed = 0
+        while True:
+            hit = find(START_CODE, pos, end)
+            if hit == -1:
+                break
+            if hit + SLICE_LOOKAHEAD >= end:
+                # Slice header bytes not received yet
+                return hit
+            self._on_nal(buf[hit + 3] & 0x1F, hit)
+            pos = consumed = hit + 3
+        # Keep the last 2 bytes in case they are the start of a split start code
+        return max(end - 2, consumed)
+
+    def _on_nal(self, nal_type, offset):
+        frames = self.frame_count
+        super()._on_nal(nal_type, offset)
+        if self.frame_count != frames:
+            self._end_frame(self.base + offset)
+        self.nal_counts[nal_type] += 1
+
+        if nal_type == 1 or nal_type == 5:
+            if nal_type == 5:
+                self.frame_idr = True
+            # Type of the picture from its first slice (first_mb_in_slice == 0)
+            if self.frame_kind is None and self.buffer[offset + 4] & 0x80:
+                bits = BitReader(self.buffer[offset + 4:offset + SLICE_LOOKAHEAD + 1])
+                try:
+                    bits.u(1)
+                    self.frame_kind = SLICE_KINDS[bits.ue(limit=7) % 5]
+                except (IndexError, ValueError):
+                    pass
+        elif nal_type == 7:
+            self.sps_data = bytearray()
+            self.sps_limit = self.base + offset + 4 + MAX_SPS_BYTES
+            self._collect_sps(offset + 4)
+
+    def _collect_sps(self, start):
+        """Append SPS bytes from buffer[start:] up to the next start code, parse once it is complete"""
+        end = min(self.scan_end, self.sps_limit - self.base)
+        stop = self.buffer.find(START_CODE, start, end)
+        if stop != -1:
+            end = stop
+        self.sps_data += self.buffer[start:end]
+        self.sps_next = self.base + end
+        if stop != -1 or self.sps_next >= self.sps_limit:
+            try:
+                self.sps = parse_sps(self.sps_data)
+            except (IndexError, ValueError):
+                pass
+            self.sps_data = None
+
+    def _end_frame(self, offset):
+        """Close the access unit that ends at stream offset, open the next one"""
+        if self.frame_start is not None:
+            kind = 'I' if self.frame_idr else self.frame_kind or 'P'
+            size = offset - self.frame_start
+            self.sizes.record(size)
+            self.kind_frames[kind] += 1
+            self.kind_bytes[kind] += size
+            self.window_bytes[kind] += size
+
+            if kind == 'I':
+                if self.since_i is not None:
+                    self.gop = self.since_i
+                    self.gop_count += 1
+                    self.gop_total += self.since_i
+                self.since_i = 1
+            elif self.since_i is not None:
+                self.since_i += 1
+
+            if self.frame_idr:
+                now = time.monotonic()
+                if self.since_idr is not None:
+                    self.idr_spacing = self.since_idr
+                    self.idr_interval = now - self.last_idr_time
+                self.since_idr = 1
+                self.last_idr_time = now
+            elif self.since_idr is not None:
+                self.since_idr += 1
+
+        self.frame_start = offset
+        self.frame_kind = None
+        self.frame_idr = False
+
+    def finish(self):
+        """End of input: record the last access unit, which has no successor to close it"""
+        self._end_frame(self.byte_count)
+        self.frame_start = None
+
+    def summary(self):
+        """Stream structure so far plus the I/P/B bitrate of the window since the last call"""
+        now = time.monotonic()
+        elapsed = max(now - self.window_start, 1e-6)
+        window_total = sum(self.window_bytes.values())
+        rates = {kind: self.window_bytes[kind] * 8 / elapsed / 1e6 for kind in FRAME_KINDS}
+        i_share = self.window_bytes['I'] / window_total if window_total else 0.0
+        self.window_start = now
+        self.window_bytes = dict.fromkeys(FRAME_KINDS, 0)
+
+        p50, p95, p99 = self.sizes.percentiles()
+        sps = self.sps or {}
+        counts = self.nal_counts
+        return {
+            'nal_counts': {name: counts[nal_type] for nal_type, name in NAL_NAMES.items()},
+            'other_nals': sum(counts) - sum(counts[nal_type] for nal_type in NAL_NAMES),
+            'profile': sps.get('profile'),
+            'level': sps.get('level'),
+            'width': sps.get('width'),
+            'height': sps.get('height'),
+            'frames': dict(self.kind_frames),
+            'gop': self.gop,
+            'avg_gop': self.gop_total / self.gop_count if self.gop_count else 0.0,
+            'idr_spacing': self.idr_spacing,
+            'idr_interval': self.idr_interval,
+            'frame_p50': p50,
+            'frame_p95': p95,
+            'frame_p99': p99,
+            'frame_max': self.sizes.max if self.sizes.count else 0,
+            'i_frame_avg': self.kind_bytes['I'] / self.kind_frames['I'] if self.kind_frames['I'] else 0.0,
+            'p_frame_avg': self.kind_bytes['P'] / self.kind_frames['P'] if self.kind_frames['P'] else 0.0,
+            'i_mbps': rates['I'],
+            'p_mbps': rates['P'],
+            'b_mbps': rates['B'],
+            'i_share': i_share,
+        }
+
+
+def format_summary(s, timed=True):
+    """Lines describing an analyzer summary; timed=False leaves out arrival-time rates (file input)"""
+    resolution = f"{s['width']}x{s['height']}" if s['width'] else 'no SPS yet'
+    profile = f"{s['profile']} @ L{s['level']:g}" if s['profile'] else ''
+    counts = ' '.join(f"{name} {count}" for name, count in s['nal_counts'].items() if count)
+    if not s['idr_spacing']:
+        idr = 'IDR spacing n/a'
+    elif timed:
+        idr = f"IDR every {s['idr_spacing']} frames ({s['idr_interval']:.2f}s)"
+    else:
+        idr = f"IDR every {s['idr_spacing']} frames"
+    if timed:
+        split = f"Bitrate I {s['i_mbps']:.2f} / P {s['p_mbps']:.2f} Mbps (I share {s['i_share'] * 100:.0f}%)"
+    else:
+        split = f"I frames {s['i_share'] * 100:.0f}% of bytes"
+    return [
+        f"SPS: {resolution} {profile} | GOP {s['gop']} (avg {s['avg_gop']:.1f}) | {idr}",
+        f"Frame KB p50 {s['frame_p50'] / 1024:.1f} p95 {s['frame_p95'] / 1024:.1f} p99 {s['frame_p99'] / 1024:.1f} | "
+        f"I avg {s['i_frame_avg'] / 1024:.1f} KB, P avg {s['p_frame_avg'] / 1024:.1f} KB",
+        f"{split} | NALs: {counts}",
+    ]
+
+
+def analyze_file(path, chunk_size=65536):
+    """Whole-file analysis of a captured elementary stream"""
+    analyzer = H264StreamAnalyzer(chunk_size)
+    start = time.perf_counter()
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                break
+            analyzer.feed(data)
+    analyzer.finish()
+    elapsed = time.perf_counter() - start
+    print(f"📁 {path}: {analyzer.byte_count / 1e6:.1f} MB, {analyzer.frame_count} frames, "
+          f"analyzed at {analyzer.byte_count / elapsed / 1e6:.0f} MB/s")
+    for line in format_summary(analyzer.summary(), timed=False):
+        print(f"  {line}")
+
+
+def analyze_live(pi_ip, port):
+    """Connect to one stream and print the analysis every second"""
+    analyzer = H264StreamAnalyzer()
+    try:
+        sock = socket.create_connection((pi_ip, port), timeout=5.0)
+    except OSError as e:
+        print(f"❌ Cannot connect to {pi_ip}:{port}: {e}")
+        return
+    print(f"✅ Analyzing H.264 on {pi_ip}:{port} (Ctrl+C to stop)")
+    last_report = time.time()
+    last_frames = 0
+    try:
+        while True:
+            if not analyzer.recv_from(sock):
+                print("Stream ended")
+                break
+            now = time.time()
+            if now - last_report >= 1.0:
+                fps = (analyzer.frame_count - last_frames) / (now - last_report)
+                print(f"{fps:5.1f} fps | " + "\n             ".join(format_summary(analyzer.summary())))
+                last_report = now
+                last_frames = analyzer.frame_count
+    except socket.timeout:
+        print("❌ No data for 5s")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sock.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='H.264 stream analyzer: NAL types, GOP, frame sizes, SPS')
+    ports = (('--port', 'rgb'),)
+    add_device_arguments(parser, ports=ports)
+    parser.add_argument('--file', help='Analyze a captured .h264 elementary stream instead')
+
+    args = parser.parse_args()
+
+    if args.file:
+        analyze_file(args.file)
+    else:
+        apply_device(args, ports)
+        analyze_live(args.ip, args.port)
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+IMU / Depth Synchronizer - Joins depth frames with the IMU samples around them
+
+IMU samples go into a sorted timeline: new samples wait in a small staging
+area until the newest sensor time is reorder_window past them, are sorted
+there and only then committed to an IMURing, so the committed part is always
+sorted and late datagrams inside the window still land in order. Samples
+older than what was already committed are counted and dropped.
+
+Depth timestamp_us and IMU timestamps come from the same device clock;
+time_offset (seconds) is added to depth times if they do not.
+"""
+
+import socket
+import threading
+import time
+from collections import deque, namedtuple
+
+import numpy as np
+
+from depth_receiver import DepthStreamReceiver
+from device_config import add_device_arguments, apply_device
+from imu_protocol import decode_datagram, register_imu
+from imu_ring import IMURing, T, ARRIVAL, SENSORS
+from session_recorder import SessionReader
+
+# imu: (8, k) view of the samples from the previous frame to this one, padded
+# with one sample on each side; accel/gyro: interpolated at the frame time.
+# complete is False when IMU did not cover the frame before it was released.
+SyncedFrame = namedtuple('SyncedFrame', ['frame', 'time', 'imu', 'accel', 'gyro', 'complete'])
+
+
+class IMUTimeline:
+    """Sorted IMU history with binary-search queries (times in seconds)"""
+
+    def __init__(self, capacity=131072, reorder_window=0.05):
+        self.ring = IMURing(capacity)
+        self.reorder_window = reorder_window
+        self.staging = np.empty((0, 8))
+        self.newest = -np.inf      # largest sensor time seen
+        self.committed_end = -np.inf  # sensor time up to which the timeline is final
+
+        self.late_dropped = 0
+        self.duplicates = 0
+
+    def add(self, samples, arrival_time):
+        """Add an (N, 7) batch (t, ax..gz) in any order"""
+        if not len(samples):
+            return
+        batch = np.empty((len(samples), 8))
+        batch[:, :7] = samples
+        batch[:, ARRIVAL] = arrival_time
+
+        late = batch[:, T] <= self.committed_end
+        if late.any():
+            self.late_dropped += int(late.sum())
+            batch = batch[~late]
+        self.staging = np.concatenate((self.staging, batch)) if len(self.staging) else batch
+        self.newest = max(self.newest, float(batch[:, T].max())) if len(batch) else self.newest
+        self.commit(self.newest - self.reorder_window)
+
+    def commit(self, until):
+        """Move staged samples with t <= until into the sorted ring"""
+        if not len(self.staging):
+            return
+        staged = self.staging[np.argsort(self.staging[:, T], kind='stable')]
+        split = int(np.searchsorted(staged[:, T], until, side='right'))
+        if not split:
+            self.staging = staged
+            return
+        ready = staged[:split]
+        # Same sensor time twice (duplicated datagram): keep the first
+        keep = np.empty(len(ready), dtype=bool)
+        keep[0] = ready[0, T] > self.committed_end
+        keep[1:] = ready[1:, T] > ready[:-1, T]
+        if not keep.all():
+            self.duplicates += int((~keep).sum())
+            ready = ready[keep]
+        if len(ready):
+            self.ring.append(ready[:, :7], ready[:, ARRIVAL])
+            self.committed_end = float(ready[-1, T])
+        self.staging = staged[split:]
+
+    def flush(self):
+        """Commit everything staged (end of stream / offline use)"""
+        self.commit(np.inf)
+
+    def times(self):
+        return self.ring.window()[T]
+
+    def covers(self, t):
+        """True once the committed timeline has reached time t"""
+        return t <= self.committed_end
+
+    def between(self, t0, t1, pad=True):
+        """
+        (8, k) view of samples with t0 < t <= t1; with pad, also the last
+        sample at or before t0 and the first after t1, so the interval can be
+        interpolated at both ends
+        """
+        window = self.ring.window()
+        times = window[T]
+        lo = int(np.searchsorted(times, t0, side='right'))
+        hi = int(np.searchsorted(times, t1, side='right'))
+        if pad:
+            lo = max(lo - 1, 0)
+            hi = min(hi + 1, len(times))
+        return window[:, lo:hi]
+
+    def interpolate(self, t):
+        """
+        Linearly interpolated (ax..gz) at t: shape (6,) for a scalar, (6, M)
+        for an array of times. NaN outside the committed range.
+        """
+        window = self.ring.window()
+        return interpolate_samples(window[T], window[SENSORS], t)
+
+    def batch(self, frame_times, pad=True):
+        """Vectorized offline query: (starts, ends, values) for sorted frame_times"""
+        window = self.ring.window()
+        return sync_batch(window[T], window[SENSORS], frame_times, pad)
+
+
+def interpolate_samples(times, values, t):
+    """np.interp per sensor column; values is (6, n) sorted by times"""
+    t = np.asarray(t, dtype=np.float64)
+    out = np.full((values.shape[0],) + t.shape, np.nan)
+    if len(times) < 2:
+        return out
+    for column in range(values.shape[0]):
+        out[column] = np.interp(t, times, values[column], left=np.nan, right=np.nan)
+    return out
+
+
+def sync_batch(times, values, frame_times, pad=True):
+    """
+    For each frame i, IMU indices starts[i]:ends[i] cover (frame_times[i-1],
+    frame_times[i]] (padded by one sample each side), plus (6, M) values
+    interpolated at every frame time. One searchsorted call for all frames.
+    """
+    frame_times = np.asarray(frame_times, dtype=np.float64)
+    edges = np.searchsorted(times, frame_times, side='right')
+    # The first frame has no previous one: its interval is empty (padding only)
+    starts = np.concatenate((edges[:1], edges[:-1]))
+    ends = edges.copy()
+    if pad:
+        starts = np.maximum(starts - 1, 0)
+        ends = np.minimum(ends + 1, len(times))
+    return starts, ends, interpolate_samples(times, values, frame_times)
+
+
+class DepthIMUSynchronizer:
+    """
+    Live pairing: add_imu() from the IMU thread, add_depth() from the depth
+    thread, pop_ready() from the consumer. A frame is released once the IMU
+    timeline is final past its time, or incomplete when more than
+    max_pending frames are waiting (IMU stalled). Frames are held, not
+    copied, so max_pending must stay below the receiver's num_buffers.
+    """
+
+    def __init__(self, capacity=131072, reorder_window=0.05, time_offset=0.0, max_pending=30):
+        self.timeline = IMUTimeline(capacity, reorder_window)
+        self.time_offset = time_offset
+        self.max_pending = max_pending
+        self.pending = deque()
+        self.lock = threading.Lock()
+        self.previous_time = None
+
+        self.frames_synced = 0
+        self.frames_incomplete = 0
+
+    def add_imu(self, samples, arrival_time):
+        self.timeline.add(samples, arrival_time)
+
+    def add_depth(self, frame):
+        """Queue a DepthFrame (the consumer must take it before its buffer is reused)"""
+        with self.lock:
+            self.pending.append((frame, frame.timestamp_us / 1e6 + self.time_offset))
+
+    def pop_ready(self):
+        """List of SyncedFrame for every frame that can be released now, oldest first"""
+        released = []
+        with self.lock:
+            while self.pending:
+                frame, t = self.pending[0]
+                complete = self.timeline.covers(t)
+                if not complete and len(self.pending) <= self.max_pending:
+                    break
+                self.pending.popleft()
+                released.append((frame, t, complete))
+
+        synced = []
+        for frame, t, complete in released:
+            start = self.previous_time if self.previous_time is not None else t
+            imu = self.timeline.between(start, t)
+            values = self.timeline.interpolate(t)
+            self.previous_time = t
+            if complete:
+                self.frames_synced += 1
+            else:
+                self.frames_incomplete += 1
+            synced.append(SyncedFrame(frame, t, imu, values[:3], values[3:], complete))
+        return synced
+
+
+def sync_session(reader, time_offset=0.0):
+    """
+    Offline: (frame_times, starts, ends, values, imu_samples) for a recorded
+    session, where imu_samples is the sorted (N, 7) IMU of the whole session
+    and starts/ends index into it per depth frame.
+    """
+    samples = reader.imu_samples()
+    order = np.argsort(samples[:, 0], kind='stable')
+    samples = samples[order]
+    frame_times = reader.depth_times.astype(np.float64) / 1e6 + time_offset
+    starts, ends, values = sync_batch(samples[:, 0], samples[:, 1:].T, frame_times)
+    return frame_times, starts, ends, values, samples
+
+
+def print_session_sync(directory, time_offset=0.0):
+    with SessionReader(directory) as reader:
+        frame_times, starts, ends, values, samples = sync_session(reader, time_offset)
+    counts = ends - starts
+    covered = ~np.isnan(values[0])
+    print(f"📁 {directory}")
+    print(f"Depth frames: {len(frame_times)} | IMU samples: {len(samples)}")
+    if len(frame_times):
+        print(f"Frames inside the IMU time range: {covered.sum()} / {len(frame_times)}")
+        print(f"IMU samples per frame (padded): min {counts.min()} | mean {counts.mean():.1f} | max {counts.max()}")
+
+
+def run_live(pi_ip, depth_port, imu_port, time_offset, num_buffers=8):
+    receiver = DepthStreamReceiver(pi_ip=pi_ip, port=depth_port, num_buffers=num_buffers)
+    sync = DepthIMUSynchronizer(time_offset=time_offset, max_pending=num_buffers - 2)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.settimeout(1.0)
+    running = threading.Event()
+    running.set()
+
+    def imu_loop():
+        recv_buffer = bytearray(65535)
+        recv_view = memoryview(recv_buffer)
+        while running.is_set():
+            try:
+                nbytes = sock.recv_into(recv_view)
+                batch = decode_datagram(recv_view[:nbytes])
+            except (socket.timeout, ValueError):
+                continue
+            except OSError:
+                break
+            sync.add_imu(batch.samples, time.time())
+
+    try:
+        if not register_imu(sock, pi_ip, imu_port):
+            print(f"❌ No response from IMU server at {pi_ip}:{imu_port}")
+            return
+        receiver.connect()
+        print(f"✅ Synchronizing depth {pi_ip}:{depth_port} with IMU {pi_ip}:{imu_port} (Ctrl+C to stop)")
+        threading.Thread(target=imu_loop, daemon=True).start()
+
+        last_report = time.time()
+        per_frame = []
+        for frame in receiver.frames():
+            sync.add_depth(frame)
+            for synced in sync.pop_ready():
+                per_frame.append(synced.imu.shape[1])
+                latest = synced
+            now = time.time()
+            if now - last_report >= 1.0 and per_frame:
+                timeline = sync.timeline
+                print(f"Frame {latest.frame.seq} t={latest.time:.3f}s | IMU/frame {np.mean(per_frame):.1f} | "
+                      f"accel {np.array2string(latest.accel, precision=2)} | "
+                      f"synced {sync.frames_synced} incomplete {sync.frames_incomplete} | "
+                      f"late {timeline.late_dropped} dup {timeline.duplicates}")
+                per_frame = []
+                last_report = now
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print(f"❌ Sync error: {e}")
+    finally:
+        running.clear()
+        receiver.close()
+        sock.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='OAK-D Pro Depth / IMU Synchronizer')
+    ports = (('--depth-port', 'depth'), ('--imu-port', 'imu'))
+    add_device_arguments(parser, ports=ports)
+    parser.add_argument('--offset', type=float, default=0.0, help='Seconds added to depth timestamps (default: 0)')
+    parser.add_argument('--session', metavar='DIR', help='Analyze a session_recorder.py recording instead')
+
+    args = parser.parse_args()
+
+    if args.session:
+        print_session_sync(args.session, args.offset)
+    else:
+        apply_device(args, ports)
+        run_live(args.ip, args.depth_port, args.imu_port, args.offset)
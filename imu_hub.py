@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+IMU Hub - One UDP socket and one receive thread for the IMU streams of every device
+
+The socket registers with each device's IMU port and demultiplexes the
+datagrams by source address into per-device sample rings and link
+telemetry, so N devices cost one thread instead of N. Registration does
+not block: IMU_ACK is handled in the receive loop, and a device that has
+been silent for IMU_REREGISTER_SECONDS is registered again (as IMURelay
+does), so devices may come up in any order.
+"""
+
+import socket
+import threading
+import time
+
+from imu_protocol import ACK_MESSAGE, IMU_REREGISTER_SECONDS, REGISTER_MESSAGE, decode_datagram
+from imu_ring import IMURing
+from imu_telemetry import IMULinkTelemetry
+
+# Seconds between registration checks
+REGISTER_INTERVAL = 1.0
+
+
+class IMUDeviceState:
+    """Samples and counters of one device (written by the hub thread only)"""
+
+    def __init__(self, device, history_capacity):
+        self.device = device
+        self.addr = (device.ip, device.port('imu'))
+        self.history = IMURing(history_capacity)   # shared numpy columns, single writer
+        self.telemetry = IMULinkTelemetry()        # loss / reordering / jitter of the link
+        self.registered = False
+        self.packet_count = 0
+        self.sample_count = 0
+        self.parse_errors = 0
+        self.first_update = None
+        self.last_update = None
+
+        # History count at the last rendered frame (owned by the display)
+        self.rendered_mark = 0
+
+    def rate(self, now=None):
+        """Average samples per second since the first datagram"""
+        if self.first_update is None:
+            return 0.0
+        elapsed = (now or time.time()) - self.first_update
+        return self.sample_count / elapsed if elapsed > 0 else 0.0
+
+    def silent_for(self, now=None):
+        """Seconds since the last datagram, None before the first"""
+        if self.last_update is None:
+            return None
+        return (now or time.time()) - self.last_update
+
+    def take_interval(self):
+        """View of the samples received since the previous call, as a (8, N) array"""
+        mark = self.history.count
+        interval = self.history.since(self.rendered_mark, mark)
+        self.rendered_mark = mark
+        return interval
+
+
+class IMUHub:
+    """Receives the IMU streams of the given devices (those that have one) on one thread"""
+
+    def __init__(self, devices, history_capacity=131072):
+        self.states = [IMUDeviceState(device, history_capacity) for device in devices if device.port('imu')]
+        self.by_addr = {state.addr: state for state in self.states}
+        # Fallback for replies from another source port (NAT, relays bound elsewhere)
+        self.by_ip = {}
+        for state in self.states:
+            self.by_ip.setdefault(state.addr[0], state)
+        self.unknown = 0   # datagrams from addresses that are not a configured device
+        self.running = False
+        self.sock = None
+        self.thread = None
+
+        # Reused receive buffer (largest UDP payload)
+        self.recv_buffer = bytearray(65535)
+        self.recv_view = memoryview(self.recv_buffer)
+
+    def start(self):
+        """Open the socket, register with every device and start the receive thread"""
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.settimeout(0.2)
+        self.running = True
+        for state in self.states:
+            self.register(state)
+        self.thread = threading.Thread(target=self.receive_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+        if self.sock:
+            self.sock.close()
+
+    def wait_registered(self, timeout):
+        """Wait until every device acknowledged or timeout passed; returns the registered states"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and not all(state.registered for state in self.states):
+            time.sleep(0.05)
+        return [state for state in self.states if state.registered]
+
+    def register(self, state):
+        try:
+            self.sock.sendto(REGISTER_MESSAGE, state.addr)
+        except OSError:
+            pass
+
+    def check_registrations(self):
+        """Register again with devices that are not (or no longer) sending"""
+        now = time.time()
+        for state in self.states:
+            silent = state.silent_for(now)
+            if silent is not None and silent > IMU_REREGISTER_SECONDS:
+                state.registered = False
+            if silent is None or silent > IMU_REREGISTER_SECONDS:
+                self.register(state)
+
+    def receive_loop(self):
+        """Drain the socket continuously; registration checks ride on the receive timeout"""
+        next_check = time.monotonic() + REGISTER_INTERVAL
+        while self.running:
+            if time.monotonic() >= next_check:
+                next_check += REGISTER_INTERVAL
+                self.check_registrations()
+            try:
+                nbytes, addr = self.sock.recvfrom_into(self.recv_view)
+            except socket.timeout:
+                continue
+            except OSError:
+                # Socket closed during shutdown
+                if self.running:
+                    time.sleep(0.1)
+                continue
+
+            state = self.by_addr.get(addr) or self.by_ip.get(addr[0])
+            if state is None:
+                self.unknown += 1
+                continue
+            data = self.recv_view[:nbytes]
+            if data == ACK_MESSAGE:
+                state.registered = True
+                continue
+            try:
+                batch = decode_datagram(data)
+            except ValueError:
+                state.parse_errors += 1
+                continue
+
+            now = time.time()
+            state.history.append(batch.samples, now)
+            state.telemetry.on_batch(batch.seq, batch.samples, now)
+            state.packet_count += 1
+            state.sample_count += len(batch.samples)
+            state.registered = True
+            if state.first_update is None:
+                state.first_update = now
+            state.last_update = now
@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+"""
+IMU Preintegration - Gyro bias, gravity-aligned orientation and per-interval
+rotation/velocity/position deltas, in chunked numpy
+
+Quaternions are [w, x, y, z] arrays of shape (..., 4) rotating body vectors
+into the world frame (z up). Each sample holds over [t_i, t_i+1) (zero-order
+hold). A chunk of N samples becomes N rotation increments Exp(omega * dt),
+combined by a log2(N)-step prefix scan (every step is one vectorized
+quaternion product), so there is no Python call per sample.
+
+  GyroBiasEstimator   gyro mean over stationary stretches (low accel/gyro
+                      variance, |a| close to g)
+  OrientationFilter   complementary filter: gyro prefix scan inside a chunk,
+                      then a tilt correction toward the chunk's mean gravity
+                      direction (yaw is gyro only)
+  preintegrate        on-manifold deltas between two times (depth frames),
+                      gravity not removed: v_j = v_i + g*dt + R_i*dv, etc.
+"""
+
+import socket
+import time
+from collections import deque, namedtuple
+
+import numpy as np
+
+from device_config import add_device_arguments, apply_device
+from imu_protocol import decode_datagram, register_imu
+from imu_ring import IMURing, T, ACCEL, GYRO
+
+GRAVITY = 9.80665
+IDENTITY = np.array([1.0, 0.0, 0.0, 0.0])
+
+# delta_q/delta_v/delta_p: rotation, velocity and position change over
+# [t0, t1] in the body frame at t0 (gravity not removed)
+Preintegrated = namedtuple('Preintegrated', ['t0', 't1', 'delta_q', 'delta_v', 'delta_p', 'count'])
+
+
+def quat_multiply(a, b):
+    """Hamilton product a * b, broadcasting over leading axes"""
+    aw, ax, ay, az = a[..., 0], a[..., 1], a[..., 2], a[..., 3]
+    bw, bx, by, bz = b[..., 0], b[..., 1], b[..., 2], b[..., 3]
+    out = np.empty(np.broadcast(aw, bw).shape + (4,))
+    out[..., 0] = aw * bw - ax * bx - ay * by - az * bz
+    out[..., 1] = aw * bx + ax * bw + ay * bz - az * by
+    out[..., 2] = aw * by - ax * bz + ay * bw + az * bx
+    out[..., 3] = aw * bz + ax * by - ay * bx + az * bw
+    return out
+
+
+def quat_conjugate(q):
+    out = np.array(q, dtype=np.float64)
+    out[..., 1:] *= -1.0
+    return out
+
+
+def quat_exp(rotvec):
+    """Rotation vectors (..., 3) in radians -> unit quaternions"""
+    angle = np.sqrt(np.einsum('...i,...i->...', rotvec, rotvec))
+    half = 0.5 * angle
+    # sin(half) / angle, with its series near zero
+    small = angle < 1e-8
+    scale = np.where(small, 0.5 - angle * angle / 48.0, np.sin(half) / np.where(small, 1.0, angle))
+    out = np.empty(rotvec.shape[:-1] + (4,))
+    out[..., 0] = np.cos(half)
+    out[..., 1:] = rotvec * scale[..., None]
+    return out
+
+
+def cross(a, b):
+    """np.cross for (..., 3) arrays without its axis-moving overhead (small chunks)"""
+    ax, ay, az = a[..., 0], a[..., 1], a[..., 2]
+    bx, by, bz = b[..., 0], b[..., 1], b[..., 2]
+    out = np.empty(np.broadcast(ax, bx).shape + (3,))
+    out[..., 0] = ay * bz - az * by
+    out[..., 1] = az * bx - ax * bz
+    out[..., 2] = ax * by - ay * bx
+    return out
+
+
+def quat_rotate(q, v):
+    """Rotate vectors v (..., 3) by unit quaternions q (..., 4)"""
+    w = q[..., :1]
+    u = q[..., 1:]
+    t = 2.0 * cross(u, v)
+    return v + w * t + cross(u, t)
+
+
+def quat_normalize(q):
+    return q / np.sqrt(np.einsum('...i,...i->...', q, q))[..., None]
+
+
+def quat_prefix_product(increments):
+    """
+    Inclusive scan q_k = d_0 * d_1 * ... * d_k of (N, 4) increments in
+    ceil(log2 N) vectorized steps (Hillis-Steele)
+    """
+    q = np.array(increments, dtype=np.float64)
+    shift = 1
+    n = len(q)
+    while shift < n:
+        q[shift:] = quat_multiply(q[:-shift], q[shift:])
+        shift *= 2
+    return quat_normalize(q)
+
+
+def tilt_from_accel(accel):
+    """Quaternion with zero yaw that rotates the measured up direction onto world z"""
+    up = accel / np.linalg.norm(accel)
+    z = np.array([0.0, 0.0, 1.0])
+    axis = np.cross(up, z)
+    sin_angle = np.linalg.norm(axis)
+    angle = np.arctan2(sin_angle, float(np.dot(up, z)))
+    if sin_angle < 1e-12:
+        return IDENTITY.copy() if angle < 1.0 else np.array([0.0, 1.0, 0.0, 0.0])
+    return quat_exp(axis / sin_angle * angle)
+
+
+def quat_to_euler(q):
+    """(roll, pitch, yaw) in radians of a body->world quaternion"""
+    w, x, y, z = q
+    roll = np.arctan2(2 * (w * x + y * z), 1 - 2 * (x * x + y * y))
+    pitch = np.arcsin(np.clip(2 * (w * y - z * x), -1.0, 1.0))
+    yaw = np.arctan2(2 * (w * z + x * y), 1 - 2 * (y * y + z * z))
+    return roll, pitch, yaw
+
+
+def hold_intervals(times, t0=None, t1=None):
+    """Zero-order-hold duration of each sample inside [t0, t1] (defaults: first sample, last sample)"""
+    t0 = times[0] if t0 is None else t0
+    t1 = times[-1] if t1 is None else t1
+    starts = np.clip(times, t0, t1)
+    ends = np.empty_like(starts)
+    ends[:-1] = starts[1:]
+    ends[-1] = t1
+    return np.maximum(ends - starts, 0.0)
+
+
+def preintegrate(times, accel, gyro, t0=None, t1=None, gyro_bias=None, accel_bias=None):
+    """
+    Preintegrated deltas over [t0, t1] from (N,) times and (N, 3) accel/gyro.
+    Samples before t0 contribute from t0 on (pass the padded slice of
+    IMUTimeline.between, which starts at or before t0).
+    """
+    times = np.asarray(times, dtype=np.float64)
+    if len(times) == 0:
+        return Preintegrated(t0, t1, IDENTITY.copy(), np.zeros(3), np.zeros(3), 0)
+    t0 = float(times[0]) if t0 is None else t0
+    t1 = float(times[-1]) if t1 is None else t1
+
+    dt = hold_intervals(times, t0, t1)
+    omega = gyro - gyro_bias if gyro_bias is not None else gyro
+    specific = accel - accel_bias if accel_bias is not None else accel
+
+    rotations = quat_prefix_product(quat_exp(omega * dt[:, None]))
+    # Rotation at the start of each sample's hold: exclusive scan
+    before = np.empty_like(rotations)
+    before[0] = IDENTITY
+    before[1:] = rotations[:-1]
+
+    dv = quat_rotate(before, specific) * dt[:, None]
+    velocity = np.cumsum(dv, axis=0)
+    # p += v_before * dt + 0.5 * R a dt^2, with v_before = velocity - dv
+    dp = (velocity - dv) * dt[:, None] + 0.5 * dv * dt[:, None]
+    return Preintegrated(t0, t1, rotations[-1], velocity[-1], dp.sum(axis=0), int(np.count_nonzero(dt)))
+
+
+def compose(a, b):
+    """Preintegration over [a.t0, b.t1] from two consecutive intervals"""
+    return Preintegrated(
+        a.t0, b.t1,
+        quat_normalize(quat_multiply(a.delta_q, b.delta_q)),
+        a.delta_v + quat_rotate(a.delta_q, b.delta_v),
+        a.delta_p + a.delta_v * (b.t1 - b.t0) + quat_rotate(a.delta_q, b.delta_p),
+        a.count + b.count,
+    )
+
+
+class GyroBiasEstimator:
+    """
+    Gyro bias from stationary stretches: over the last window seconds the
+    accel and gyro standard deviations are below their thresholds and |a| is
+    within gravity_tolerance of g. The bias then moves toward the window's
+    mean gyro with time constant tau. A steady turn is just as smooth, so a
+    window whose mean gyro exceeds max_bias (no MEMS gyro is that far off)
+    does not count as stationary.
+    """
+
+    def __init__(self, window=0.5, gyro_std=0.01, accel_std=0.05, gravity_tolerance=0.3,
+                 tau=2.0, gravity=GRAVITY, capacity=8192, max_bias=0.05):
+        self.window = window
+        self.gyro_std = gyro_std
+        self.max_bias = max_bias
+        self.accel_std = accel_std
+        self.gravity_tolerance = gravity_tolerance
+        self.tau = tau
+        self.gravity = gravity
+        self.ring = IMURing(capacity)
+
+        self.bias = np.zeros(3)
+        self.stationary = False
+        self.stationary_time = 0.0  # seconds of stationary data used so far
+        self.last_update = None     # sensor time the bias last moved
+
+    def update(self, samples):
+        """Add an (N, 7) chunk; returns True if the last window was stationary"""
+        if not len(samples):
+            return self.stationary
+        self.ring.append(samples, 0.0)
+        window = self.ring.window()
+        times = window[T]
+        start = int(np.searchsorted(times, times[-1] - self.window))
+        recent = window[:, start:]
+        span = times[-1] - times[start]
+        if span < 0.8 * self.window or recent.shape[1] < 8:
+            self.stationary = False
+            return False
+
+        accel = recent[ACCEL]
+        gyro = recent[GYRO]
+        norm = np.sqrt(np.einsum('ij,ij->j', accel, accel))
+        gyro_mean = gyro.mean(axis=1)
+        self.stationary = bool(
+            abs(norm.mean() - self.gravity) < self.gravity_tolerance and
+            np.all(accel.std(axis=1) < self.accel_std) and
+            np.all(gyro.std(axis=1) < self.gyro_std) and
+            np.all(np.abs(gyro_mean) < self.max_bias))
+        if self.stationary:
+            # Weight by the new data only, so chunk sizes do not change the time constant
+            new_time = times[-1] - (self.last_update if self.last_update is not None else times[start])
+            new_time = min(max(new_time, 0.0), span)
+            alpha = 1.0 - np.exp(-new_time / self.tau) if self.stationary_time else 1.0
+            self.bias += alpha * (gyro_mean - self.bias)
+            self.stationary_time += new_time
+            self.last_update = times[-1]
+        return self.stationary
+
+
+class OrientationFilter:
+    """
+    Complementary filter per chunk: gyro prefix scan from the current
+    orientation, then the mean world-frame accel direction of the chunk
+    (samples with |a| near g only) pulls roll/pitch toward level with time
+    constant tau. The first usable chunk initializes tilt from accel.
+    """
+
+    def __init__(self, tau=1.0, gravity=GRAVITY, gravity_tolerance=0.5, history=1.0):
+        self.tau = tau
+        self.gravity = gravity
+        self.gravity_tolerance = gravity_tolerance
+        self.history = history  # seconds of per-sample orientations kept for orientation_at
+
+        self.q = None           # current orientation (after the last sample)
+        self.t = None           # sensor time of self.q
+        self.recent = deque()   # (times, quaternions) of recent chunks
+        self.recent_rate = None # bias-corrected gyro of the last sample, held until the next one
+        self.corrections = 0
+
+    def update(self, samples, gyro_bias=None):
+        """Process an (N, 7) chunk, returns the (N, 4) orientation at each sample time"""
+        times = samples[:, 0]
+        accel = samples[:, 1:4]
+        gyro = samples[:, 4:7] - gyro_bias if gyro_bias is not None else samples[:, 4:7]
+
+        if self.q is None:
+            norm = np.linalg.norm(accel, axis=1)
+            usable = np.abs(norm - self.gravity) < self.gravity_tolerance
+            if not usable.any():
+                return np.tile(IDENTITY, (len(samples), 1))
+            self.q = tilt_from_accel(accel[usable].mean(axis=0))
+            self.t = float(times[0])
+
+        # Rotation over [t_prev, t_i] for every sample: hold the previous rate until each new sample
+        dt = np.empty(len(times))
+        dt[0] = max(times[0] - self.t, 0.0)
+        dt[1:] = np.maximum(np.diff(times), 0.0)
+        rates = np.empty_like(gyro)
+        rates[1:] = gyro[:-1]
+        rates[0] = gyro[0] if self.recent_rate is None else self.recent_rate
+        increments = quat_exp(rates * dt[:, None])
+        increments[0] = quat_multiply(self.q, increments[0])
+        orientations = quat_prefix_product(increments)
+
+        # Tilt correction from the chunk's gravity direction in the world frame
+        norm = np.linalg.norm(accel, axis=1)
+        usable = np.abs(norm - self.gravity) < self.gravity_tolerance
+        q = orientations[-1]
+        if usable.any():
+            up = quat_rotate(orientations[usable], accel[usable]).mean(axis=0)
+            up /= np.linalg.norm(up)
+            axis = np.cross(up, [0.0, 0.0, 1.0])
+            sin_angle = np.linalg.norm(axis)
+            if sin_angle > 1e-9:
+                angle = np.arctan2(sin_angle, up[2])
+                duration = max(float(times[-1] - self.t), 1e-6)
+                gain = 1.0 - np.exp(-duration / self.tau)
+                q = quat_normalize(quat_multiply(quat_exp(axis / sin_angle * angle * gain), q))
+                self.corrections += 1
+
+        self.q = q
+        self.t = float(times[-1])
+        self.recent_rate = gyro[-1]
+        self.recent.append((times, orientations))
+        while len(self.recent) > 1 and self.t - self.recent[0][0][-1] > self.history:
+            self.recent.popleft()
+        return orientations
+
+    def orientation_at(self, t):
+        """Orientation at sensor time t (normalized lerp between samples), None if not covered"""
+        for times, orientations in reversed(self.recent):
+            if times[0] <= t <= times[-1]:
+                i = int(np.searchsorted(times, t))
+                if i == 0 or times[i] == t:
+                    return orientations[i]
+                f = (t - times[i - 1]) / (times[i] - times[i - 1])
+                a, b = orientations[i - 1], orientations[i]
+                if np.dot(a, b) < 0:
+                    b = -b
+                return quat_normalize(a + f * (b - a))
+        return None
+
+
+class IMUProcessor:
+    """
+    Bias estimation and orientation filtering over a live IMU stream, in
+    chunks of at least min_chunk samples (batches are buffered until then),
+    plus preintegration of any interval with the current bias.
+    """
+
+    def __init__(self, min_chunk=32, gravity=GRAVITY, bias=None, orientation=None):
+        self.min_chunk = min_chunk
+        self.bias = bias or GyroBiasEstimator(gravity=gravity)
+        self.filter = orientation or OrientationFilter(gravity=gravity)
+        self.buffer = []
+        self.buffered = 0
+
+        self.samples_processed = 0
+        self.chunks = 0
+        self.busy = 0.0  # seconds spent processing
+
+    def add(self, samples):
+        """Add an (N, 7) batch; processed once min_chunk samples are buffered. Returns True if processed"""
+        self.buffer.append(samples)
+        self.buffered += len(samples)
+        if self.buffered < self.min_chunk:
+            return False
+        self.flush()
+        return True
+
+    def flush(self):
+        if not self.buffered:
+            return
+        start = time.perf_counter()
+        chunk = np.concatenate(self.buffer) if len(self.buffer) > 1 else self.buffer[0]
+        self.buffer = []
+        self.buffered = 0
+        # Sensor-time order within the chunk (datagrams can arrive out of order)
+        if np.any(np.diff(chunk[:, 0]) < 0):
+            chunk = chunk[np.argsort(chunk[:, 0], kind='stable')]
+        self.bias.update(chunk)
+        self.filter.update(chunk, self.bias.bias)
+        self.samples_processed += len(chunk)
+        self.chunks += 1
+        self.busy += time.perf_counter() - start
+
+    def interval(self, imu, t0, t1):
+        """Preintegrated over [t0, t1] from an (8, k) IMUTimeline.between slice, with the current bias"""
+        return preintegrate(imu[T], imu[ACCEL].T, imu[GYRO].T, t0, t1, gyro_bias=self.bias.bias)
+
+    def describe(self):
+        if self.filter.q is None:
+            return "waiting for a gravity reference"
+        roll, pitch, yaw = np.degrees(quat_to_euler(self.filter.q))
+        bias = self.bias.bias * 1000
+        state = 'stationary' if self.bias.stationary else 'moving'
+        per_sample = self.busy / self.samples_processed * 1e6 if self.samples_processed else 0.0
+        return (f"roll {roll:+6.2f}° pitch {pitch:+6.2f}° yaw {yaw:+7.2f}° | "
+                f"gyro bias [{bias[0]:+.2f} {bias[1]:+.2f} {bias[2]:+.2f}] mrad/s ({state}) | "
+                f"{per_sample:.1f} µs/sample")
+
+
+def run_live(pi_ip, port, min_chunk):
+    processor = IMUProcessor(min_chunk=min_chunk)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.settimeout(1.0)
+    try:
+        if not register_imu(sock, pi_ip, port):
+            print(f"❌ No response from IMU server at {pi_ip}:{port}")
+            return
+        print(f"✅ Processing IMU from {pi_ip}:{port} (Ctrl+C to stop)")
+        recv_buffer = bytearray(65535)
+        recv_view = memoryview(recv_buffer)
+        last_report = time.time()
+        last_count = 0
+        while True:
+            try:
+                nbytes = sock.recv_into(recv_view)
+                batch = decode_datagram(recv_view[:nbytes])
+            except (socket.timeout, ValueError):
+                continue
+            processor.add(batch.samples)
+            now = time.time()
+            if now - last_report >= 1.0:
+                rate = (processor.samples_processed - last_count) / (now - last_report)
+                print(f"{rate:6.0f} Hz | {processor.describe()}")
+                last_report = now
+                last_count = processor.samples_processed
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sock.close()
+
+
+def run_session(directory, min_chunk):
+    """Offline: filter a recording and preintegrate every depth interval"""
+    from imu_depth_sync import sync_session
+    from session_recorder import SessionReader
+
+    with SessionReader(directory) as reader:
+        frame_times, starts, ends, values, samples = sync_session(reader)
+    if not len(samples):
+        print(f"❌ No IMU samples in {directory}")
+        return
+
+    processor = IMUProcessor(min_chunk=min_chunk)
+    start = time.perf_counter()
+    for offset in range(0, len(samples), min_chunk):
+        processor.add(samples[offset:offset + min_chunk])
+    processor.flush()
+    filter_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    intervals = []
+    for i in range(1, len(frame_times)):
+        chunk = samples[starts[i]:ends[i]]
+        if len(chunk):
+            intervals.append(preintegrate(chunk[:, 0], chunk[:, 1:4], chunk[:, 4:7],
+                                          frame_times[i - 1], frame_times[i], processor.bias.bias))
+    preintegration_time = time.perf_counter() - start
+
+    print(f"📁 {directory}: {len(samples)} IMU samples, {len(frame_times)} depth frames")
+    print(f"Filter: {filter_time / len(samples) * 1e6:.1f} µs/sample | final {processor.describe()}")
+    if intervals:
+        angles = [2 * np.degrees(np.arccos(min(1.0, abs(p.delta_q[0])))) for p in intervals]
+        print(f"Preintegration: {len(intervals)} intervals, {preintegration_time / len(intervals) * 1e6:.0f} µs each | "
+              f"rotation per frame mean {np.mean(angles):.3f}° max {np.max(angles):.3f}°")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='IMU bias, orientation and preintegration')
+    ports = (('--port', 'imu'),)
+    add_device_arguments(parser, ports=ports)
+    parser.add_argument('--chunk', type=int, default=32, help='Samples per processing chunk (default: 32)')
+    parser.add_argument('--session', metavar='DIR', help='Process a session_recorder.py recording instead')
+
+    args = parser.parse_args()
+
+    if args.session:
+        run_session(args.session, args.chunk)
+    else:
+        apply_device(args, ports)
+        run_live(args.ip, args.port, args.chunk)
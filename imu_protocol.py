@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+IMU Wire Protocol - Batched binary IMU datagrams with legacy JSON auto-detect
+
+Binary datagram (little-endian):
+    header  '<4sBBHI'  magic b'IMUB', version, flags, sample count, sequence number
+            flags bit 0 (FLAG_NO_SEQ): the batch has no sequence number (e.g. a
+            recorded JSON packet); the sequence field is 0 and decodes as None
+    samples count x ('<f8' timestamp, 6 x '<f4' accel x/y/z m/s², gyro x/y/z rad/s)
+
+Legacy JSON datagram (one sample):
+    {"timestamp": t, "accelerometer": {"x", "y", "z"}, "gyroscope": {"x", "y", "z"}}
+
+Both decode to an (N, 7) float64 array with columns t, ax, ay, az, gx, gy, gz.
+
+Clock probes share the port (NTP-style, see clock_sync.py):
+    CLOCK_PROBE  '<4sId'    b'CLKQ', sequence number, t1 (PC send time)
+    CLOCK_REPLY  '<4sIddd'  b'CLKR', sequence number, t1 echoed, t2 (device
+                            receive time), t3 (device send time)
+t2/t3 are in the clock of the IMU and depth timestamps, in seconds.
+"""
+
+import json
+import socket
+import struct
+from collections import namedtuple
+
+import numpy as np
+
+MAGIC = b'IMUB'
+VERSION = 1
+HEADER = struct.Struct('<4sBBHI')
+FLAG_NO_SEQ = 0x01
+SAMPLE_DTYPE = np.dtype([('t', '<f8'), ('imu', '<f4', (6,))])
+
+COLUMNS = ('t', 'ax', 'ay', 'az', 'gx', 'gy', 'gz')
+NUM_COLUMNS = len(COLUMNS)
+
+# Largest batch that fits a 1500-byte Ethernet MTU (IPv4 + UDP headers)
+MAX_SAMPLES_PER_DATAGRAM = (1472 - HEADER.size) // SAMPLE_DTYPE.itemsize
+
+REGISTER_MESSAGE = b'REGISTER_IMU'
+ACK_MESSAGE = b'IMU_ACK'
+# Silence after which a registered receiver registers again (the Pi may have restarted)
+IMU_REREGISTER_SECONDS = 2.0
+
+CLOCK_PROBE = struct.Struct('<4sId')
+CLOCK_REPLY = struct.Struct('<4sIddd')
+CLOCK_PROBE_MAGIC = b'CLKQ'
+CLOCK_REPLY_MAGIC = b'CLKR'
+
+# seq is None for legacy JSON packets that carry no sequence number
+IMUBatch = namedtuple('IMUBatch', ['seq', 'samples'])
+
+
+def decode_datagram(data):
+    """Decode a binary or JSON IMU datagram into an IMUBatch (raises ValueError if malformed)"""
+    if data[:4] == MAGIC:
+        return decode_binary(data)
+    if data[:1] == b'{':
+        return decode_json(data)
+    raise ValueError(f"Unknown IMU datagram ({len(data)} bytes)")
+
+
+def decode_binary(data):
+    if len(data) < HEADER.size:
+        raise ValueError("Truncated IMU header")
+    _, version, flags, count, seq = HEADER.unpack_from(data)
+    if version != VERSION:
+        raise ValueError(f"Unsupported IMU format version {version}")
+    if not count:
+        raise ValueError("Empty IMU batch")
+    if len(data) < HEADER.size + count * SAMPLE_DTYPE.itemsize:
+        raise ValueError(f"Truncated IMU batch ({count} samples in {len(data)} bytes)")
+
+    records = np.frombuffer(data, dtype=SAMPLE_DTYPE, count=count, offset=HEADER.size)
+    samples = np.empty((count, NUM_COLUMNS), dtype=np.float64)
+    samples[:, 0] = records['t']
+    samples[:, 1:] = records['imu']
+    return IMUBatch(None if flags & FLAG_NO_SEQ else seq, samples)
+
+
+def decode_json(data):
+    imu_data = json.loads(bytes(data))
+    if not isinstance(imu_data, dict):
+        raise ValueError("IMU JSON is not an object")
+    accel = imu_data.get('accelerometer', {})
+    gyro = imu_data.get('gyroscope', {})
+    seq = imu_data.get('seq')
+    if not isinstance(accel, dict) or not isinstance(gyro, dict):
+        raise ValueError("IMU JSON accelerometer/gyroscope are not objects")
+    if seq is not None and (not isinstance(seq, int) or isinstance(seq, bool)):
+        raise ValueError(f"Bad IMU JSON seq {seq!r}")
+    try:
+        samples = np.array([[
+            imu_data.get('timestamp', 0),
+            accel.get('x', 0), accel.get('y', 0), accel.get('z', 0),
+            gyro.get('x', 0), gyro.get('y', 0), gyro.get('z', 0),
+        ]], dtype=np.float64)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError("Non-numeric IMU JSON values")
+    return IMUBatch(seq, samples)
+
+
+def encode_binary(seq, samples):
+    """Encode an (N, 7) array of samples as one binary datagram; seq None sets FLAG_NO_SEQ"""
+    samples = np.asarray(samples, dtype=np.float64)
+    records = np.empty(len(samples), dtype=SAMPLE_DTYPE)
+    records['t'] = samples[:, 0]
+    records['imu'] = samples[:, 1:]
+    flags, seq = (FLAG_NO_SEQ, 0) if seq is None else (0, seq & 0xFFFFFFFF)
+    return HEADER.pack(MAGIC, VERSION, flags, len(samples), seq) + records.tobytes()
+
+
+def encode_json(sample):
+    """Encode one sample row as a legacy JSON datagram"""
+    return json.dumps(sample_to_dict(sample)).encode()
+
+
+def sample_to_dict(sample):
+    """Convert one sample row back to the legacy dict layout used by the displays"""
+    t, ax, ay, az, gx, gy, gz = (float(v) for v in sample)
+    return {
+        'timestamp': t,
+        'accelerometer': {'x': ax, 'y': ay, 'z': az},
+        'gyroscope': {'x': gx, 'y': gy, 'z': gz},
+    }
+
+
+def register_imu(sock, pi_ip, port):
+    """Send REGISTER_IMU and wait for IMU_ACK on sock (uses the socket timeout)"""
+    sock.sendto(REGISTER_MESSAGE, (pi_ip, port))
+    try:
+        data, addr = sock.recvfrom(1024)
+    except socket.timeout:
+        return False
+    return data == ACK_MESSAGE
+
+
+def encode_clock_probe(seq, t1):
+    return CLOCK_PROBE.pack(CLOCK_PROBE_MAGIC, seq & 0xFFFFFFFF, t1)
+
+
+def decode_clock_probe(data):
+    """(seq, t1) of a CLOCK_PROBE (raises ValueError if malformed)"""
+    if len(data) < CLOCK_PROBE.size or data[:4] != CLOCK_PROBE_MAGIC:
+        raise ValueError("Not a clock probe")
+    _, seq, t1 = CLOCK_PROBE.unpack_from(data)
+    return seq, t1
+
+
+def encode_clock_reply(seq, t1, t2, t3):
+    return CLOCK_REPLY.pack(CLOCK_REPLY_MAGIC, seq & 0xFFFFFFFF, t1, t2, t3)
+
+
+def decode_clock_reply(data):
+    """(seq, t1, t2, t3) of a CLOCK_REPLY (raises ValueError if malformed)"""
+    if len(data) < CLOCK_REPLY.size or data[:4] != CLOCK_REPLY_MAGIC:
+        raise ValueError("Not a clock reply")
+    _, seq, t1, t2, t3 = CLOCK_REPLY.unpack_from(data)
+    return seq, t1, t2, t3
@@ -2,128 +2,237 @@
 """
 IMU Data Receiver for OAK-D Pro
 Receives and displays real-time IMU data (accelerometer and gyroscope) via UDP
+Accepts batched binary datagrams and legacy JSON (see imu_protocol.py)
+Reception of every device runs on one IMUHub thread; the terminal is redrawn at a fixed rate
 """
 
-import socket
-import json
 import time
 import sys
-import threading
 from datetime import datetime
-from collections import deque
+
+from device_config import add_device_arguments, devices_from_args
+from imu_hub import IMUHub
+from imu_protocol import sample_to_dict
+from imu_ring import SENSORS
+
+# Lines per device block in the multi-device layout (waiting blocks are padded to match)
+DEVICE_BLOCK_LINES = 14
 
 class IMUReceiver:
-    def __init__(self, pi_ip='192.168.1.201', port=5004):
-        self.pi_ip = pi_ip
-        self.port = port
+    def __init__(self, devices, render_hz=20.0, history_capacity=131072):
+        self.devices = devices
+        self.render_hz = render_hz
         self.running = False
-        self.sock = None
-        self.data_history = deque(maxlen=100)  # Store last 100 readings
-        self.last_update = None
-        self.packet_count = 0
+        # One socket and receive thread for every device; minutes of samples per device
+        self.hub = IMUHub(devices, history_capacity)
         self.start_time = None
 
+        # Lines currently on screen, for diff-based redraw
+        self.screen_lines = []
+
     def connect(self):
-        """Initialize UDP socket and register with the Pi streamer"""
+        """Open the hub socket and wait for the devices to acknowledge REGISTER_IMU"""
+        if not self.hub.states:
+            print("✗ None of the selected devices has an IMU stream")
+            return False
         try:
-            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            self.sock.settimeout(1.0)
-
-            # Send registration message to Pi
-            print(f"Registering with IMU server at {self.pi_ip}:{self.port}...")
-            self.sock.sendto(b'REGISTER_IMU', (self.pi_ip, self.port))
-
-            # Wait for acknowledgment
-            try:
-                data, addr = self.sock.recvfrom(1024)
-                if data == b'IMU_ACK':
-                    print(f"✓ Successfully registered with IMU server")
-                    return True
-            except socket.timeout:
-                print(f"✗ No response from IMU server. Make sure quad_streamer_with_imu.py is running on Pi")
-                return False
-
-        except Exception as e:
+            targets = ', '.join(f"{s.device.name} ({s.addr[0]}:{s.addr[1]})" for s in self.hub.states)
+            print(f"Registering with IMU server(s): {targets}...")
+            self.hub.start()
+        except OSError as e:
             print(f"✗ Failed to connect: {e}")
             return False
 
+        if not self.hub.wait_registered(1.0):
+            print(f"✗ No response from IMU server. Make sure quad_streamer_with_imu.py is running on Pi")
+            self.hub.stop()
+            return False
+        for state in self.hub.states:
+            if state.registered:
+                print(f"✓ {state.device.name}: registered with IMU server")
+            else:
+                print(f"⚠ {state.device.name}: no response yet (registration is retried in the background)")
+        return True
+
     def clear_screen(self):
         """Clear the terminal screen"""
         print('\033[2J\033[H', end='')
+        self.screen_lines = []
 
     def format_float(self, value, width=10, precision=4):
         """Format float with consistent width for alignment"""
         return f"{value:>{width}.{precision}f}"
 
-    def display_data(self, imu_data):
-        """Display IMU data in a formatted terminal view"""
-        self.clear_screen()
+    def render(self, lines):
+        """Redraw only the lines that changed since the last frame, in one write"""
+        out = []
+        if len(lines) != len(self.screen_lines):
+            # Layout changed (e.g. waiting screen <-> data screen): full redraw
+            out.append('\033[2J')
+            previous = [None] * len(lines)
+        else:
+            previous = self.screen_lines
+
+        for row, (line, old) in enumerate(zip(lines, previous), start=1):
+            if line != old:
+                out.append(f'\033[{row};1H{line}\033[K')
+
+        if out:
+            out.append(f'\033[{len(lines) + 1};1H')
+            sys.stdout.write(''.join(out))
+            sys.stdout.flush()
+        self.screen_lines = lines
+
+    def build_data_lines(self, state, imu_data, interval):
+        """Format one device's IMU data and interval aggregates as terminal lines"""
+        lines = []
 
         # Header
-        print("=" * 70)
-        print("              OAK-D Pro IMU Data Stream Monitor")
-        print("=" * 70)
+        lines.append("=" * 70)
+        lines.append("              OAK-D Pro IMU Data Stream Monitor")
+        lines.append("=" * 70)
 
         # Connection info
-        print(f"Connected to: {self.pi_ip}:{self.port}")
-        print(f"Stream time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}")
+        lines.append(f"Connected to: {state.device.name} ({state.addr[0]}:{state.addr[1]})")
+        lines.append(f"Stream time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}")
 
-        if self.start_time:
-            elapsed = time.time() - self.start_time
-            rate = self.packet_count / elapsed if elapsed > 0 else 0
-            print(f"Packets: {self.packet_count} | Rate: {rate:.1f} Hz | Elapsed: {elapsed:.1f}s")
+        elapsed = time.time() - self.start_time if self.start_time else 0
+        lines.append(f"Packets: {state.packet_count} | Samples: {state.sample_count} | "
+                     f"Rate: {state.rate():.1f} Hz | Elapsed: {elapsed:.1f}s")
 
-        print("-" * 70)
+        lines.append("-" * 70)
 
         # IMU Data
         timestamp = imu_data.get('timestamp', 0)
         accel = imu_data.get('accelerometer', {})
         gyro = imu_data.get('gyroscope', {})
 
-        print(f"Timestamp: {timestamp:.6f} seconds")
-        print("")
+        lines.append(f"Timestamp: {timestamp:.6f} seconds")
+        lines.append("")
 
         # Accelerometer data (m/s²)
-        print("ACCELEROMETER (m/s²):")
-        print("  ┌─────────────────────────────────────────────────┐")
-        print(f"  │  X: {self.format_float(accel.get('x', 0))} │ →    (Forward/Back)   │")
-        print(f"  │  Y: {self.format_float(accel.get('y', 0))} │ ↑    (Left/Right)     │")
-        print(f"  │  Z: {self.format_float(accel.get('z', 0))} │ ⊙    (Up/Down)        │")
-        print("  └─────────────────────────────────────────────────┘")
+        lines.append("ACCELEROMETER (m/s²):")
+        lines.append("  ┌─────────────────────────────────────────────────┐")
+        lines.append(f"  │  X: {self.format_float(accel.get('x', 0))} │ →    (Forward/Back)   │")
+        lines.append(f"  │  Y: {self.format_float(accel.get('y', 0))} │ ↑    (Left/Right)     │")
+        lines.append(f"  │  Z: {self.format_float(accel.get('z', 0))} │ ⊙    (Up/Down)        │")
+        lines.append("  └─────────────────────────────────────────────────┘")
 
         # Calculate magnitude
         ax, ay, az = accel.get('x', 0), accel.get('y', 0), accel.get('z', 0)
         accel_magnitude = (ax**2 + ay**2 + az**2)**0.5
-        print(f"  Magnitude: {accel_magnitude:.4f} m/s²")
-        print("")
+        lines.append(f"  Magnitude: {accel_magnitude:.4f} m/s²")
+        lines.append("")
 
         # Gyroscope data (rad/s)
-        print("GYROSCOPE (rad/s):")
-        print("  ┌─────────────────────────────────────────────────┐")
-        print(f"  │  X: {self.format_float(gyro.get('x', 0))} │ ↻    (Pitch)          │")
-        print(f"  │  Y: {self.format_float(gyro.get('y', 0))} │ ↺    (Yaw)            │")
-        print(f"  │  Z: {self.format_float(gyro.get('z', 0))} │ ⟲    (Roll)           │")
-        print("  └─────────────────────────────────────────────────┘")
+        lines.append("GYROSCOPE (rad/s):")
+        lines.append("  ┌─────────────────────────────────────────────────┐")
+        lines.append(f"  │  X: {self.format_float(gyro.get('x', 0))} │ ↻    (Pitch)          │")
+        lines.append(f"  │  Y: {self.format_float(gyro.get('y', 0))} │ ↺    (Yaw)            │")
+        lines.append(f"  │  Z: {self.format_float(gyro.get('z', 0))} │ ⟲    (Roll)           │")
+        lines.append("  └─────────────────────────────────────────────────┘")
 
         # Calculate magnitude
         gx, gy, gz = gyro.get('x', 0), gyro.get('y', 0), gyro.get('z', 0)
         gyro_magnitude = (gx**2 + gy**2 + gz**2)**0.5
-        print(f"  Magnitude: {gyro_magnitude:.4f} rad/s")
+        lines.append(f"  Magnitude: {gyro_magnitude:.4f} rad/s")
 
         # Convert to degrees/s for readability
-        print(f"  Degrees/s: X:{gx*57.2958:.2f}° Y:{gy*57.2958:.2f}° Z:{gz*57.2958:.2f}°")
+        lines.append(f"  Degrees/s: X:{gx*57.2958:.2f}° Y:{gy*57.2958:.2f}° Z:{gz*57.2958:.2f}°")
 
-        print("-" * 70)
+        lines.append("-" * 70)
 
-        # Simple ASCII visualization of acceleration
-        self.draw_accel_visualization(ax, ay, az)
+        # Aggregates over every sample received since the previous frame
+        lines.extend(self.build_interval_lines(state, interval))
 
-        print("-" * 70)
-        print("Press Ctrl+C to stop")
+        lines.append("-" * 70)
+
+        # Link quality: loss, reordering, inter-arrival and added delay percentiles
+        lines.extend(state.telemetry.format_lines())
+
+        lines.append("-" * 70)
+
+        # Simple ASCII visualization of acceleration
+        lines.extend(self.draw_accel_visualization(ax, ay, az))
+
+        lines.append("-" * 70)
+        lines.append("Press Ctrl+C to stop")
+        return lines
+
+    def build_interval_lines(self, state, interval):
+        """min/max/mean per axis over the samples of the last render interval"""
+        count = interval.shape[1]
+        lines = [f"SINCE LAST FRAME: {count} samples | History: {len(state.history)} samples, "
+                 f"{state.history.effective_rate():.1f} Hz sensor rate"]
+        if count == 0:
+            return lines + [""] * 6
+
+        values = interval[SENSORS]
+        mins = values.min(axis=1)
+        maxs = values.max(axis=1)
+        means = values.mean(axis=1)
+        for col, label in enumerate(('aX', 'aY', 'aZ', 'gX', 'gY', 'gZ')):
+            lines.append(f"  {label}: min {mins[col]:>9.4f} | max {maxs[col]:>9.4f} | mean {means[col]:>9.4f}")
+        return lines
+
+    def build_waiting_lines(self, state):
+        """Lines shown while no IMU data arrives"""
+        silent = state.silent_for()
+        if silent is not None:
+            last = f"Last update: {silent:.1f} seconds ago"
+        else:
+            last = "Last update: no data yet"
+        return [
+            "=" * 70,
+            "              OAK-D Pro IMU Data Stream Monitor",
+            "=" * 70,
+            "⚠ Waiting for IMU data...",
+            last,
+            "",
+            "Make sure quad_streamer_with_imu.py is running on the Pi",
+            "Press Ctrl+C to stop",
+        ]
+
+    def build_device_lines(self, state, interval):
+        """Compact block of one device for the multi-device layout"""
+        lines = [
+            "-" * 70,
+            f"{state.device.name} ({state.addr[0]}:{state.addr[1]}) | Packets: {state.packet_count} | "
+            f"Samples: {state.sample_count} | Rate: {state.rate():.1f} Hz",
+        ]
+        silent = state.silent_for()
+        latest = state.history.latest()
+        if silent is None or silent > 2 or latest is None:
+            last = "no data yet" if silent is None else f"last update {silent:.1f} seconds ago"
+            lines.append(f"⚠ Waiting for IMU data ({last})")
+        else:
+            t, ax, ay, az, gx, gy, gz = latest[:7]
+            lines.append(f"  Accel m/s²: X {ax:>9.4f} | Y {ay:>9.4f} | Z {az:>9.4f} | "
+                         f"|a| {(ax**2 + ay**2 + az**2)**0.5:.4f}")
+            lines.append(f"  Gyro rad/s: X {gx:>9.4f} | Y {gy:>9.4f} | Z {gz:>9.4f} | "
+                         f"|g| {(gx**2 + gy**2 + gz**2)**0.5:.4f}")
+            lines.extend(self.build_interval_lines(state, interval))
+            lines.extend(state.telemetry.format_lines())
+        return lines + [""] * (DEVICE_BLOCK_LINES - len(lines))
+
+    def build_overview_lines(self):
+        """Every device stacked (more than one device)"""
+        lines = [
+            "=" * 70,
+            f"        OAK-D Pro IMU Data Stream Monitor - {len(self.hub.states)} devices",
+            "=" * 70,
+            f"Stream time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]} | "
+            f"Elapsed: {time.time() - self.start_time:.1f}s",
+        ]
+        for state in self.hub.states:
+            lines.extend(self.build_device_lines(state, state.take_interval()))
+        lines.append("-" * 70)
+        lines.append("Press Ctrl+C to stop")
+        return lines
 
     def draw_accel_visualization(self, ax, ay, az):
         """Draw simple ASCII visualization of acceleration vector"""
-        print("ACCELERATION VECTOR:")
+        lines = ["ACCELERATION VECTOR:"]
 
         # Normalize for display (assuming ±20 m/s² range)
         max_val = 20.0
@@ -147,52 +256,36 @@ class IMUReceiver:
                         bar[i] = symbol
             return f"  {label}: [{''.join(bar)}] {value*max_val:6.2f}"
 
-        print(draw_bar(norm_x, 'X'))
-        print(draw_bar(norm_y, 'Y'))
-        print(draw_bar(norm_z, 'Z'))
+        lines.append(draw_bar(norm_x, 'X'))
+        lines.append(draw_bar(norm_y, 'Y'))
+        lines.append(draw_bar(norm_z, 'Z'))
+        return lines
 
-    def receive_loop(self):
-        """Main loop to receive and display IMU data"""
-        self.running = True
-        self.start_time = time.time()
+    def render_loop(self):
+        """Redraw at render_hz from whatever has arrived since the last frame"""
+        period = 1.0 / self.render_hz
+        next_frame = time.monotonic()
 
         while self.running:
-            try:
-                # Receive data
-                data, addr = self.sock.recvfrom(4096)
-
-                # Parse JSON data
-                imu_data = json.loads(data.decode())
-
-                # Update stats
-                self.packet_count += 1
-                self.last_update = time.time()
-                self.data_history.append(imu_data)
-
-                # Display data
-                self.display_data(imu_data)
-
-            except socket.timeout:
-                # No data received, show waiting message
-                if self.last_update and time.time() - self.last_update > 2:
-                    self.clear_screen()
-                    print("=" * 70)
-                    print("              OAK-D Pro IMU Data Stream Monitor")
-                    print("=" * 70)
-                    print("⚠ Waiting for IMU data...")
-                    print(f"Last update: {time.time() - self.last_update:.1f} seconds ago")
-                    print("\nMake sure quad_streamer_with_imu.py is running on the Pi")
-                    print("Press Ctrl+C to stop")
-
-            except json.JSONDecodeError as e:
-                print(f"✗ Failed to parse IMU data: {e}")
-
-            except KeyboardInterrupt:
-                break
-
-            except Exception as e:
-                print(f"✗ Error receiving data: {e}")
-                time.sleep(0.1)
+            next_frame += period
+            delay = next_frame - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # Terminal fell behind: skip ahead instead of queueing frames
+                next_frame = time.monotonic()
+
+            if len(self.hub.states) > 1:
+                self.render(self.build_overview_lines())
+                continue
+            state = self.hub.states[0]
+            interval = state.take_interval()
+            silent = state.silent_for()
+            latest = state.history.latest()
+            if silent is None or silent > 2 or latest is None:
+                self.render(self.build_waiting_lines(state))
+            else:
+                self.render(self.build_data_lines(state, sample_to_dict(latest[:7]), interval))
 
     def run(self):
         """Main entry point"""
@@ -204,17 +297,21 @@ class IMUReceiver:
         if not self.connect():
             print("\n✗ Failed to connect to IMU server")
             print("Make sure:")
-            print("  1. The Pi is accessible at", self.pi_ip)
+            print("  1. The Pi is accessible at", ', '.join(f"{s.addr[0]}" for s in self.hub.states))
             print("  2. quad_streamer_with_imu.py is running on the Pi")
-            print("  3. Port", self.port, "is not blocked")
+            print("  3. Port", ', '.join(f"{s.addr[1]}" for s in self.hub.states), "is not blocked")
             return
 
         print("\nStarting IMU data reception...")
         print("Press Ctrl+C to stop\n")
         time.sleep(1)
 
+        self.running = True
+        self.start_time = time.time()
+
         try:
-            self.receive_loop()
+            self.clear_screen()
+            self.render_loop()
         except KeyboardInterrupt:
             print("\n\nStopping IMU receiver...")
         finally:
@@ -223,19 +320,20 @@ class IMUReceiver:
     def shutdown(self):
         """Clean shutdown"""
         self.running = False
-        if self.sock:
-            self.sock.close()
+        self.hub.stop()
         print("IMU receiver stopped")
-        print(f"Total packets received: {self.packet_count}")
+        for state in self.hub.states:
+            print(f"{state.device.name}: total packets received: {state.packet_count} "
+                  f"({state.sample_count} samples, {state.parse_errors} unparseable)")
 
 if __name__ == "__main__":
     import argparse
 
     parser = argparse.ArgumentParser(description='OAK-D Pro IMU Data Receiver')
-    parser.add_argument('--ip', default='192.168.1.202', help='Pi IP address (default: 192.168.1.202)')
-    parser.add_argument('--port', type=int, default=5004, help='UDP port (default: 5004)')
+    add_device_arguments(parser, multiple=True, relayed=True)
+    parser.add_argument('--render-hz', type=float, default=20.0, help='Terminal redraw rate (default: 20)')
 
     args = parser.parse_args()
 
-    receiver = IMUReceiver(pi_ip=args.ip, port=args.port)
-    receiver.run()
\ No newline at end of file
+    receiver = IMUReceiver(devices_from_args(args), render_hz=args.render_hz)
+    receiver.run()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+IMU Ring - Fixed-capacity structure-of-arrays history for IMU samples
+
+Columns: t, ax, ay, az, gx, gy, gz, arrival_time (all float64). Every sample
+is written twice (at i and i + capacity) so the newest n samples are always
+one contiguous slice: windows are zero-copy views and all statistics are
+vectorized numpy over them.
+"""
+
+import numpy as np
+
+COLUMNS = ('t', 'ax', 'ay', 'az', 'gx', 'gy', 'gz', 'arrival_time')
+T, AX, AY, AZ, GX, GY, GZ, ARRIVAL = range(len(COLUMNS))
+ACCEL = slice(AX, AZ + 1)
+GYRO = slice(GX, GZ + 1)
+SENSORS = slice(AX, GZ + 1)
+
+
+class IMURing:
+    """
+    Single-writer ring of IMU samples.
+
+    append() is O(batch) with no per-sample Python work; count is updated
+    after the data is written, so readers on other threads always see
+    complete samples. Views stay valid until capacity more samples arrive.
+    """
+
+    def __init__(self, capacity=131072):
+        # 131072 samples is ~2 minutes at 1 kHz, ~11 minutes at 200 Hz
+        self.capacity = capacity
+        self.data = np.zeros((len(COLUMNS), 2 * capacity), dtype=np.float64)
+        self.count = 0  # samples appended since creation
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, samples, arrival_time):
+        """Append an (N, 7) batch (t, ax..gz); arrival_time is a scalar or length-N array"""
+        n = len(samples)
+        if n == 0:
+            return
+        cap = self.capacity
+        if n > cap:
+            samples = samples[-cap:]
+            if np.ndim(arrival_time):
+                arrival_time = arrival_time[-cap:]
+            skipped = n - cap
+            n = cap
+        else:
+            skipped = 0
+
+        pos = (self.count + skipped) % cap
+        first = min(n, cap - pos)
+        self._write(pos, samples[:first], arrival_time, 0, first)
+        if first < n:
+            self._write(0, samples[first:], arrival_time, first, n)
+        self.count += skipped + n
+
+    def _write(self, pos, samples, arrival_time, lo, hi):
+        n = len(samples)
+        block = samples.T
+        for base in (pos, pos + self.capacity):
+            self.data[:ARRIVAL, base:base + n] = block
+            if np.ndim(arrival_time):
+                self.data[ARRIVAL, base:base + n] = arrival_time[lo:hi]
+            else:
+                self.data[ARRIVAL, base:base + n] = arrival_time
+
+    def window(self, n=None):
+        """View of the newest n samples as a (8, n) array, oldest first (no copy)"""
+        available = len(self)
+        n = available if n is None else min(n, available)
+        start = (self.count - n) % self.capacity
+        return self.data[:, start:start + n]
+
+    def since(self, mark, end=None):
+        """View of the samples appended while count went from mark to end (default: now)"""
+        end = self.count if end is None else end
+        start = max(mark, self.count - self.capacity)
+        if end <= start:
+            return self.data[:, 0:0]
+        pos = start % self.capacity
+        return self.data[:, pos:pos + end - start]
+
+    def column(self, name, n=None):
+        """View of one column over the newest n samples"""
+        return self.window(n)[COLUMNS.index(name)]
+
+    def latest(self):
+        """The newest sample as a length-8 view, or None when empty"""
+        if not self.count:
+            return None
+        return self.window(1)[:, 0]
+
+    # Window statistics over the sensor columns (ax..gz), newest n samples
+
+    def mean(self, n=None):
+        return self.window(n)[SENSORS].mean(axis=1)
+
+    def variance(self, n=None):
+        return self.window(n)[SENSORS].var(axis=1)
+
+    def rms(self, n=None):
+        values = self.window(n)[SENSORS]
+        return np.sqrt(np.einsum('ij,ij->i', values, values) / max(values.shape[1], 1))
+
+    def effective_rate(self, n=None, column=T):
+        """Samples per second over the window, from sensor (T) or arrival (ARRIVAL) time"""
+        times = self.window(n)[column]
+        if len(times) < 2 or times[-1] <= times[0]:
+            return 0.0
+        return (len(times) - 1) / (times[-1] - times[0])
+
+    # Rolling statistics: one value per sample position, computed with cumulative sums
+
+    def rolling_mean(self, width, n=None):
+        """(6, n - width + 1) moving average of ax..gz"""
+        return self._rolling_sum(self.window(n)[SENSORS], width) / width
+
+    def rolling_variance(self, width, n=None):
+        values = self.window(n)[SENSORS]
+        mean = self._rolling_sum(values, width) / width
+        mean_sq = self._rolling_sum(values * values, width) / width
+        return np.maximum(mean_sq - mean * mean, 0.0)
+
+    def rolling_rms(self, width, n=None):
+        values = self.window(n)[SENSORS]
+        return np.sqrt(self._rolling_sum(values * values, width) / width)
+
+    @staticmethod
+    def _rolling_sum(values, width):
+        if values.shape[1] < width:
+            return np.empty((values.shape[0], 0))
+        cumsum = np.cumsum(values, axis=1)
+        out = cumsum[:, width - 1:].copy()
+        out[:, 1:] -= cumsum[:, :-width]
+        return out
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+IMU Link Telemetry - UDP loss, reordering, burstiness and delay for the IMU stream
+
+Loss/reorder/duplicates come from the datagram sequence number, or from
+sensor timestamp gaps for legacy JSON packets that carry none. Inter-arrival
+times and sensor-timestamp-vs-arrival delay go into constant-memory log
+histograms. The delay is relative to the smallest one seen (the clocks are
+not synchronized), so it measures queuing/jitter added on the way, not the
+absolute latency.
+"""
+
+import math
+from collections import deque
+
+import numpy as np
+
+from log_histogram import LogHistogram
+
+SEQ_MODULO = 1 << 32
+# A jump backwards larger than this means the streamer restarted
+SEQ_RESTART_THRESHOLD = 1000
+
+
+class IMULinkTelemetry:
+    """Fed by the receive thread with every decoded batch"""
+
+    def __init__(self, reorder_window=64):
+        self.reorder_window = reorder_window
+
+        self.datagrams = 0
+        self.samples = 0
+        self.dropped = 0
+        self.reordered = 0
+        self.duplicates = 0
+        self.restarts = 0
+
+        # Sequence tracking
+        self.max_seq = None
+        self.recent_seqs = deque(maxlen=reorder_window)
+        self.recent_set = set()
+        self.missing = set()
+        self.missing_order = deque()
+
+        # Timestamp fallback (legacy JSON)
+        self.last_sensor_t = None
+        self.sample_period = None
+
+        # Timing
+        self.last_arrival = None
+        self.min_offset = math.inf
+        self.interarrival = LogHistogram(min_value=1e-5, max_value=10.0)
+        self.delay = LogHistogram(min_value=1e-5, max_value=10.0)
+
+    def on_batch(self, seq, samples, arrival_time):
+        """Record one datagram: seq may be None, samples is (N, 7) with column 0 = sensor time"""
+        self.datagrams += 1
+        self.samples += len(samples)
+
+        if seq is not None:
+            self._track_seq(seq)
+        elif len(samples):
+            self._track_timestamps(samples[:, 0])
+        if len(samples) > 1:
+            self._update_period(np.diff(samples[:, 0]))
+        if seq is not None and len(samples):
+            self.last_sensor_t = samples[-1, 0]
+
+        if self.last_arrival is not None:
+            self.interarrival.record(arrival_time - self.last_arrival)
+        self.last_arrival = arrival_time
+
+        if len(samples):
+            # Newest sample in the datagram left the sensor last, so it waited least
+            offset = arrival_time - samples[-1, 0]
+            if offset < self.min_offset:
+                self.min_offset = offset
+            self.delay.record(offset - self.min_offset)
+
+    def _remember(self, seq):
+        if len(self.recent_seqs) == self.recent_seqs.maxlen:
+            self.recent_set.discard(self.recent_seqs[0])
+        self.recent_seqs.append(seq)
+        self.recent_set.add(seq)
+
+    def _track_seq(self, seq):
+        if self.max_seq is None:
+            self.max_seq = seq
+            self._remember(seq)
+            return
+
+        delta = (seq - self.max_seq) % SEQ_MODULO
+        if delta >= SEQ_MODULO // 2:
+            delta -= SEQ_MODULO
+
+        if delta > 0:
+            if delta - 1:
+                self.dropped += delta - 1
+                # Remember the most recent gaps so late arrivals can be reclassified
+                first_missing = self.max_seq + max(1, delta - self.reorder_window)
+                for missing in range(first_missing, self.max_seq + delta):
+                    missing %= SEQ_MODULO
+                    self.missing.add(missing)
+                    self.missing_order.append(missing)
+                while len(self.missing_order) > self.reorder_window:
+                    self.missing.discard(self.missing_order.popleft())
+            self.max_seq = seq
+            self._remember(seq)
+        elif seq in self.recent_set:
+            self.duplicates += 1
+        elif seq in self.missing:
+            # Counted as dropped when the gap was seen; it was only late
+            self.missing.discard(seq)
+            self.dropped -= 1
+            self.reordered += 1
+            self._remember(seq)
+        elif -delta > SEQ_RESTART_THRESHOLD:
+            self.restarts += 1
+            self.max_seq = seq
+            self.recent_seqs.clear()
+            self.recent_set.clear()
+            self.missing.clear()
+            self.missing_order.clear()
+            self._remember(seq)
+        else:
+            # Older than the reorder window: late, not lost
+            self.reordered += 1
+
+    def _update_period(self, deltas):
+        deltas = deltas[deltas > 0]
+        if len(deltas):
+            period = float(np.median(deltas))
+            if self.sample_period is None:
+                self.sample_period = period
+            else:
+                self.sample_period += 0.05 * (period - self.sample_period)
+
+    def _track_timestamps(self, times):
+        t = times[0]
+        if self.last_sensor_t is not None:
+            dt = t - self.last_sensor_t
+            if dt == 0:
+                self.duplicates += 1
+                return
+            if dt < 0:
+                self.reordered += 1
+                return
+            if self.sample_period is None:
+                self.sample_period = dt
+            elif dt > 1.5 * self.sample_period:
+                self.dropped += int(round(dt / self.sample_period)) - 1
+            else:
+                self.sample_period += 0.05 * (dt - self.sample_period)
+        self.last_sensor_t = times[-1]
+
+    def loss_percent(self):
+        expected = self.datagrams + self.dropped if self.max_seq is not None else self.samples + self.dropped
+        return 100.0 * self.dropped / expected if expected else 0.0
+
+    def summary(self):
+        """Plain dict snapshot for displays (times in milliseconds)"""
+        ia50, ia95, ia99 = self.interarrival.percentiles()
+        d50, d95, d99 = self.delay.percentiles()
+        return {
+            'datagrams': self.datagrams,
+            'samples': self.samples,
+            'dropped': self.dropped,
+            'reordered': self.reordered,
+            'duplicates': self.duplicates,
+            'restarts': self.restarts,
+            'loss_percent': self.loss_percent(),
+            'source': 'seq' if self.max_seq is not None else 'timestamp',
+            'sample_rate': 1.0 / self.sample_period if self.sample_period else 0.0,
+            'interarrival_ms': (ia50 * 1000, ia95 * 1000, ia99 * 1000),
+            'delay_ms': (d50 * 1000, d95 * 1000, d99 * 1000),
+        }
+
+    def format_lines(self):
+        """Display lines shared by the terminal and GUI receivers"""
+        s = self.summary()
+        ia = s['interarrival_ms']
+        d = s['delay_ms']
+        return [
+            f"LINK ({s['source']}): lost {s['dropped']} ({s['loss_percent']:.2f}%) | "
+            f"reordered {s['reordered']} | dup {s['duplicates']} | restarts {s['restarts']}",
+            f"  Inter-arrival ms: p50 {ia[0]:7.2f} | p95 {ia[1]:7.2f} | p99 {ia[2]:7.2f}",
+            f"  Added delay ms:   p50 {d[0]:7.2f} | p95 {d[1]:7.2f} | p99 {d[2]:7.2f}",
+        ]
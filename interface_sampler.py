@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Interface Sampler - Sub-second counters for every network interface
+
+Interfaces are discovered from /sys/class/net. Each counter file under
+statistics/ is opened once and re-read with os.pread, so a tick costs one
+syscall per counter and no open/parse of /proc/net/dev; where sysfs is not
+available the sampler falls back to one pread of /proc/net/dev per tick for
+all interfaces. Each tick stores a monotonic timestamp and per-interval
+rates in fixed-size numpy rolling windows.
+"""
+
+import os
+import time
+
+import numpy as np
+
+SYS_CLASS_NET = '/sys/class/net'
+PROC_NET_DEV = '/proc/net/dev'
+
+COUNTERS = ('rx_bytes', 'tx_bytes', 'rx_packets', 'tx_packets',
+            'rx_dropped', 'tx_dropped', 'rx_errors', 'tx_errors')
+RX_BYTES, TX_BYTES, RX_PACKETS, TX_PACKETS, RX_DROPPED, TX_DROPPED, RX_ERRORS, TX_ERRORS = range(len(COUNTERS))
+
+# /proc/net/dev column of each counter (after the "iface:" field)
+PROC_COLUMNS = (0, 8, 1, 9, 3, 11, 2, 10)
+
+# Interface name prefixes -> display names
+KIND_NAMES = (('en', 'Ethernet'), ('eth', 'Ethernet'), ('wl', 'WiFi'), ('usb', 'USB'),
+              ('lo', 'Loopback'), ('docker', 'Docker'), ('br', 'Bridge'), ('veth', 'Virtual'))
+
+
+def interface_kind(name):
+    for prefix, kind in KIND_NAMES:
+        if name.startswith(prefix):
+            return kind
+    return name
+
+
+def discover_interfaces(include_loopback=False):
+    """Interface names from /sys/class/net (or /proc/net/dev), sorted"""
+    try:
+        names = os.listdir(SYS_CLASS_NET)
+    except OSError:
+        with open(PROC_NET_DEV) as f:
+            names = [line.split(':', 1)[0].strip() for line in f.readlines()[2:]]
+    return sorted(name for name in names if include_loopback or name != 'lo')
+
+
+class InterfaceSampler:
+    """
+    Single-writer sampler; call sample() every interval (e.g. from a stream
+    engine timer). Rates live in rings written twice (like IMURing) so the
+    newest n intervals are always one contiguous view.
+
+    rates[i, iface, counter] is bytes -> Mbps, packets -> packets/s and
+    drops/errors -> count during interval i.
+    """
+
+    def __init__(self, interfaces=None, window=600, include_loopback=False, rediscover_interval=5.0):
+        self.fixed_interfaces = interfaces
+        self.window = window  # 600 x 100 ms = 1 minute
+        self.include_loopback = include_loopback
+        self.rediscover_interval = rediscover_interval
+
+        self.interfaces = []
+        self.fds = None       # (n_ifaces, n_counters) sysfs fds, or None for /proc fallback
+        self.proc_fd = None
+        self.count = 0        # intervals recorded
+        self.last_values = None
+        self.last_time = None
+        self.last_discovery = 0.0
+        self.totals = None    # latest raw counters, (n_ifaces, n_counters)
+        self.open(self.fixed_interfaces or discover_interfaces(include_loopback))
+
+    def open(self, interfaces):
+        """(Re)open counters for interfaces; clears the rolling windows"""
+        self.close()
+        self.interfaces = list(interfaces)
+        n = len(self.interfaces)
+        opened = []
+        try:
+            for iface in self.interfaces:
+                for counter in COUNTERS:
+                    opened.append(os.open(os.path.join(SYS_CLASS_NET, iface, 'statistics', counter), os.O_RDONLY))
+            self.fds = [opened[i:i + len(COUNTERS)] for i in range(0, len(opened), len(COUNTERS))]
+        except OSError:
+            for fd in opened:
+                os.close(fd)
+            self.proc_fd = os.open(PROC_NET_DEV, os.O_RDONLY)
+
+        self.times = np.zeros(2 * self.window)
+        self.intervals = np.zeros(2 * self.window)
+        self.rates = np.zeros((2 * self.window, n, len(COUNTERS)))
+        self.count = 0
+        self.last_values = None
+        self.last_time = None
+        self.last_discovery = time.monotonic()
+
+    def close(self):
+        if self.fds is not None:
+            for row in self.fds:
+                for fd in row:
+                    os.close(fd)
+            self.fds = None
+        if self.proc_fd is not None:
+            os.close(self.proc_fd)
+            self.proc_fd = None
+
+    def read_counters(self):
+        """Current raw counters as an (n_ifaces, n_counters) int64 array"""
+        values = np.zeros((len(self.interfaces), len(COUNTERS)), dtype=np.int64)
+        if self.fds is not None:
+            pread = os.pread
+            for i, row in enumerate(self.fds):
+                values[i] = [int(pread(fd, 32, 0)) for fd in row]
+            return values
+
+        chunks = []
+        offset = 0
+        while True:
+            chunk = os.pread(self.proc_fd, 65536, offset)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            offset += len(chunk)
+        index = {name: i for i, name in enumerate(self.interfaces)}
+        for line in b''.join(chunks).decode().splitlines()[2:]:
+            name, _, fields = line.partition(':')
+            i = index.get(name.strip())
+            if i is not None:
+                parts = fields.split()
+                values[i] = [int(parts[column]) for column in PROC_COLUMNS]
+        return values
+
+    def sample(self):
+        """Read every counter once and record the rates since the previous call"""
+        now = time.monotonic()
+        if self.fixed_interfaces is None and now - self.last_discovery >= self.rediscover_interval:
+            self.last_discovery = now
+            found = discover_interfaces(self.include_loopback)
+            if found != self.interfaces:
+                self.open(found)
+        try:
+            values = self.read_counters()
+        except (OSError, ValueError):
+            # Interface went away between discovery and read
+            self.open(self.fixed_interfaces or discover_interfaces(self.include_loopback))
+            return
+
+        if self.last_values is not None:
+            dt = now - self.last_time
+            if dt > 0:
+                # Counters can reset (driver reload): treat negative deltas as 0
+                delta = np.maximum(values - self.last_values, 0).astype(np.float64)
+                rates = delta
+                rates[:, [RX_BYTES, TX_BYTES]] *= 8 / (dt * 1e6)
+                rates[:, [RX_PACKETS, TX_PACKETS]] /= dt
+                pos = self.count % self.window
+                for base in (pos, pos + self.window):
+                    self.times[base] = now
+                    self.intervals[base] = dt
+                    self.rates[base] = rates
+                self.count += 1
+        self.last_values = values
+        self.last_time = now
+        self.totals = values
+
+    def recent(self, seconds=None):
+        """(times, intervals, rates) views of the newest intervals covering seconds (default: whole window)"""
+        n = min(self.count, self.window)
+        start = (self.count - n) % self.window
+        times = self.times[start:start + n]
+        intervals = self.intervals[start:start + n]
+        rates = self.rates[start:start + n]
+        if seconds is not None and n:
+            first = int(np.searchsorted(times, times[-1] - seconds, side='right'))
+            times, intervals, rates = times[first:], intervals[first:], rates[first:]
+        return times, intervals, rates
+
+    def summary(self, current_seconds=1.0):
+        """
+        Per-interface dict for displays: current (mean over current_seconds)
+        and window average/peak Mbps, packets/s and drop/error counts
+        """
+        times, intervals, rates = self.recent()
+        current_times, current_intervals, current_rates = self.recent(current_seconds)
+        result = {}
+        if not len(times):
+            return result
+
+        # Time-weighted means (ticks can be late when the engine is busy)
+        weights = intervals / intervals.sum()
+        current_weights = current_intervals / current_intervals.sum()
+        for i, iface in enumerate(self.interfaces):
+            total = rates[:, i, RX_BYTES] + rates[:, i, TX_BYTES]
+            cur = current_rates[:, i]
+            result[iface] = {
+                'name': interface_kind(iface),
+                'rx_mbps': float(current_weights @ cur[:, RX_BYTES]),
+                'tx_mbps': float(current_weights @ cur[:, TX_BYTES]),
+                'total_mbps': float(current_weights @ (cur[:, RX_BYTES] + cur[:, TX_BYTES])),
+                'avg_mbps': float(weights @ total),
+                'peak_mbps': float(total.max()),
+                'rx_pps': float(current_weights @ cur[:, RX_PACKETS]),
+                'tx_pps': float(current_weights @ cur[:, TX_PACKETS]),
+                'drops': int(rates[:, i, RX_DROPPED].sum() + rates[:, i, TX_DROPPED].sum()),
+                'errors': int(rates[:, i, RX_ERRORS].sum() + rates[:, i, TX_ERRORS].sum()),
+                'rx_packets': int(self.totals[i, RX_PACKETS]),
+                'tx_packets': int(self.totals[i, TX_PACKETS]),
+                'rx_bytes': int(self.totals[i, RX_BYTES]),
+                'tx_bytes': int(self.totals[i, TX_BYTES]),
+                'total_rx_gb': self.totals[i, RX_BYTES] / (1024 ** 3),
+                'total_tx_gb': self.totals[i, TX_BYTES] / (1024 ** 3),
+                'window_seconds': float(intervals.sum()),
+                'samples': len(times),
+            }
+        return result
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='High-rate network interface sampler')
+    parser.add_argument('--interval', type=float, default=0.1, help='Sampling interval in seconds (default: 0.1)')
+    parser.add_argument('--lo', action='store_true', help='Include the loopback interface')
+    parser.add_argument('interfaces', nargs='*', help='Interfaces to watch (default: all discovered)')
+
+    args = parser.parse_args()
+
+    sampler = InterfaceSampler(args.interfaces or None, include_loopback=args.lo)
+    print(f"Sampling {', '.join(sampler.interfaces)} every {args.interval * 1000:.0f} ms "
+          f"({'sysfs pread' if sampler.fds is not None else '/proc/net/dev'}), Ctrl+C to stop")
+    next_tick = time.monotonic()
+    last_print = next_tick
+    try:
+        while True:
+            next_tick += args.interval
+            time.sleep(max(0.0, next_tick - time.monotonic()))
+            sampler.sample()
+            if time.monotonic() - last_print >= 1.0:
+                last_print = time.monotonic()
+                for iface, s in sampler.summary().items():
+                    print(f"{iface:10s} RX {s['rx_mbps']:8.2f} TX {s['tx_mbps']:8.2f} Mbps | "
+                          f"peak {s['peak_mbps']:8.2f} | {s['rx_pps']:8.0f}/{s['tx_pps']:.0f} pps | "
+                          f"drops {s['drops']} errors {s['errors']}")
+                print()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sampler.close()
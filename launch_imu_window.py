@@ -1,116 +1,77 @@
 #!/usr/bin/env python3
 """
 Simple window launcher for IMU data that doesn't rely on dbus
+One IMUHub thread fills a sample ring per device; the Tk loop renders the
+newest state once per 50 ms tick. Several devices get one tab each in the
+same window
 """
-import subprocess
-import sys
-import os
 import tkinter as tk
-from tkinter import scrolledtext
-import threading
-import queue
-import json
-import socket
+from tkinter import scrolledtext, ttk
 import time
 
-class IMUWindow:
-    def __init__(self):
-        self.root = tk.Tk()
-        self.root.title("OAK-D Pro IMU Data Stream")
-        self.root.geometry("800x600")
-        self.root.configure(bg='black')
-
-        # Create main frame
-        main_frame = tk.Frame(self.root, bg='black')
-        main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-
-        # Title label
-        title_label = tk.Label(main_frame, text="OAK-D Pro IMU Data Stream Monitor",
-                              font=('Courier', 16, 'bold'), fg='lime', bg='black')
-        title_label.pack(pady=(0, 10))
-
-        # Status label
-        self.status_label = tk.Label(main_frame, text="Connecting to 192.168.1.201:5004...",
-                                   font=('Courier', 12), fg='yellow', bg='black')
-        self.status_label.pack(pady=(0, 10))
+import numpy as np
+
+from device_config import add_device_arguments, devices_from_args
+from imu_hub import IMUHub
+from imu_protocol import sample_to_dict
+from imu_ring import ARRIVAL, ACCEL, GYRO
+
+# Strip chart settings
+CHART_SECONDS = 5.0
+CHART_HEIGHT = 120
+CHART_COLORS = ('red', 'lime', 'deep sky blue')  # X, Y, Z
+
+class StripChart:
+    """Scrolling 3-axis chart; line items are created once and only their coords change"""
+
+    def __init__(self, parent, title, full_scale, units):
+        self.full_scale = full_scale
+        self.canvas = tk.Canvas(parent, height=CHART_HEIGHT, bg='black', highlightthickness=0)
+        self.canvas.pack(fill=tk.X, pady=(5, 0))
+        self.center_line = self.canvas.create_line(0, 0, 0, 0, fill='gray25')
+        self.lines = [self.canvas.create_line(0, 0, 0, 0, fill=color) for color in CHART_COLORS]
+        self.canvas.create_text(5, 5, anchor='nw', fill='gray70', font=('Courier', 9),
+                                text=f"{title} (±{full_scale:g} {units}, last {CHART_SECONDS:g}s)  X Y Z")
+
+    def update(self, values):
+        """values: (3, n) view of the samples to plot, oldest first"""
+        width = max(self.canvas.winfo_width(), 2)
+        height = CHART_HEIGHT
+        mid = height / 2
+        self.canvas.coords(self.center_line, 0, mid, width, mid)
+
+        n = values.shape[1]
+        if n < 2:
+            return
+
+        # One point per pixel column at most
+        step = max(1, n // width)
+        values = values[:, ::step]
+        n = values.shape[1]
+
+        coords = np.empty((n, 2))
+        coords[:, 0] = np.linspace(0, width, n)
+        for line, axis in zip(self.lines, values):
+            np.clip(mid - axis * (mid / self.full_scale), 0, height, out=coords[:, 1])
+            self.canvas.coords(line, coords.ravel().tolist())
+
+class DevicePanel:
+    """Text area and strip charts of one device"""
+
+    def __init__(self, parent, state):
+        self.state = state
+        self.rendered_packets = 0
 
         # Text display area
-        self.text_area = scrolledtext.ScrolledText(main_frame,
+        self.text_area = scrolledtext.ScrolledText(parent,
                                                   font=('Courier', 10),
                                                   bg='black', fg='lime',
-                                                  height=30, width=100)
+                                                  height=24, width=100)
         self.text_area.pack(fill=tk.BOTH, expand=True)
 
-        # Data queue for thread communication
-        self.data_queue = queue.Queue()
-
-        # Start IMU receiver thread
-        self.running = True
-        self.receiver_thread = threading.Thread(target=self.receive_imu_data, daemon=True)
-        self.receiver_thread.start()
-
-        # Start display update loop
-        self.update_display()
-
-        # Handle window close
-        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
-
-    def receive_imu_data(self):
-        """IMU data receiver thread"""
-        sock = None
-        try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            sock.settimeout(1.0)
-
-            # Send registration message
-            sock.sendto(b'REGISTER_IMU', ('192.168.1.201', 5004))
-
-            # Wait for acknowledgment
-            try:
-                data, addr = sock.recvfrom(1024)
-                if data == b'IMU_ACK':
-                    self.data_queue.put(('status', 'Connected to IMU server'))
-                else:
-                    self.data_queue.put(('status', 'Connection failed'))
-                    return
-            except socket.timeout:
-                self.data_queue.put(('status', 'No response from IMU server'))
-                return
-
-            packet_count = 0
-            start_time = time.time()
-
-            while self.running:
-                try:
-                    data, addr = sock.recvfrom(4096)
-                    imu_data = json.loads(data.decode())
-                    packet_count += 1
-
-                    # Calculate rate
-                    elapsed = time.time() - start_time
-                    rate = packet_count / elapsed if elapsed > 0 else 0
-
-                    # Add rate info to data
-                    imu_data['_meta'] = {
-                        'packet_count': packet_count,
-                        'rate': rate,
-                        'elapsed': elapsed
-                    }
-
-                    self.data_queue.put(('data', imu_data))
-
-                except socket.timeout:
-                    continue
-                except json.JSONDecodeError:
-                    continue
-                except Exception as e:
-                    self.data_queue.put(('error', str(e)))
-
-        except Exception as e:
-            self.data_queue.put(('error', f'Connection error: {e}'))
-        finally:
-            if sock:
-                sock.close()
+        # Strip charts
+        self.accel_chart = StripChart(parent, "ACCEL", 20.0, "m/s²")
+        self.gyro_chart = StripChart(parent, "GYRO", 5.0, "rad/s")
 
     def format_imu_display(self, imu_data):
         """Format IMU data for display"""
@@ -122,7 +83,7 @@ class IMUWindow:
         display_text = f"""
 {'='*70}
 Timestamp: {timestamp:.6f} seconds
-Packets: {meta.get('packet_count', 0)} | Rate: {meta.get('rate', 0):.1f} Hz | Elapsed: {meta.get('elapsed', 0):.1f}s
+Packets: {meta.get('packet_count', 0)} | Samples: {meta.get('sample_count', 0)} | Rate: {meta.get('rate', 0):.1f} Hz | Elapsed: {meta.get('elapsed', 0):.1f}s
 {'='*70}
 
 ACCELEROMETER (m/s²):
@@ -144,32 +105,114 @@ GYROSCOPE (degrees/s):
 """
         return display_text.strip()
 
-    def update_display(self):
-        """Update display with new data"""
-        try:
-            while not self.data_queue.empty():
-                msg_type, data = self.data_queue.get_nowait()
+    def update_charts(self):
+        """Redraw strip charts from the ring's last CHART_SECONDS of samples"""
+        window = self.state.history.window()
+        start = np.searchsorted(window[ARRIVAL], time.time() - CHART_SECONDS)
+        recent = window[:, start:]
+        self.accel_chart.update(recent[ACCEL])
+        self.gyro_chart.update(recent[GYRO])
+
+    def update(self):
+        """Redraw if datagrams arrived since the last tick; returns True if it did"""
+        state = self.state
+        latest = state.history.latest()
+        if state.packet_count == self.rendered_packets or latest is None:
+            return False
+        self.rendered_packets = state.packet_count
+
+        imu_data = sample_to_dict(latest[:7])
+        imu_data['_meta'] = {
+            'packet_count': state.packet_count,
+            'sample_count': state.sample_count,
+            'rate': state.rate(),
+            'elapsed': time.time() - state.first_update,
+        }
+        display_text = self.format_imu_display(imu_data)
+        display_text += "\n\n" + "\n".join(state.telemetry.format_lines())
+
+        # Clear and update text area
+        self.text_area.delete(1.0, tk.END)
+        self.text_area.insert(tk.END, display_text)
+
+        self.update_charts()
+        return True
 
-                if msg_type == 'status':
-                    self.status_label.config(text=data)
+class IMUWindow:
+    def __init__(self, devices):
+        self.root = tk.Tk()
+        self.root.title("OAK-D Pro IMU Data Stream")
+        self.root.geometry("800x800")
+        self.root.configure(bg='black')
+
+        # One socket and receive thread for every device
+        self.hub = IMUHub(devices)
+
+        # Create main frame
+        main_frame = tk.Frame(self.root, bg='black')
+        main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+        # Title label
+        title_label = tk.Label(main_frame, text="OAK-D Pro IMU Data Stream Monitor",
+                              font=('Courier', 16, 'bold'), fg='lime', bg='black')
+        title_label.pack(pady=(0, 10))
+
+        # Status label
+        targets = ', '.join(f"{s.addr[0]}:{s.addr[1]}" for s in self.hub.states)
+        self.status_label = tk.Label(main_frame, text=f"Connecting to {targets}...",
+                                   font=('Courier', 12), fg='yellow', bg='black')
+        self.status_label.pack(pady=(0, 10))
 
-                elif msg_type == 'data':
-                    display_text = self.format_imu_display(data)
+        # One panel per device; several devices share the window as tabs
+        if len(self.hub.states) > 1:
+            notebook = ttk.Notebook(main_frame)
+            notebook.pack(fill=tk.BOTH, expand=True)
+            self.panels = []
+            for state in self.hub.states:
+                tab = tk.Frame(notebook, bg='black')
+                notebook.add(tab, text=f" {state.device.name} ")
+                self.panels.append(DevicePanel(tab, state))
+        else:
+            self.panels = [DevicePanel(main_frame, state) for state in self.hub.states]
 
-                    # Clear and update text area
-                    self.text_area.delete(1.0, tk.END)
-                    self.text_area.insert(tk.END, display_text)
+        # Start IMU receiver thread
+        self.running = True
+        try:
+            self.hub.start()
+        except OSError as e:
+            self.status_label.config(text=f"Error: Connection error: {e}", fg='red')
 
-                    # Update status
-                    meta = data.get('_meta', {})
-                    status = f"Streaming at {meta.get('rate', 0):.1f} Hz | Packets: {meta.get('packet_count', 0)}"
-                    self.status_label.config(text=status, fg='lime')
+        # Start display update loop
+        self.update_display()
 
-                elif msg_type == 'error':
-                    self.status_label.config(text=f"Error: {data}", fg='red')
+        # Handle window close
+        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
 
-        except queue.Empty:
-            pass
+    def update_status(self):
+        """Rate per device, or who the hub is still waiting for"""
+        now = time.time()
+        parts = []
+        streaming = True
+        for state in self.hub.states:
+            silent = state.silent_for(now)
+            if silent is None or silent > 2:
+                streaming = False
+                parts.append(f"{state.device.name}: {'registered, no data' if state.registered else 'no response'}")
+            else:
+                parts.append(f"{state.device.name}: {state.rate(now):.1f} Hz")
+        if len(self.hub.states) == 1 and streaming:
+            state = self.hub.states[0]
+            status = f"Streaming at {state.rate(now):.1f} Hz | Packets: {state.packet_count}"
+        else:
+            status = ' | '.join(parts) or 'No device with an IMU stream'
+        self.status_label.config(text=status, fg='lime' if streaming and parts else 'yellow')
+
+    def update_display(self):
+        """Render the newest state once per tick"""
+        for panel in self.panels:
+            panel.update()
+        if self.hub.running:  # otherwise the label keeps the start error
+            self.update_status()
 
         # Schedule next update
         if self.running:
@@ -178,6 +221,7 @@ GYROSCOPE (degrees/s):
     def on_closing(self):
         """Handle window close"""
         self.running = False
+        self.hub.stop()
         self.root.destroy()
 
     def run(self):
@@ -185,5 +229,12 @@ GYROSCOPE (degrees/s):
         self.root.mainloop()
 
 if __name__ == "__main__":
-    app = IMUWindow()
-    app.run()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description='OAK-D Pro IMU Data Window')
+    add_device_arguments(parser, multiple=True, relayed=True)
+
+    args = parser.parse_args()
+
+    app = IMUWindow(devices_from_args(args))
+    app.run()
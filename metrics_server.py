@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Metrics Server - Serve MonitorCollector snapshots over local HTTP
+
+  /metrics       Prometheus text exposition format (0.0.4)
+  /metrics.json  The snapshot as JSON
+
+Both bodies are rendered once per collector tick on the engine thread and
+swapped in by reference; a scrape only writes prebuilt bytes. Stream, H.264
+and relay series carry a device label (device_config.py).
+"""
+
+import json
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+JSON_CONTENT_TYPE = 'application/json'
+
+# (metric, type, help, key) read from each interface summary
+INTERFACE_METRICS = (
+    ('oak_interface_rx_mbps', 'gauge', 'Receive rate over the last second', 'rx_mbps'),
+    ('oak_interface_tx_mbps', 'gauge', 'Transmit rate over the last second', 'tx_mbps'),
+    ('oak_interface_avg_mbps', 'gauge', 'Average RX+TX rate over the rolling window', 'avg_mbps'),
+    ('oak_interface_peak_mbps', 'gauge', 'Peak 100ms RX+TX rate in the rolling window', 'peak_mbps'),
+    ('oak_interface_rx_packets_per_second', 'gauge', 'Received packets per second', 'rx_pps'),
+    ('oak_interface_tx_packets_per_second', 'gauge', 'Transmitted packets per second', 'tx_pps'),
+    ('oak_interface_window_drops', 'gauge', 'Dropped packets in the rolling window', 'drops'),
+    ('oak_interface_window_errors', 'gauge', 'Packet errors in the rolling window', 'errors'),
+    ('oak_interface_rx_bytes_total', 'counter', 'Bytes received', 'rx_bytes'),
+    ('oak_interface_tx_bytes_total', 'counter', 'Bytes transmitted', 'tx_bytes'),
+    ('oak_interface_rx_packets_total', 'counter', 'Packets received', 'rx_packets'),
+    ('oak_interface_tx_packets_total', 'counter', 'Packets transmitted', 'tx_packets'),
+)
+
+# (metric, type, help, key, scale) read from each stream snapshot
+STREAM_METRICS = (
+    ('oak_stream_up', 'gauge', '1 while frames are arriving on the stream', 'streaming', 1),
+    ('oak_stream_fps', 'gauge', 'Frames per second over the last tick', 'fps', 1),
+    ('oak_stream_avg_fps', 'gauge', 'Average FPS over the recent history', 'avg_fps', 1),
+    ('oak_stream_frames_total', 'counter', 'Frames seen by the monitor', 'frame_count', 1),
+    ('oak_stream_reconnects_total', 'counter', 'Connections lost after streaming', 'reconnects', 1),
+    ('oak_stream_monitor_mbps', 'gauge', 'Bandwidth consumed by the monitor connection', 'monitor_bandwidth', 1),
+    ('oak_stream_frame_interval_p50_seconds', 'gauge', 'Median inter-frame arrival interval over 10s', 'interval_p50', 1),
+    ('oak_stream_frame_interval_p99_seconds', 'gauge', '99th percentile inter-frame arrival interval over 10s', 'interval_p99', 1),
+    ('oak_stream_frame_interval_max_seconds', 'gauge', 'Longest inter-frame arrival interval over 10s', 'interval_max', 1),
+    ('oak_stream_stalls_total', 'counter', 'Inter-frame intervals over 3x the median', 'stalls', 1),
+    ('oak_stream_recent_stalls', 'gauge', 'Stalls in the last 10s', 'recent_stalls', 1),
+)
+
+# (metric, type, help, key, scale) read from each stream's transport summary
+TRANSPORT_METRICS = (
+    ('oak_stream_tcp_rtt_seconds', 'gauge', 'Kernel smoothed RTT', 'rtt_ms', 1e-3),
+    ('oak_stream_tcp_rttvar_seconds', 'gauge', 'Kernel RTT variance', 'rttvar_ms', 1e-3),
+    ('oak_stream_tcp_rcv_rtt_seconds', 'gauge', 'Kernel receive-side RTT estimate', 'rcv_rtt_ms', 1e-3),
+    ('oak_stream_tcp_rcv_space_bytes', 'gauge', 'Receive buffer space estimate', 'rcv_space_kb', 1024),
+    ('oak_stream_tcp_retransmits_total', 'counter', 'Retransmitted segments on the connection', 'total_retrans', 1),
+    ('oak_stream_tcp_queue_bytes', 'gauge', 'Bytes waiting in the kernel receive queue', 'queue_bytes', 1),
+    ('oak_stream_tcp_queue_growth_bytes_per_second', 'gauge', 'Receive queue trend over 10s', 'queue_growth', 1),
+)
+
+# (metric, type, help, key) read from each video stream's H.264 analysis (h264_analyzer.py)
+H264_METRICS = (
+    ('oak_h264_gop_frames', 'gauge', 'Frames between the last two I frames', 'gop'),
+    ('oak_h264_idr_spacing_frames', 'gauge', 'Frames between the last two IDR frames', 'idr_spacing'),
+    ('oak_h264_idr_interval_seconds', 'gauge', 'Arrival time between the last two IDR frames', 'idr_interval'),
+    ('oak_h264_frame_p50_bytes', 'gauge', 'Median access unit size', 'frame_p50'),
+    ('oak_h264_frame_p99_bytes', 'gauge', '99th percentile access unit size', 'frame_p99'),
+    ('oak_h264_i_frame_avg_bytes', 'gauge', 'Average I frame size', 'i_frame_avg'),
+    ('oak_h264_p_frame_avg_bytes', 'gauge', 'Average P frame size', 'p_frame_avg'),
+    ('oak_h264_i_mbps', 'gauge', 'I frame bitrate over the last tick', 'i_mbps'),
+    ('oak_h264_p_mbps', 'gauge', 'P frame bitrate over the last tick', 'p_mbps'),
+    ('oak_h264_i_share', 'gauge', 'Fraction of the last tick\'s bytes in I frames', 'i_share'),
+)
+
+# (metric, type, help, key) read from each relay row (stream_relay.py), when present
+RELAY_METRICS = (
+    ('oak_relay_consumers', 'gauge', 'Local consumers of the relayed stream', 'consumers'),
+    ('oak_relay_queued_bytes', 'gauge', 'Bytes queued for local consumers', 'queued'),
+    ('oak_relay_overflows_total', 'counter', 'Consumer queue overflows (data skipped to the next sync point)', 'overflows'),
+    ('oak_relay_skipped_bytes_total', 'counter', 'Bytes skipped for slow consumers', 'skipped'),
+    ('oak_relay_datagrams_total', 'counter', 'IMU datagrams relayed', 'datagrams'),
+    ('oak_relay_foreign_datagrams_total', 'counter', 'IMU datagrams dropped for not coming from the Pi', 'foreign'),
+)
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels):
+    return '{' + ','.join(f'{key}="{escape_label(value)}"' for key, value in labels) + '}'
+
+
+def format_value(value):
+    """Exact integers for counters, shortest round-trip repr for floats"""
+    if isinstance(value, (bool, int)):
+        return str(int(value))
+    return repr(float(value))
+
+
+def format_prometheus(snapshot):
+    """Prometheus text exposition of a MonitorCollector snapshot"""
+    lines = []
+
+    def family(metric, kind, help_text, samples):
+        lines.append(f'# HELP {metric} {help_text}')
+        lines.append(f'# TYPE {metric} {kind}')
+        for labels, value in samples:
+            lines.append(f'{metric}{format_labels(labels)} {format_value(value)}')
+
+    interfaces = snapshot['interfaces']
+    primary = snapshot['primary_interface']
+    for metric, kind, help_text, key in INTERFACE_METRICS:
+        family(metric, kind, help_text,
+               [((('interface', iface), ('kind', d['name'])), d[key]) for iface, d in interfaces.items()])
+    family('oak_interface_primary', 'gauge', '1 for the interface carrying the most traffic',
+           [((('interface', iface), ('kind', d['name'])), iface == primary) for iface, d in interfaces.items()])
+
+    devices = snapshot['devices'].values()
+    # (device, stream) pairs; every stream metric carries both labels
+    streams = [(d['name'], s) for d in devices for s in d['streams'].values()]
+
+    def labels(device, row, *extra):
+        return (('device', device), ('stream', row['name']), ('port', row['port'])) + extra
+
+    for metric, kind, help_text, key, scale in STREAM_METRICS:
+        family(metric, kind, help_text, [(labels(device, s), s[key] * scale) for device, s in streams])
+    for metric, kind, help_text, key, scale in TRANSPORT_METRICS:
+        family(metric, kind, help_text,
+               [(labels(device, s), s['transport'][key] * scale) for device, s in streams if s['transport']])
+
+    analyzed = [(device, s) for device, s in streams if s.get('h264')]
+    for metric, kind, help_text, key in H264_METRICS:
+        family(metric, kind, help_text, [(labels(device, s), s['h264'][key]) for device, s in analyzed])
+    family('oak_h264_nal_units_total', 'counter', 'NAL units by type',
+           [(labels(device, s, ('type', name)), count)
+            for device, s in analyzed for name, count in s['h264']['nal_counts'].items()])
+    family('oak_h264_sps_resolution', 'gauge', 'SPS-declared picture size (1 per stream)',
+           [(labels(device, s, ('width', s['h264']['width']), ('height', s['h264']['height']),
+                    ('profile', s['h264']['profile'])), 1)
+            for device, s in analyzed if s['h264']['width']])
+
+    relays = [(d['name'], r) for d in devices for r in d['relay'] or ()]
+    for metric, kind, help_text, key in RELAY_METRICS:
+        samples = [(labels(device, r), r[key]) for device, r in relays if key in r]
+        if samples:
+            family(metric, kind, help_text, samples)
+
+    family('oak_device_active_streams', 'gauge', 'Streams of the device with frames arriving',
+           [((('device', d['name']), ('pi_ip', d['pi_ip'])), d['active_streams']) for d in devices])
+    family('oak_device_total_fps', 'gauge', 'Sum of the device\'s stream FPS',
+           [((('device', d['name']), ('pi_ip', d['pi_ip'])), d['total_fps']) for d in devices])
+    family('oak_monitor_total_mbps', 'gauge', 'RX+TX rate across all interfaces', [((), snapshot['total_mbps'])])
+    family('oak_monitor_total_fps', 'gauge', 'Sum of stream FPS over all devices', [((), snapshot['total_fps'])])
+    family('oak_monitor_snapshot_timestamp_seconds', 'gauge', 'Unix time of the snapshot', [((), snapshot['time'])])
+    return '\n'.join(lines) + '\n'
+
+
+def json_safe(value):
+    """value with numpy scalars as Python numbers and NaN/inf as None (JSON has no NaN)"""
+    if isinstance(value, dict):
+        return {key: json_safe(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [json_safe(item) for item in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def format_json(snapshot):
+    """JSON body; stream ports become string keys, missing values (NaN) null"""
+    return json.dumps(json_safe(snapshot), allow_nan=False)
+
+
+class MetricsServer:
+    """HTTP endpoint for a MonitorCollector, served from a background thread"""
+
+    def __init__(self, collector, bind='127.0.0.1', port=9105):
+        self.bind = bind
+        self.port = port
+        self.bodies = None  # (prometheus bytes, json bytes), replaced as a whole
+        self.scrapes = 0
+        self.httpd = None
+        self.thread = None
+        collector.add_listener(self.render)
+
+    def render(self, snapshot):
+        """Pre-render both bodies (runs on the engine thread once per tick)"""
+        self.bodies = (format_prometheus(snapshot).encode(), format_json(snapshot).encode())
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                bodies = server.bodies
+                path = self.path.split('?', 1)[0]
+                if path == '/metrics':
+                    index, content_type = 0, PROMETHEUS_CONTENT_TYPE
+                elif path == '/metrics.json':
+                    index, content_type = 1, JSON_CONTENT_TYPE
+                else:
+                    self.send_error(404, 'Try /metrics or /metrics.json')
+                    return
+                if bodies is None:
+                    self.send_error(503, 'No snapshot yet')
+                    return
+                body = bodies[index]
+                server.scrapes += 1
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((self.bind, self.port), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
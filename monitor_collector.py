@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Monitor Collector - Interface and stream stats for the dual interface monitor,
+without any UI
+
+One StreamEngine thread samples every interface every 100 ms, drains the
+video/depth streams of every configured device (analyzing the H.264
+structure of the video streams and optionally relaying them to local
+viewers) and, once per tick, builds a single snapshot dict that the Tk
+view, the metrics endpoint and anything else read without locks. Stream
+stats are grouped per device in the snapshot; totals cover all devices.
+"""
+
+import time
+
+from h264_analyzer import H264StreamAnalyzer
+from interface_sampler import InterfaceSampler
+from stream_engine import StreamEngine
+from stream_relay import StreamRelay
+from stream_scanner import scanner_for_kind
+
+
+class MonitorCollector:
+    """
+    Owns the sampler and the stream engine. snapshot is replaced as a whole
+    every tick (never mutated); listeners run on the engine thread right
+    after each publish, so derived views (e.g. Prometheus text) are also
+    built once per tick instead of once per reader.
+    """
+
+    def __init__(self, devices, tick=1.0, analyze=True):
+        self.devices = devices
+        self.tick = tick
+
+        # Every interface, 100 ms counters over a 1 minute rolling window
+        self.sampler = InterfaceSampler(window=600)
+
+        # Stream monitoring - every port of every device and the interface sampler share one engine thread
+        self.engine = StreamEngine(connect_timeout=2.0, idle_timeout=2.0, stats_interval=tick)
+        # H.264 ports get the analyzer (NAL types, GOP, frame sizes) in place of the plain frame counter
+        self.streams = {
+            device.name: {
+                port: self.engine.add_stream(device.ip, port, name,
+                                             H264StreamAnalyzer() if analyze and kind != 'depth'
+                                             else scanner_for_kind(kind))
+                for port, name, kind in device.tcp_streams()
+            }
+            for device in devices
+        }
+
+        self.relays = {}
+        self.snapshot = None
+        self.listeners = []
+        self.ticks = 0
+
+    def add_relay(self, **options):
+        """
+        Serve the monitored connections of every device to local consumers
+        (stream_relay.py), so viewers and the monitor share one connection
+        per stream. Call before start(); options go to StreamRelay.
+        """
+        for device in self.devices:
+            self.relays[device.name] = StreamRelay(device, engine=self.engine,
+                                                   connections=self.streams[device.name], **options)
+        return self.relays
+
+    def add_listener(self, callback):
+        """callback(snapshot) after every publish, on the engine thread"""
+        self.listeners.append(callback)
+
+    def start(self):
+        self.sampler.sample()
+        self.engine.add_timer(0.1, self.sampler.sample)
+        self.engine.add_timer(self.tick, self.publish)
+        self.engine.start()
+
+    def stop(self):
+        self.engine.stop()
+        for relay in self.relays.values():
+            relay.stop()
+        self.sampler.close()
+
+    def publish(self):
+        """Build the snapshot for this tick (runs on the engine thread)"""
+        interfaces = self.sampler.summary()
+
+        # Interface carrying the most traffic over the window
+        primary = None
+        max_mbps = 0
+        for iface, d in interfaces.items():
+            if d['avg_mbps'] > max_mbps:
+                max_mbps = d['avg_mbps']
+                primary = iface
+
+        devices = {}
+        for device in self.devices:
+            streams = {}
+            for port, conn in self.streams[device.name].items():
+                stats = conn.stats  # immutable StreamSnapshot
+                analyzer = conn.scanner if isinstance(conn.scanner, H264StreamAnalyzer) else None
+                streams[port] = dict(
+                    stats._asdict(),
+                    port=port,
+                    streaming=bool(stats.active and stats.avg_fps > 0),
+                    # Safe here: publish runs on the engine thread that feeds the analyzer
+                    h264=analyzer.summary() if analyzer is not None and stats.active else None,
+                )
+            relay = self.relays.get(device.name)
+            devices[device.name] = {
+                'name': device.name,
+                'pi_ip': device.ip,
+                'streams': streams,
+                'stream_count': len(streams),
+                'active_streams': sum(1 for s in streams.values() if s['streaming']),
+                'total_fps': sum(s['fps'] for s in streams.values()),
+                'relay': relay.summary() if relay is not None else None,
+            }
+
+        self.ticks += 1
+        self.snapshot = {
+            'time': time.time(),
+            'tick': self.ticks,
+            'interfaces': interfaces,
+            'primary_interface': primary,
+            'total_mbps': sum(d['total_mbps'] for d in interfaces.values()),
+            'samples': max((d['samples'] for d in interfaces.values()), default=0),
+            'devices': devices,
+            'stream_count': sum(d['stream_count'] for d in devices.values()),
+            'active_streams': sum(d['active_streams'] for d in devices.values()),
+            'total_fps': sum(d['total_fps'] for d in devices.values()),
+        }
+        for callback in self.listeners:
+            try:
+                callback(self.snapshot)
+            except Exception as e:
+                print(f"Snapshot listener error: {e}")
@@ -0,0 +1,608 @@
+#!/usr/bin/env python3
+"""
+Pi Emulator - Serves the Pi stream ports locally for testing without the Pi or camera
+
+    5000-5002  H.264 Annex B (synthetic, or replayed .h264 elementary streams)
+    5003       '>I' length-prefixed depth ('>IIIQ' header + uint16 pixels), raw or
+               encoded with the codec the client asks for (depth_codecs.py)
+    5004/udp   REGISTER_IMU -> IMU_ACK, then binary IMUB batches or legacy JSON;
+               CLOCK_PROBE -> CLOCK_REPLY in the sensor clock (clock_sync.py),
+               not answered at --speed 0 (no clock to reply with)
+
+Every stream is paced on its own sensor timestamps: --speed 1 is real time,
+--speed 4 is four times faster and --speed 0 sends as fast as the receivers
+take it, which is how their saturation points are found. TCP clients that
+cannot keep up slow their port down instead of being dropped, like a real
+backlog would; new H.264 clients start at the next keyframe.
+"""
+
+import itertools
+import select
+import socket
+import threading
+import time
+
+import numpy as np
+
+from depth_codecs import RAW, available_codecs, choose_codec, encode_pixels, pack_itemsize, parse_negotiation
+from depth_receiver import DEPTH_DTYPES, DEPTH_HEADER, FRAME_SIZE_PREFIX
+from imu_protocol import (ACK_MESSAGE, REGISTER_MESSAGE, CLOCK_PROBE_MAGIC, MAX_SAMPLES_PER_DATAGRAM,
+                          decode_binary, decode_clock_probe, encode_binary, encode_clock_reply, encode_json)
+from session_recorder import SessionReader
+from stream_scanner import H264AccessUnitScanner
+from synthetic_data import SyntheticDepth, SyntheticH264, SyntheticIMU
+
+STREAM_PORTS = {5000: 'RGB', 5001: 'Left', 5002: 'Right'}
+DEPTH_PORT = 5003
+IMU_PORT = 5004
+
+# Falling further behind than this resyncs the schedule instead of bursting to catch up
+MAX_LAG = 1.0
+# A client that accepts nothing for this long is disconnected
+SEND_TIMEOUT = 5.0
+# Frames a depth client gets (raw) while the server still listens for DEPTH_CODECS
+NEGOTIATE_FRAMES = 30
+# Encoded payloads kept for reuse (synthetic depth cycles through a small pool)
+ENCODE_CACHE_SIZE = 64
+
+
+class _AccessUnitSplitter(H264AccessUnitScanner):
+    """Records where each access unit starts, using the scanner's own boundary rules"""
+
+    def __init__(self, size):
+        super().__init__(chunk_size=max(size, 1))
+        self.starts = []
+        self.keyframes = []
+
+    def _on_nal(self, nal_type, offset):
+        before = self.frame_count
+        super()._on_nal(nal_type, offset)
+        if self.frame_count != before:
+            self.starts.append(offset)
+            self.keyframes.append(False)
+        if nal_type in (5, 7) and self.keyframes:
+            self.keyframes[-1] = True
+
+
+def split_access_units(data):
+    """Split an Annex B stream into (access_unit_bytes, is_keyframe) pairs"""
+    splitter = _AccessUnitSplitter(len(data))
+    splitter.feed(data)  # one chunk: offsets are positions in data
+    ends = splitter.starts[1:] + [len(data)]
+    return [(bytes(data[start:end]), key)
+            for start, end, key in zip(splitter.starts, ends, splitter.keyframes)]
+
+
+# Frame sources: infinite iterators of (sensor_time_s, parts, is_keyframe);
+# parts is a list of buffers sent back to back
+
+def synthetic_h264_frames(synthetic):
+    period = 1.0 / synthetic.fps
+    for n in itertools.count():
+        index = n % len(synthetic)
+        yield n * period, [synthetic.access_units[index]], synthetic.keyframes[index]
+
+
+def h264_file_frames(path, fps):
+    """Loop over a recorded .h264 elementary stream at fps"""
+    with open(path, 'rb') as f:
+        units = split_access_units(f.read())
+    if not units:
+        raise ValueError(f"No H.264 access units in {path}")
+
+    def frames():
+        period = 1.0 / fps
+        for n in itertools.count():
+            unit, key = units[n % len(units)]
+            yield n * period, [unit], key
+    return frames()
+
+
+def synthetic_depth_frames(synthetic):
+    """Prefix + header + pixels prebuilt per pooled frame; only the timestamp is patched"""
+    payloads = []
+    for frame in synthetic.frames:
+        height, width = frame.shape
+        size = DEPTH_HEADER.size + frame.nbytes
+        payload = bytearray(FRAME_SIZE_PREFIX.size + size)
+        FRAME_SIZE_PREFIX.pack_into(payload, 0, size)
+        payload[FRAME_SIZE_PREFIX.size + DEPTH_HEADER.size:] = frame.tobytes()
+        payloads.append((payload, width, height))
+
+    period = 1.0 / synthetic.fps
+    for n in itertools.count():
+        payload, width, height = payloads[n % len(payloads)]
+        t = n * period
+        # Safe to patch in place: the previous send of this buffer has completed
+        DEPTH_HEADER.pack_into(payload, FRAME_SIZE_PREFIX.size, width, height, 2, int(t * 1e6))
+        yield t, [payload], True
+
+
+def session_timeline(reader):
+    """(t0, span) in seconds shared by the depth and IMU replays so they stay aligned"""
+    starts = [times[0] for times in (reader.depth_times, reader.imu_times) if len(times)]
+    ends = [times[-1] for times in (reader.depth_times, reader.imu_times) if len(times)]
+    if not starts:
+        raise ValueError(f"Empty recording: {reader.directory}")
+    t0 = min(starts) / 1e6
+    # One nominal frame period between the end of a loop and the start of the next
+    return t0, max(ends) / 1e6 - t0 + 1.0 / 30
+
+
+def session_depth_frames(reader, t0, span):
+    """
+    Replay recorded depth frames with their original timing (looped). Each
+    loop's header timestamps move on by span, as session_imu_batches does for
+    the IMU samples, so both streams stay on one forward-running sensor clock.
+    """
+    if not len(reader):
+        raise ValueError(f"No depth frames in {reader.directory}")
+    times = reader.depth_times.astype(np.float64) / 1e6 - t0
+
+    def frames():
+        for loop in itertools.count():
+            for i, entry in enumerate(reader.depth_index):
+                # Copy: the recording is mapped read-only and the header is patched
+                raw = bytearray(reader.payload(entry))
+                width, height, itemsize, timestamp_us = DEPTH_HEADER.unpack_from(raw)
+                DEPTH_HEADER.pack_into(raw, 0, width, height, itemsize,
+                                       timestamp_us + int(round(loop * span * 1e6)))
+                yield times[i] + loop * span, [FRAME_SIZE_PREFIX.pack(len(raw)), raw], True
+    return frames()
+
+
+# IMU sources: infinite iterators of (sensor_time_s, samples) batches
+
+def synthetic_imu_batches(synthetic, batch):
+    for n in itertools.count(step=batch):
+        samples = synthetic.samples(n, batch)
+        yield samples[-1, 0], samples
+
+
+def session_imu_batches(reader, t0, span):
+    if not len(reader.imu_index):
+        raise ValueError(f"No IMU samples in {reader.directory}")
+    batches = [decode_binary(reader.payload(entry)).samples for entry in reader.imu_index]
+
+    def looped():
+        for loop in itertools.count():
+            for samples in batches:
+                samples = samples.copy()
+                samples[:, 0] += loop * span
+                yield samples[-1, 0] - t0, samples
+    return looped()
+
+
+class Pacer:
+    """
+    Sleeps until each sensor timestamp is due at speed x real time (speed 0:
+    never sleeps). Pacers given the same origin share sensor time 0, so the
+    streams stay aligned with each other.
+    """
+
+    def __init__(self, speed, origin=None):
+        self.speed = speed
+        # (monotonic time, sensor time) the schedule is anchored to
+        self.origin = None if origin is None else (origin, 0.0)
+        # (monotonic time, sensor time) of the last release, follows resyncs and lag
+        self.released = None
+        self.resyncs = 0
+
+    def wait(self, sensor_time):
+        if self.speed <= 0:
+            return
+        now = time.monotonic()
+        if self.origin is None:
+            self.origin = (now, sensor_time)
+        due = self.origin[0] + (sensor_time - self.origin[1]) / self.speed
+        if due > now:
+            time.sleep(due - now)
+            now = due
+        elif now - due > MAX_LAG:
+            self.origin = (now, sensor_time)
+            self.resyncs += 1
+        self.released = (now, sensor_time)
+
+    def sensor_time(self, now):
+        """Sensor time being sent at monotonic time now (paced streams only)"""
+        anchor = self.released or self.origin
+        if anchor is None:
+            return None
+        return anchor[1] + (now - anchor[0]) * self.speed
+
+
+class TCPStreamServer:
+    """One port: accepts any number of clients and sends every frame to all of them"""
+
+    def __init__(self, bind, port, name, frames, speed, keyframe_join=False):
+        self.bind = bind
+        self.port = port
+        self.name = name
+        self.frames = frames
+        self.pacer = Pacer(speed)
+        self.keyframe_join = keyframe_join
+
+        self.clients = []
+        self.pending = []  # waiting for the next keyframe
+        self.cond = threading.Condition()
+        self.running = False
+
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self.disconnects = 0
+
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((bind, port))
+        self.server.listen(8)
+
+    def start(self, origin=None):
+        """origin: monotonic time of sensor time 0, shared to keep streams aligned"""
+        self.pacer = Pacer(self.pacer.speed, origin)
+        self.running = True
+        threading.Thread(target=self.accept_loop, daemon=True).start()
+        threading.Thread(target=self.send_loop, daemon=True).start()
+
+    def stop(self):
+        self.running = False
+        with self.cond:
+            self.cond.notify_all()
+        self.server.close()
+
+    def accept_loop(self):
+        while self.running:
+            try:
+                client, addr = self.server.accept()
+            except OSError:
+                break
+            client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            client.settimeout(SEND_TIMEOUT)
+            with self.cond:
+                (self.pending if self.keyframe_join else self.clients).append(client)
+                self.cond.notify_all()
+
+    def send_loop(self):
+        for sensor_time, parts, keyframe in self.frames:
+            if self.pacer.speed <= 0:
+                # Nothing to pace against at max rate: idle until someone connects
+                with self.cond:
+                    while self.running and not self.clients and not self.pending:
+                        self.cond.wait()
+            if not self.running:
+                break
+
+            # Paced streams keep their sensor clock running with nobody connected, like the camera
+            self.pacer.wait(sensor_time)
+            with self.cond:
+                if keyframe and self.pending:
+                    self.clients.extend(self.pending)
+                    self.pending = []
+                clients = list(self.clients)
+            if not clients:
+                continue
+
+            self.bytes_sent += self.send_frame(clients, parts)
+            self.frames_sent += 1
+
+    def send_frame(self, clients, parts):
+        """Send one frame to every client, returns the bytes sent"""
+        size = sum(len(part) for part in parts)
+        for client in clients:
+            try:
+                for part in parts:
+                    client.sendall(part)
+            except OSError:
+                self.drop(client)
+        return size * len(clients)
+
+    def drop(self, client):
+        with self.cond:
+            if client in self.clients:
+                self.clients.remove(client)
+        self.disconnects += 1
+        client.close()
+
+    def client_count(self):
+        return len(self.clients) + len(self.pending)
+
+
+class DepthServer(TCPStreamServer):
+    """
+    Port 5003 with per-client codecs: each client may send a DEPTH_CODECS
+    line after connecting; until it does (or for good, after
+    NEGOTIATE_FRAMES frames without one) it gets raw frames. Each frame is
+    encoded once per codec in use.
+    """
+
+    def __init__(self, bind, port, name, frames, speed, codecs=None):
+        super().__init__(bind, port, name, frames, speed)
+        self.supported = available_codecs() if codecs is None else codecs
+        self.client_codecs = {}   # client -> codec id, or None while negotiating
+        self.negotiating = {}     # client -> frames left to wait for DEPTH_CODECS
+        self.encode_cache = {}    # (id(pixel source), codec) -> (source, encoded pixels)
+        self.codec_frames = {}    # codec id -> frames sent with it
+
+    def negotiate(self, client):
+        """Codec for client, reading its DEPTH_CODECS line if it has arrived"""
+        codec = self.client_codecs.get(client)
+        if codec is not None:
+            return codec
+        try:
+            # Not recv(MSG_DONTWAIT): with a socket timeout set, Python waits for
+            # readability first and would stall the stream for SEND_TIMEOUT
+            readable, _, _ = select.select([client], [], [], 0)
+            data = client.recv(1024) if readable else None
+        except (OSError, ValueError):
+            data = b''
+        if data:
+            codec = choose_codec(parse_negotiation(data) or [], self.supported)
+        else:
+            left = self.negotiating.get(client, NEGOTIATE_FRAMES) - 1
+            self.negotiating[client] = left
+            if left > 0 and data is None:
+                return RAW
+            codec = RAW
+        self.client_codecs[client] = codec
+        self.negotiating.pop(client, None)
+        return codec
+
+    def encode(self, parts, codec):
+        """Wire parts of the frame in parts re-encoded with codec"""
+        body = memoryview(parts[0])[FRAME_SIZE_PREFIX.size:] if len(parts) == 1 else memoryview(parts[1])
+        width, height, itemsize, timestamp_us = DEPTH_HEADER.unpack_from(body)
+
+        source = parts[-1]
+        key = (id(source), codec)
+        cached = self.encode_cache.get(key)
+        if cached is not None and cached[0] is source:
+            payload = cached[1]
+        else:
+            pixels = np.frombuffer(body, dtype=DEPTH_DTYPES[itemsize], count=width * height,
+                                   offset=DEPTH_HEADER.size).reshape((height, width))
+            payload = encode_pixels(pixels, codec)
+            if len(self.encode_cache) >= ENCODE_CACHE_SIZE:
+                self.encode_cache.pop(next(iter(self.encode_cache)))
+            # Holding source keeps its id from being reused while the entry lives
+            self.encode_cache[key] = (source, payload)
+
+        header = bytearray(FRAME_SIZE_PREFIX.size + DEPTH_HEADER.size)
+        FRAME_SIZE_PREFIX.pack_into(header, 0, DEPTH_HEADER.size + len(payload))
+        DEPTH_HEADER.pack_into(header, FRAME_SIZE_PREFIX.size, width, height,
+                               pack_itemsize(itemsize, codec), timestamp_us)
+        return [header, payload]
+
+    def send_frame(self, clients, parts):
+        by_codec = {}
+        for client in clients:
+            by_codec.setdefault(self.negotiate(client), []).append(client)
+        sent = 0
+        for codec, group in by_codec.items():
+            wire = parts if codec == RAW else self.encode(parts, codec)
+            sent += super().send_frame(group, wire)
+            self.codec_frames[codec] = self.codec_frames.get(codec, 0) + 1
+        return sent
+
+    def drop(self, client):
+        self.client_codecs.pop(client, None)
+        self.negotiating.pop(client, None)
+        super().drop(client)
+
+
+class IMUServer:
+    """UDP 5004: registers clients with REGISTER_IMU and streams batches to all of them"""
+
+    def __init__(self, bind, port, batches, speed, fmt='binary', clock_base=0.0):
+        self.batches = batches
+        self.pacer = Pacer(speed)
+        self.fmt = fmt
+        self.clock_base = clock_base  # sensor time at the shared origin (recorded t0 for sessions)
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.running = False
+        self.seq = 0
+
+        self.datagrams_sent = 0
+        self.samples_sent = 0
+        self.send_errors = 0
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((bind, port))
+
+    def start(self, origin=None):
+        self.pacer = Pacer(self.pacer.speed, origin)
+        self.running = True
+        threading.Thread(target=self.register_loop, daemon=True).start()
+        threading.Thread(target=self.send_loop, daemon=True).start()
+
+    def stop(self):
+        self.running = False
+        self.sock.close()
+
+    def register_loop(self):
+        while self.running:
+            try:
+                data, addr = self.sock.recvfrom(1024)
+            except OSError:
+                break
+            if data[:4] == CLOCK_PROBE_MAGIC:
+                try:
+                    seq, t1 = decode_clock_probe(data)
+                except ValueError:
+                    continue
+                t2 = self.device_time()
+                if t2 is None:
+                    # Unanswered probes make clock_sync.py fall back to its passive estimate
+                    continue
+                self.sock.sendto(encode_clock_reply(seq, t1, t2, self.device_time()), addr)
+            elif data.strip() == REGISTER_MESSAGE:
+                with self.lock:
+                    self.subscribers.add(addr)
+                self.sock.sendto(ACK_MESSAGE, addr)
+
+    def device_time(self):
+        """
+        Emulated device clock: the sensor time of the IMU data being sent now,
+        from the pacer's last release, so replies follow the stamped data
+        through session loops and resyncs. None at max rate, where sensor
+        time has no relation to wall time.
+        """
+        if self.pacer.speed <= 0:
+            return None
+        sensor_time = self.pacer.sensor_time(time.monotonic())
+        return None if sensor_time is None else self.clock_base + sensor_time
+
+    def send_loop(self):
+        for sensor_time, samples in self.batches:
+            if not self.running:
+                break
+            self.pacer.wait(sensor_time)
+            with self.lock:
+                subscribers = list(self.subscribers)
+            if not subscribers:
+                if self.pacer.speed <= 0:
+                    time.sleep(0.05)
+                continue
+
+            if self.fmt == 'json':
+                datagrams = [encode_json(sample) for sample in samples]
+            else:
+                datagrams = []
+                for start in range(0, len(samples), MAX_SAMPLES_PER_DATAGRAM):
+                    datagrams.append(encode_binary(self.seq, samples[start:start + MAX_SAMPLES_PER_DATAGRAM]))
+                    self.seq += 1
+
+            for addr in subscribers:
+                for datagram in datagrams:
+                    try:
+                        self.sock.sendto(datagram, addr)
+                    except OSError:
+                        # e.g. ENOBUFS at max rate: the datagram is lost, like on the real link
+                        self.send_errors += 1
+            self.datagrams_sent += len(datagrams)
+            self.samples_sent += len(samples)
+
+
+def parse_h264_files(specs):
+    """['5000=rgb.h264', ...] -> {5000: 'rgb.h264'}"""
+    files = {}
+    for spec in specs:
+        port, _, path = spec.partition('=')
+        if not path or int(port) not in STREAM_PORTS:
+            raise ValueError(f"Expected PORT=FILE with PORT in {sorted(STREAM_PORTS)}: {spec}")
+        files[int(port)] = path
+    return files
+
+
+def run_emulator(args):
+    width, height = (int(v) for v in args.size.lower().split('x'))
+    servers = []
+    imu_server = None
+    try:
+        reader = SessionReader(args.session) if args.session else None
+        if reader is not None:
+            t0, span = session_timeline(reader)
+
+        if not args.no_video:
+            files = parse_h264_files(args.h264)
+            synthetic = None
+            for port, name in STREAM_PORTS.items():
+                if port in files:
+                    frames = h264_file_frames(files[port], args.fps)
+                else:
+                    if synthetic is None:
+                        synthetic = SyntheticH264(width, height, args.fps, args.bitrate)
+                    frames = synthetic_h264_frames(synthetic)
+                servers.append(TCPStreamServer(args.bind, port, name, frames, args.speed, keyframe_join=True))
+
+        if not args.no_depth:
+            if reader is not None:
+                frames = session_depth_frames(reader, t0, span)
+            else:
+                frames = synthetic_depth_frames(SyntheticDepth(width, height, args.fps))
+            codecs = args.depth_codecs.split(',') if args.depth_codecs else None
+            servers.append(DepthServer(args.bind, DEPTH_PORT, 'Depth', frames, args.speed, codecs))
+
+        if not args.no_imu:
+            if reader is not None:
+                batches = session_imu_batches(reader, t0, span)
+            else:
+                batches = synthetic_imu_batches(SyntheticIMU(args.imu_rate), args.imu_batch)
+            imu_server = IMUServer(args.bind, IMU_PORT, batches, args.speed, args.imu_format,
+                                   clock_base=t0 if reader is not None else 0.0)
+
+    except (OSError, ValueError) as e:
+        print(f"❌ Emulator setup failed: {e}")
+        for server in servers:
+            server.stop()
+        return
+
+    # Shared sensor time 0 for every stream, just after all of them are up
+    origin = time.monotonic() + 0.1
+    for server in servers:
+        server.start(origin)
+    if imu_server:
+        imu_server.start(origin)
+
+    pacing = 'max rate' if args.speed <= 0 else f'{args.speed:g}x real time'
+    print(f"🧪 Pi emulator on {args.bind} ({pacing}), Ctrl+C to stop")
+    for server in servers:
+        print(f"   {server.name:5s} TCP {server.port}")
+    if imu_server:
+        print(f"   IMU   UDP {IMU_PORT} ({args.imu_format})")
+
+    start = time.time()
+    last = {server.port: (0, 0) for server in servers}
+    last_imu = 0
+    try:
+        while args.duration <= 0 or time.time() - start < args.duration:
+            time.sleep(1.0)
+            line = []
+            for server in servers:
+                frames, nbytes = server.frames_sent, server.bytes_sent
+                prev_frames, prev_bytes = last[server.port]
+                last[server.port] = (frames, nbytes)
+                line.append(f"{server.name} {frames - prev_frames}fps/{(nbytes - prev_bytes) * 8 / 1e6:.1f}Mbps"
+                            f"[{server.client_count()}]")
+            if imu_server:
+                samples = imu_server.samples_sent
+                line.append(f"IMU {samples - last_imu}Hz[{len(imu_server.subscribers)}]")
+                last_imu = samples
+            print(' | '.join(line))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for server in servers:
+            server.stop()
+        if imu_server:
+            imu_server.stop()
+        print("Emulator stopped")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='OAK-D Pro Pi Stream Emulator (loopback test server)')
+    parser.add_argument('--bind', default='127.0.0.1', help='Address to serve on (default: 127.0.0.1)')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='Pacing: 1 = real time, N = N times faster, 0 = max rate, clock probes unanswered (default: 1)')
+    parser.add_argument('--fps', type=float, default=30.0, help='Camera frame rate (default: 30)')
+    parser.add_argument('--size', default='1280x720', help='Synthetic frame size (default: 1280x720)')
+    parser.add_argument('--bitrate', type=int, default=3000000, help='Synthetic H.264 bitrate (default: 3000000)')
+    parser.add_argument('--h264', action='append', default=[], metavar='PORT=FILE',
+                        help='Replay an .h264 elementary stream on a video port (repeatable)')
+    parser.add_argument('--session', metavar='DIR', help='Replay depth + IMU from a session_recorder.py recording')
+    parser.add_argument('--imu-rate', type=float, default=200.0, help='Synthetic IMU rate in Hz (default: 200)')
+    parser.add_argument('--imu-batch', type=int, default=4, help='Samples per IMU send (default: 4)')
+    parser.add_argument('--imu-format', choices=('binary', 'json'), default='binary',
+                        help='IMU datagram format (default: binary)')
+    parser.add_argument('--depth-codecs', metavar='A,B',
+                        help=f"Depth codecs clients may pick (default: all available: {','.join(available_codecs())})")
+    parser.add_argument('--no-video', action='store_true', help='Do not serve 5000-5002')
+    parser.add_argument('--no-depth', action='store_true', help='Do not serve 5003')
+    parser.add_argument('--no-imu', action='store_true', help='Do not serve 5004')
+    parser.add_argument('--duration', type=float, default=0, help='Stop after N seconds (default: run until Ctrl+C)')
+
+    args = parser.parse_args()
+
+    run_emulator(args)
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Point Cloud - Depth frames to 3D points, with an Open3D viewer
+
+Deprojection uses ray slopes cached per (width, height, intrinsics,
+stride): a frame gathers its valid pixels and scales them into a reused
+XYZ array. Optional stride subsampling and voxel downsampling thin the
+cloud. The viewer takes the newest frame from a
+latest-wins mailbox at its own rate and updates one geometry in place.
+
+Points are in metres in the camera frame: x right, y down, z forward.
+"""
+
+import math
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from depth_codecs import resolve_codecs
+from depth_receiver import DepthStreamReceiver
+from device_config import add_device_arguments, apply_device
+from frame_mailbox import LatestFrameMailbox
+
+try:
+    import open3d as o3d
+except ImportError:
+    o3d = None
+
+# Pinhole intrinsics in pixels of the full-resolution depth frame
+Intrinsics = namedtuple('Intrinsics', ['fx', 'fy', 'cx', 'cy'])
+
+# Approximate horizontal FOV of the OAK-D Pro stereo pair, used when no
+# calibrated intrinsics are given
+DEFAULT_HFOV_DEG = 72.0
+
+
+def intrinsics_from_fov(width, height, hfov_deg=DEFAULT_HFOV_DEG):
+    """Square-pixel intrinsics centred on the image for a horizontal FOV"""
+    fx = (width / 2.0) / math.tan(math.radians(hfov_deg) / 2.0)
+    return Intrinsics(fx, fx, (width - 1) / 2.0, (height - 1) / 2.0)
+
+
+def voxel_downsample(points, voxel_size):
+    """Centroid of the points in each occupied voxel_size cube (new (M, 3) array)"""
+    if len(points) == 0:
+        return points
+    # Column-wise throughout: reductions over axis 0 of an (N, 3) array are strided and slow
+    scale = 1.0 / voxel_size
+    keys = np.zeros(len(points), dtype=np.int64)
+    for axis in range(3):
+        cells = np.floor(points[:, axis] * scale).astype(np.int64)
+        cells -= cells.min()
+        keys *= int(cells.max()) + 1
+        keys += cells
+
+    # Voxel index per point from one sort of the keys
+    order = np.argsort(keys)
+    sorted_keys = keys[order]
+    first = np.empty(len(keys), dtype=bool)
+    first[0] = True
+    np.not_equal(sorted_keys[1:], sorted_keys[:-1], out=first[1:])
+    voxel = np.empty(len(keys), dtype=np.intp)
+    voxel[order] = np.cumsum(first) - 1
+    count = int(voxel[order[-1]]) + 1
+
+    counts = np.bincount(voxel, minlength=count)
+    out = np.empty((count, 3), dtype=points.dtype)
+    for axis in range(3):
+        out[:, axis] = np.bincount(voxel, weights=points[:, axis], minlength=count) / counts
+    return out
+
+
+class Deprojector:
+    """
+    Depth (H, W) -> valid points (N, 3).
+
+    Ray slopes (u - cx) / fx and (v - cy) / fy of the sampled pixels are
+    built once and cached as flat arrays. A frame gathers its valid
+    (non-zero) pixels first and scales only those: z = depth * depth_scale,
+    x = z * slope_x, y = z * slope_y, each written straight into a column
+    of a reused output array. The returned points are a view into that
+    array: valid until the next deproject() call.
+    """
+
+    def __init__(self, intrinsics=None, stride=1, depth_scale=0.001, hfov_deg=DEFAULT_HFOV_DEG,
+                 dtype=np.float32, max_cached=4):
+        self.intrinsics = intrinsics  # None: intrinsics_from_fov for each frame size
+        self.stride = stride
+        self.depth_scale = depth_scale
+        self.hfov_deg = hfov_deg
+        self.dtype = dtype
+        self.max_cached = max_cached
+
+        self.ray_cache = {}   # (width, height, intrinsics, stride) -> (slope_x, slope_y), flat
+        self.sampled = None   # contiguous copy of the strided pixels (stride > 1)
+        self.valid = None     # depth of the valid pixels
+        self.scratch = None   # gathered ray slopes
+        self.points = None    # output, capacity one point per sampled pixel
+        self.last_count = 0
+
+    def rays(self, width, height):
+        """Cached (slope_x, slope_y) of the sampled pixels of a frame size, row-major"""
+        intrinsics = self.intrinsics or intrinsics_from_fov(width, height, self.hfov_deg)
+        key = (width, height, intrinsics, self.stride)
+        rays = self.ray_cache.get(key)
+        if rays is None:
+            if len(self.ray_cache) >= self.max_cached:
+                self.ray_cache.clear()
+            fx, fy, cx, cy = intrinsics
+            u = (np.arange(0, width, self.stride, dtype=np.float64) - cx) / fx
+            v = (np.arange(0, height, self.stride, dtype=np.float64) - cy) / fy
+            slope_x = np.empty((len(v), len(u)), dtype=self.dtype)
+            slope_y = np.empty((len(v), len(u)), dtype=self.dtype)
+            slope_x[:] = u[None, :]
+            slope_y[:] = v[:, None]
+            rays = (slope_x.reshape(-1), slope_y.reshape(-1))
+            self.ray_cache[key] = rays
+        return rays
+
+    def deproject(self, depth):
+        """Valid (non-zero) pixels of depth as (N, 3) points"""
+        height, width = depth.shape
+        slope_x, slope_y = self.rays(width, height)
+        size = len(slope_x)
+        if self.points is None or len(self.points) != size or self.valid.dtype != depth.dtype:
+            self.sampled = None
+            self.valid = np.empty(size, dtype=depth.dtype)
+            self.scratch = np.empty(size, dtype=self.dtype)
+            self.points = np.empty((size, 3), dtype=self.dtype)
+
+        sampled = depth
+        if self.stride > 1:
+            strided = depth[::self.stride, ::self.stride]
+            if self.sampled is None:
+                self.sampled = np.empty(strided.shape, dtype=depth.dtype)
+            np.copyto(self.sampled, strided)
+            sampled = self.sampled
+        pixels = sampled.reshape(-1)
+
+        index = np.flatnonzero(pixels)
+        count = len(index)
+        valid = self.valid[:count]
+        scratch = self.scratch[:count]
+        points = self.points[:count]
+        np.take(pixels, index, out=valid)
+        np.multiply(valid, self.dtype(self.depth_scale), out=points[:, 2])
+        np.take(slope_x, index, out=scratch)
+        np.multiply(scratch, points[:, 2], out=points[:, 0])
+        np.take(slope_y, index, out=scratch)
+        np.multiply(scratch, points[:, 2], out=points[:, 1])
+        self.last_count = count
+        return points
+
+
+class PointCloudViewer:
+    """Receive thread feeds a latest-wins mailbox; the calling thread deprojects and renders"""
+
+    def __init__(self, receiver, deprojector, voxel_size=0.0, view_fps=15.0,
+                 window_name='Depth Point Cloud'):
+        self.receiver = receiver
+        self.deprojector = deprojector
+        self.voxel_size = voxel_size
+        self.view_fps = view_fps
+        self.window_name = window_name
+        self.mailbox = LatestFrameMailbox()
+        self.running = False
+        self.shown = 0
+
+    def receive_loop(self):
+        try:
+            for frame in self.receiver.frames():
+                self.mailbox.put(frame)
+        except Exception as e:
+            print(f'Raw depth stream error: {e}')
+        finally:
+            self.mailbox.close()
+
+    def cloud(self, frame):
+        """Points of a frame (deprojected, optionally voxel downsampled)"""
+        # frame.depth is the mailbox's copy, valid until the next get
+        points = self.deprojector.deproject(frame.depth)
+        if self.voxel_size > 0:
+            points = voxel_downsample(points, self.voxel_size)
+        return points
+
+    def run(self):
+        """Render the newest frame until the stream ends or the window is closed"""
+        vis = o3d.visualization.Visualizer()
+        vis.create_window(window_name=self.window_name, width=1280, height=720)
+        vis.get_render_option().point_size = 1.5
+        vis.get_render_option().point_color_option = o3d.visualization.PointColorOption.ZCoordinate
+        pcd = o3d.geometry.PointCloud()
+        added = False
+
+        self.running = True
+        receive_thread = threading.Thread(target=self.receive_loop, daemon=True)
+        receive_thread.start()
+        period = 1.0 / self.view_fps
+        try:
+            while self.running:
+                start = time.monotonic()
+                frame = self.mailbox.get_nowait()
+                if frame is not None:
+                    pcd.points = o3d.utility.Vector3dVector(self.cloud(frame))
+                    if not added:
+                        vis.add_geometry(pcd)
+                        # Camera frame: look down +z with y pointing down
+                        view = vis.get_view_control()
+                        view.set_front([0, 0, -1])
+                        view.set_up([0, -1, 0])
+                        added = True
+                    else:
+                        vis.update_geometry(pcd)
+                    self.shown += 1
+                elif not receive_thread.is_alive():
+                    break
+                if not vis.poll_events():
+                    break
+                vis.update_renderer()
+                time.sleep(max(0.0, period - (time.monotonic() - start)))
+        finally:
+            self.running = False
+            self.receiver.stop()
+            self.receiver.close()
+            vis.destroy_window()
+
+
+def run_headless(receiver, deprojector, voxel_size=0.0):
+    """Deproject every frame and print rate, point count and time per frame"""
+    count = 0
+    busy = 0.0
+    points = 0
+    last_report = time.time()
+    try:
+        for frame in receiver.frames():
+            start = time.perf_counter()
+            cloud = deprojector.deproject(frame.depth)
+            if voxel_size > 0:
+                cloud = voxel_downsample(cloud, voxel_size)
+            busy += time.perf_counter() - start
+            count += 1
+            points += len(cloud)
+
+            now = time.time()
+            if now - last_report >= 1.0:
+                print(f'{count / (now - last_report):.1f} fps | {points // count} points/frame | '
+                      f'{busy / count * 1000:.1f} ms/frame deprojection')
+                count, busy, points = 0, 0.0, 0
+                last_report = now
+    except KeyboardInterrupt:
+        pass
+    finally:
+        receiver.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Depth stream to 3D point cloud (Open3D viewer)')
+    ports = (('--port', 'depth'),)
+    add_device_arguments(parser, ports=ports)
+    parser.add_argument('--codec', metavar='A,B',
+                        help='Ask for compressed depth: codec names in order of preference, or "auto" (default: raw)')
+    parser.add_argument('--intrinsics', type=float, nargs=4, metavar=('FX', 'FY', 'CX', 'CY'),
+                        help='Calibrated depth intrinsics in pixels (default: derived from --hfov)')
+    parser.add_argument('--hfov', type=float, default=DEFAULT_HFOV_DEG,
+                        help=f'Horizontal FOV in degrees when no intrinsics are given (default: {DEFAULT_HFOV_DEG:g})')
+    parser.add_argument('--stride', type=int, default=2, help='Use every Nth pixel in both directions (default: 2)')
+    parser.add_argument('--voxel', type=float, default=0.0, help='Voxel downsampling size in metres (default: off)')
+    parser.add_argument('--view-fps', type=float, default=15.0, help='Viewer update rate (default: 15)')
+    parser.add_argument('--headless', action='store_true', help='No viewer: deproject every frame and print timing')
+
+    args = parser.parse_args()
+    apply_device(args, ports)
+
+    headless = args.headless
+    if not headless and o3d is None:
+        print('⚠️  open3d is not installed (pip3 install open3d) - running headless')
+        headless = True
+
+    intrinsics = Intrinsics(*args.intrinsics) if args.intrinsics else None
+    # Open3D takes float64 points without a conversion pass
+    deprojector = Deprojector(intrinsics, stride=max(1, args.stride), hfov_deg=args.hfov,
+                              dtype=np.float32 if headless else np.float64)
+
+    codecs = resolve_codecs(args.codec) if args.codec else None
+    receiver = DepthStreamReceiver(pi_ip=args.ip, port=args.port, num_buffers=4, codecs=codecs)
+    try:
+        receiver.connect()
+    except OSError as e:
+        print(f'Raw depth stream error: {e}')
+        raise SystemExit(1)
+    print(f'Connected to raw 16-bit depth stream on port {args.port}')
+
+    if headless:
+        run_headless(receiver, deprojector, args.voxel)
+    else:
+        PointCloudViewer(receiver, deprojector, args.voxel, args.view_fps).run()
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""
+Session Recorder - Records the depth stream and IMU samples to disk for offline replay
+
+Data file (session.rec), append-only:
+    file header  '<8sI'   magic b'OAKREC01', format version
+    records      '<4sIQ'  tag, payload size, timestamp_us; then the payload
+        b'DPTH'  the depth frame exactly as received: '>IIIQ' header + raw pixels
+        b'IMUB'  one binary IMU datagram (imu_protocol.encode_binary)
+
+Index file (session.idx): one 24-byte INDEX_DTYPE entry per record (tag,
+size, timestamp_us, payload offset), flushed only after the data it points
+to, so a reader can mmap any frame without scanning. A missing or short
+index is rebuilt from the data file.
+"""
+
+import mmap
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from depth_receiver import DepthStreamReceiver, DepthFrame, DEPTH_HEADER, DEPTH_DTYPES
+from device_config import add_device_arguments, apply_device
+from imu_protocol import decode_binary, decode_datagram, encode_binary, register_imu, NUM_COLUMNS
+
+MAGIC = b'OAKREC01'
+VERSION = 1
+FILE_HEADER = struct.Struct('<8sI')
+RECORD_HEADER = struct.Struct('<4sIQ')  # tag, payload size, timestamp_us
+
+DEPTH_TAG = b'DPTH'
+IMU_TAG = b'IMUB'
+
+INDEX_DTYPE = np.dtype([('tag', 'S4'), ('size', '<u4'), ('timestamp_us', '<u8'), ('offset', '<u8')])
+
+DATA_FILENAME = 'session.rec'
+INDEX_FILENAME = 'session.idx'
+
+# Large writes: the kernel sees few, big write() calls even at ~55 MB/s of depth
+WRITE_BUFFER_SIZE = 8 * 1024 * 1024
+
+
+class SessionRecorder:
+    """
+    Append-only recorder fed from the receive threads.
+
+    write_depth() copies the frame into a buffer from a fixed pool and
+    returns at once; the writer thread does all file I/O. If the disk falls
+    behind until the pool is empty, the frame is counted in dropped_depth
+    instead of blocking the receiver.
+    """
+
+    def __init__(self, directory, num_buffers=32, index_interval=1.0):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.data_path = os.path.join(directory, DATA_FILENAME)
+        self.index_path = os.path.join(directory, INDEX_FILENAME)
+        self.index_interval = index_interval
+
+        # 32 x 1.8 MB (1280x720 uint16) rides out ~1 s of disk stall at 30 fps
+        self.free_buffers = deque(bytearray(0) for _ in range(num_buffers))
+        self.queue = queue.Queue()
+
+        self.data_file = open(self.data_path, 'wb', buffering=WRITE_BUFFER_SIZE)
+        self.index_file = open(self.index_path, 'wb')
+        self.data_file.write(FILE_HEADER.pack(MAGIC, VERSION))
+        self.offset = FILE_HEADER.size
+        self.pending_index = []
+        self.record_header = bytearray(RECORD_HEADER.size)
+
+        self.depth_frames = 0
+        self.imu_batches = 0
+        self.dropped_depth = 0
+        self.bytes_written = 0
+        self.max_queue_depth = 0
+
+        self.writer_thread = threading.Thread(target=self.writer_loop, daemon=True)
+        self.writer_thread.start()
+
+    def write_depth(self, frame):
+        """Queue a DepthFrame (its raw header + payload); never blocks"""
+        try:
+            buffer = self.free_buffers.popleft()
+        except IndexError:
+            self.dropped_depth += 1
+            return False
+        size = len(frame.raw)
+        if len(buffer) < size:
+            buffer = bytearray(size)
+        buffer[:size] = frame.raw
+        self.queue.put((DEPTH_TAG, frame.timestamp_us, buffer, size))
+        return True
+
+    def write_imu(self, seq, samples):
+        """Queue an (N, 7) IMU batch; timestamp is the first sample's sensor time"""
+        if not len(samples):
+            return
+        # seq None (JSON packets) is kept as such, so replay telemetry falls back to timestamps
+        payload = encode_binary(seq, samples)
+        self.queue.put((IMU_TAG, int(samples[0, 0] * 1e6), payload, len(payload)))
+
+    def writer_loop(self):
+        """Writer thread: drain the queue into the data file, flush the index periodically"""
+        last_index_flush = time.monotonic()
+        while True:
+            try:
+                item = self.queue.get(timeout=self.index_interval)
+            except queue.Empty:
+                item = ()
+            if item is None:
+                break
+            if item:
+                self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize() + 1)
+                self._write_record(*item)
+            if time.monotonic() - last_index_flush >= self.index_interval:
+                self.flush_index()
+                last_index_flush = time.monotonic()
+        self.flush_index()
+
+    def _write_record(self, tag, timestamp_us, payload, size):
+        RECORD_HEADER.pack_into(self.record_header, 0, tag, size, timestamp_us)
+        self.data_file.write(self.record_header)
+        self.data_file.write(memoryview(payload)[:size])
+
+        payload_offset = self.offset + RECORD_HEADER.size
+        self.pending_index.append((tag, size, timestamp_us, payload_offset))
+        self.offset = payload_offset + size
+        self.bytes_written += RECORD_HEADER.size + size
+
+        if tag == DEPTH_TAG:
+            self.depth_frames += 1
+            self.free_buffers.append(payload)
+        else:
+            self.imu_batches += 1
+
+    def flush_index(self):
+        """Make everything written so far durable in the data file, then index it"""
+        if not self.pending_index:
+            return
+        self.data_file.flush()
+        entries = np.array(self.pending_index, dtype=INDEX_DTYPE)
+        self.pending_index = []
+        self.index_file.write(entries.tobytes())
+        self.index_file.flush()
+
+    def close(self):
+        """Write everything still queued and close the files"""
+        if self.writer_thread.is_alive():
+            self.queue.put(None)
+            self.writer_thread.join()
+        self.data_file.close()
+        self.index_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SessionReader:
+    """
+    Memory-mapped access to a recorded session.
+
+    Depth frames come back as DepthFrame tuples whose depth array is a
+    read-only np.frombuffer view on the mapping (no copy).
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.data_path = os.path.join(directory, DATA_FILENAME)
+        self.index_path = os.path.join(directory, INDEX_FILENAME)
+
+        with open(self.data_path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = FILE_HEADER.unpack_from(self.mm)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not a session recording: {self.data_path}")
+
+        index = np.fromfile(self.index_path, dtype=INDEX_DTYPE) if os.path.exists(self.index_path) else None
+        if index is None or not len(index) or self._indexed_end(index) < len(self.mm):
+            # Interrupted recording: records written after the last index flush
+            index = self.rebuild_index()
+        self.index = index
+
+        self.depth_index = index[index['tag'] == DEPTH_TAG]
+        self.imu_index = index[index['tag'] == IMU_TAG]
+        self.depth_times = self.depth_index['timestamp_us']
+        self.imu_times = self.imu_index['timestamp_us']
+
+    @staticmethod
+    def _indexed_end(index):
+        last = index[-1]
+        return int(last['offset']) + int(last['size'])
+
+    def rebuild_index(self):
+        """Scan the data file record by record (stops at a truncated tail)"""
+        entries = []
+        offset = FILE_HEADER.size
+        end = len(self.mm)
+        while offset + RECORD_HEADER.size <= end:
+            tag, size, timestamp_us = RECORD_HEADER.unpack_from(self.mm, offset)
+            payload_offset = offset + RECORD_HEADER.size
+            if tag not in (DEPTH_TAG, IMU_TAG) or payload_offset + size > end:
+                break
+            entries.append((tag, size, timestamp_us, payload_offset))
+            offset = payload_offset + size
+        return np.array(entries, dtype=INDEX_DTYPE)
+
+    def save_index(self):
+        """Write the (rebuilt) index back next to the data file"""
+        self.index.tofile(self.index_path)
+
+    def __len__(self):
+        return len(self.depth_index)
+
+    def payload(self, entry):
+        offset = int(entry['offset'])
+        return memoryview(self.mm)[offset:offset + int(entry['size'])]
+
+    def depth_frame(self, i):
+        """The i-th depth frame as a DepthFrame (seq is the 1-based frame number)"""
+        entry = self.depth_index[i]
+        offset = int(entry['offset'])
+        width, height, itemsize, timestamp_us = DEPTH_HEADER.unpack_from(self.mm, offset)
+        depth = np.frombuffer(self.mm, dtype=DEPTH_DTYPES[itemsize], count=width * height,
+                              offset=offset + DEPTH_HEADER.size).reshape((height, width))
+        return DepthFrame(int(i) % len(self) + 1, width, height, itemsize, timestamp_us,
+                          depth, self.payload(entry))
+
+    def depth_at(self, timestamp_us):
+        """Depth frame closest to timestamp_us"""
+        if not len(self):
+            return None
+        i = int(np.searchsorted(self.depth_times, timestamp_us))
+        if i == len(self) or (i > 0 and timestamp_us - self.depth_times[i - 1] <= self.depth_times[i] - timestamp_us):
+            i -= 1
+        return self.depth_frame(i)
+
+    def depth_frames(self):
+        for i in range(len(self)):
+            yield self.depth_frame(i)
+
+    __iter__ = depth_frames
+
+    def imu_samples(self, start_us=None, end_us=None):
+        """(N, 7) array of IMU samples with start_us <= t < end_us (sensor time, µs)"""
+        lo = 0
+        hi = len(self.imu_index)
+        if start_us is not None:
+            # A batch starting before start_us can still hold samples after it
+            lo = max(int(np.searchsorted(self.imu_times, start_us, side='right')) - 1, 0)
+        if end_us is not None:
+            hi = int(np.searchsorted(self.imu_times, end_us))
+        batches = [decode_binary(self.payload(entry)).samples for entry in self.imu_index[lo:hi]]
+        if not batches:
+            return np.empty((0, NUM_COLUMNS))
+        samples = np.concatenate(batches)
+        keep = np.ones(len(samples), dtype=bool)
+        if start_us is not None:
+            keep &= samples[:, 0] * 1e6 >= start_us
+        if end_us is not None:
+            keep &= samples[:, 0] * 1e6 < end_us
+        return samples[keep]
+
+    def records(self):
+        """Iterate over (tag, timestamp_us, payload memoryview) in file order"""
+        for entry in self.index:
+            yield bytes(entry['tag']), int(entry['timestamp_us']), self.payload(entry)
+
+    def close(self):
+        try:
+            self.mm.close()
+        except BufferError:
+            # Frames handed out still reference the mapping; it closes with them
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def record_depth(receiver, recorder):
+    try:
+        receiver.connect()
+        print(f'✅ Depth connected ({receiver.pi_ip}:{receiver.port})')
+        receiver.run(recorder.write_depth)
+    except Exception as e:
+        print(f'❌ Depth stream error: {e}')
+    finally:
+        receiver.close()
+
+
+def record_imu(pi_ip, port, recorder, running):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.settimeout(1.0)
+    try:
+        if not register_imu(sock, pi_ip, port):
+            print(f'❌ No response from IMU server at {pi_ip}:{port}')
+            return
+        print(f'✅ IMU registered ({pi_ip}:{port})')
+        recv_buffer = bytearray(65535)
+        recv_view = memoryview(recv_buffer)
+        while running.is_set():
+            try:
+                nbytes = sock.recv_into(recv_view)
+                batch = decode_datagram(recv_view[:nbytes])
+            except (socket.timeout, ValueError):
+                continue
+            recorder.write_imu(batch.seq, batch.samples)
+    except Exception as e:
+        print(f'❌ IMU stream error: {e}')
+    finally:
+        sock.close()
+
+
+def record_session(pi_ip, out_dir, depth_port=5003, imu_port=5004, depth=True, imu=True):
+    recorder = SessionRecorder(out_dir)
+    running = threading.Event()
+    running.set()
+    receiver = DepthStreamReceiver(pi_ip=pi_ip, port=depth_port, num_buffers=4)
+    threads = []
+    if depth:
+        threads.append(threading.Thread(target=record_depth, args=(receiver, recorder), daemon=True))
+    if imu:
+        threads.append(threading.Thread(target=record_imu, args=(pi_ip, imu_port, recorder, running), daemon=True))
+    for thread in threads:
+        thread.start()
+
+    print(f'🔴 Recording to {out_dir} (Ctrl+C to stop)')
+    start = time.time()
+    try:
+        while any(thread.is_alive() for thread in threads):
+            time.sleep(1.0)
+            elapsed = time.time() - start
+            print(f'{elapsed:6.0f}s | depth {recorder.depth_frames} ({recorder.depth_frames / elapsed:.1f} fps, '
+                  f'{recorder.dropped_depth} dropped) | IMU batches {recorder.imu_batches} | '
+                  f'{recorder.bytes_written / elapsed / 1e6:.1f} MB/s | queue max {recorder.max_queue_depth}')
+    except KeyboardInterrupt:
+        pass
+    finally:
+        running.clear()
+        receiver.stop()
+        for thread in threads:
+            thread.join(timeout=2.0)
+        recorder.close()
+        print(f'💾 Saved {recorder.depth_frames} depth frames, {recorder.imu_batches} IMU batches '
+              f'({recorder.bytes_written / 1e6:.1f} MB, {recorder.dropped_depth} depth frames dropped)')
+
+
+def print_session_info(directory):
+    with SessionReader(directory) as reader:
+        print(f'📁 {directory}')
+        print(f'Depth frames: {len(reader)}')
+        if len(reader):
+            first = reader.depth_frame(0)
+            span = (reader.depth_times[-1] - reader.depth_times[0]) / 1e6
+            rate = (len(reader) - 1) / span if span > 0 else 0
+            print(f'  {first.width}x{first.height} | {span:.1f}s | {rate:.1f} fps')
+        samples = reader.imu_samples()
+        print(f'IMU batches: {len(reader.imu_index)} | samples: {len(samples)}')
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='OAK-D Pro Depth + IMU Session Recorder')
+    ports = (('--depth-port', 'depth'), ('--imu-port', 'imu'))
+    add_device_arguments(parser, ports=ports)
+    parser.add_argument('--out', default=None, help='Output directory (default: recordings/<date_time>)')
+    parser.add_argument('--no-depth', action='store_true', help='Do not record depth')
+    parser.add_argument('--no-imu', action='store_true', help='Do not record IMU')
+    parser.add_argument('--info', metavar='DIR', help='Summarize an existing recording and exit')
+
+    args = parser.parse_args()
+
+    if args.info:
+        print_session_info(args.info)
+    else:
+        apply_device(args, [p for p, kind in zip(ports, (not args.no_depth, not args.no_imu)) if kind])
+        out_dir = args.out or os.path.join('recordings', time.strftime('%Y%m%d_%H%M%S'))
+        record_session(args.ip, out_dir, args.depth_port, args.imu_port,
+                       depth=not args.no_depth, imu=not args.no_imu)
@@ -2,8 +2,16 @@
 
 # Optimized SSH script for Raspberry Pi OAK-D Pro project
 # Uses SSH key authentication and connection multiplexing for speed
+# The Pi comes from devices.json: DEVICE=<name> selects one (default: the first)
 
-PROJECT_DIR="/home/ivyspec/ivy_streamer"
+SCRIPT_DIR="$(cd "$(dirname "$0")" && pwd)"
+device_value() {
+    python3 "$SCRIPT_DIR/device_config.py" get ${DEVICE:+--device "$DEVICE"} "$1"
+}
+PROJECT_DIR="$(device_value project_dir)" || exit 1
+# Without a separate control address, SSH goes to the stream IP
+SSH_IP="$(device_value ssh_ip 2>/dev/null || device_value ip)" || exit 1
+SSH_HOST="$(device_value ssh_host 2>/dev/null || echo "$SSH_IP")"
 
 # Colors for output
 RED='\033[0;31m'
@@ -19,8 +27,8 @@ print_info() { echo -e "${BLUE}ℹ${NC} $1"; }
 
 # Quick connectivity check
 check_pi_connection() {
-    if ! ping -c 1 -W 2 192.168.1.202 &>/dev/null; then
-        print_error "Pi not reachable at 192.168.1.202"
+    if ! ping -c 1 -W 2 "$SSH_IP" &>/dev/null; then
+        print_error "Pi not reachable at $SSH_IP"
         return 1
     fi
     return 0
@@ -34,7 +42,7 @@ execute_ssh() {
 
     while [ $retry_count -lt $max_retries ]; do
         # Test SSH connectivity first
-        if ! ssh -o ConnectTimeout=3 pi "exit" 2>/dev/null; then
+        if ! ssh -o ConnectTimeout=3 "$SSH_HOST" "exit" 2>/dev/null; then
             retry_count=$((retry_count + 1))
             if [ $retry_count -lt $max_retries ]; then
                 print_warning "SSH attempt $retry_count failed, retrying..."
@@ -44,7 +52,7 @@ execute_ssh() {
         fi
 
         # SSH is connected, execute command (ignore command exit codes for pkill, etc.)
-        ssh -o ConnectTimeout=5 pi "cd $PROJECT_DIR 2>/dev/null || true; $*" 2>/dev/null
+        ssh -o ConnectTimeout=5 "$SSH_HOST" "cd $PROJECT_DIR 2>/dev/null || true; $*" 2>/dev/null
         ssh_result=$?
 
         # For pkill commands, success means SSH worked (ignore if no processes found)
@@ -66,8 +74,8 @@ execute_ssh() {
 main() {
     if [ $# -eq 0 ]; then
         # Interactive session
-        print_info "Connecting to Pi (interactive)..."
-        ssh pi -t "cd $PROJECT_DIR 2>/dev/null || echo 'Warning: Project directory not found'; exec bash -l"
+        print_info "Connecting to Pi $SSH_HOST (interactive)..."
+        ssh "$SSH_HOST" -t "cd $PROJECT_DIR 2>/dev/null || echo 'Warning: Project directory not found'; exec bash -l"
     else
         # Execute command
         if ! check_pi_connection; then
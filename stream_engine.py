@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Stream Engine - One selector loop driving every TCP stream monitor
+Non-blocking connects, reconnect with bounded exponential backoff, periodic
+timers, per-stream TCP transport telemetry, and per-stream frame arrival
+stats (stream_stats.py) published as immutable snapshots by reference swap
+(no locks). Other sockets (e.g. the relay's local consumers) can share the
+loop through add_handler.
+"""
+
+import errno
+import selectors
+import socket
+import threading
+import time
+
+from stream_scanner import scanner_for_port
+from stream_stats import StreamStats
+from tcp_telemetry import TransportSeries
+
+# Connection states
+IDLE = 'idle'              # waiting for the next (re)connect attempt
+CONNECTING = 'connecting'  # non-blocking connect in flight
+CONNECTED = 'connected'    # receiving
+
+# Reads per readiness event before yielding to the other streams
+MAX_READS_PER_EVENT = 8
+
+
+class StreamConnection:
+    """State of one monitored TCP stream; only the engine thread mutates it"""
+
+    def __init__(self, host, port, name, scanner, history=10):
+        self.host = host
+        self.port = port
+        self.name = name
+        self.scanner = scanner
+
+        self.sock = None
+        self.state = IDLE
+        self.next_attempt = 0.0
+        self.connect_started = 0.0
+        self.last_rx = 0.0
+        self.backoff = 0.0
+        self.reconnects = 0
+
+        self.bytes_at_window = 0
+        self.frame_stats = StreamStats(history=history)
+        self.transport = TransportSeries()
+
+        self.hello = None       # bytes sent right after connecting (e.g. a DEPTH_CODECS request)
+        self.on_state = None    # on_state(connected) on the engine thread when a connection opens/drops
+
+        # Published snapshot; replaced as a whole, never mutated, so readers need no lock
+        self.stats = None
+        self.publish(active=False)
+
+    def publish(self, active, monitor_bandwidth=0, last_frame_time=0):
+        self.stats = self.frame_stats.snapshot(
+            time.monotonic(),
+            name=self.name,
+            active=active,
+            monitor_bandwidth=monitor_bandwidth,
+            last_frame_time=last_frame_time,
+            reconnects=self.reconnects,
+            transport=self.transport.summary() if active else None,
+        )
+
+
+class StreamEngine:
+    """Single-threaded selector loop for all stream connections and periodic samplers"""
+
+    def __init__(self, connect_timeout=2.0, idle_timeout=2.0,
+                 min_backoff=0.5, max_backoff=10.0, stats_interval=1.0, transport_interval=0.25):
+        self.connect_timeout = connect_timeout
+        self.idle_timeout = idle_timeout
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.stats_interval = stats_interval
+        self.transport_interval = transport_interval
+
+        self.selector = selectors.DefaultSelector()
+        self.streams = {}
+        self.timers = []
+        self.running = False
+        self.thread = None
+
+    def add_stream(self, host, port, name=None, scanner=None):
+        """Register a TCP stream to monitor, returns its StreamConnection"""
+        conn = StreamConnection(host, port, name or str(port), scanner or scanner_for_port(port))
+        self.streams[(host, port)] = conn
+        return conn
+
+    def add_handler(self, sock, events, callback):
+        """Call callback(mask) on the engine thread when sock is ready for events"""
+        self.selector.register(sock, events, callback)
+
+    def modify_handler(self, sock, events, callback):
+        self.selector.modify(sock, events, callback)
+
+    def remove_handler(self, sock):
+        try:
+            self.selector.unregister(sock)
+        except (KeyError, ValueError):
+            pass
+
+    def add_timer(self, interval, callback):
+        """Run callback() on the engine thread every interval seconds"""
+        self.timers.append([time.monotonic() + interval, interval, callback])
+
+    def start(self):
+        """Run the loop on a single background thread"""
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=2.0)
+
+    def run(self):
+        """Main engine loop"""
+        self.running = True
+        self.add_timer(self.stats_interval, self._publish_stats)
+        if self.transport_interval:
+            self.add_timer(self.transport_interval, self._sample_transport)
+        try:
+            while self.running:
+                now = time.monotonic()
+                self._service_connections(now)
+                self._run_timers(now)
+
+                timeout = self._next_deadline(now) - now
+                for key, mask in self.selector.select(max(0.0, min(timeout, 0.5))):
+                    conn = key.data
+                    if not isinstance(conn, StreamConnection):
+                        conn(mask)
+                    elif conn.state == CONNECTING:
+                        self._finish_connect(conn)
+                    else:
+                        self._on_readable(conn)
+        finally:
+            for conn in self.streams.values():
+                self._close(conn)
+            self.selector.close()
+
+    def _next_deadline(self, now):
+        deadline = now + 0.5
+        for timer in self.timers:
+            deadline = min(deadline, timer[0])
+        for conn in self.streams.values():
+            if conn.state == IDLE:
+                deadline = min(deadline, conn.next_attempt)
+        return deadline
+
+    def _run_timers(self, now):
+        for timer in self.timers:
+            if now >= timer[0]:
+                # Skip missed ticks instead of bursting to catch up
+                timer[0] = max(timer[0] + timer[1], now)
+                try:
+                    timer[2]()
+                except Exception as e:
+                    print(f"Engine timer error: {e}")
+
+    def _service_connections(self, now):
+        for conn in self.streams.values():
+            if conn.state == IDLE:
+                if now >= conn.next_attempt:
+                    self._start_connect(conn, now)
+            elif conn.state == CONNECTING:
+                if now - conn.connect_started > self.connect_timeout:
+                    self._fail(conn, now)
+            elif now - conn.last_rx > self.idle_timeout:
+                # Connection timeout is normal when stream is not active
+                self._fail(conn, now)
+
+    def _start_connect(self, conn, now):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        conn.sock = sock
+        conn.connect_started = now
+        err = sock.connect_ex((conn.host, conn.port))
+        if err in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+            conn.state = CONNECTING
+            self.selector.register(sock, selectors.EVENT_WRITE, conn)
+        else:
+            self._fail(conn, now)
+
+    def _finish_connect(self, conn):
+        now = time.monotonic()
+        err = conn.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if err:
+            # Stream not available - this is normal when Pi is not streaming
+            self._fail(conn, now)
+            return
+
+        conn.state = CONNECTED
+        conn.last_rx = now
+        conn.scanner.reset()
+        conn.frame_stats.reset(now)
+        conn.bytes_at_window = conn.scanner.byte_count
+        conn.transport.clear()
+        conn.transport.sample(conn.sock, now)
+        if conn.hello:
+            try:
+                conn.sock.send(conn.hello)
+            except OSError:
+                pass
+        self.selector.modify(conn.sock, selectors.EVENT_READ, conn)
+        conn.publish(active=True)
+        if conn.on_state is not None:
+            conn.on_state(True)
+
+    def _on_readable(self, conn):
+        scanner = conn.scanner
+        try:
+            for _ in range(MAX_READS_PER_EVENT):
+                frames = scanner.frame_count
+                if not scanner.recv_from(conn.sock):
+                    self._fail(conn, time.monotonic())
+                    return
+                now = time.monotonic()
+                if scanner.frame_count != frames:
+                    conn.frame_stats.record(scanner.frame_count - frames, now)
+                conn.last_rx = now
+                conn.backoff = 0.0
+        except (BlockingIOError, InterruptedError):
+            pass
+        except OSError as e:
+            print(f"Stream monitor error for port {conn.port}: {e}")
+            self._fail(conn, time.monotonic())
+
+    def _sample_transport(self):
+        """TCP_INFO + receive queue of every connected stream"""
+        now = time.monotonic()
+        for conn in self.streams.values():
+            if conn.state == CONNECTED:
+                conn.transport.sample(conn.sock, now)
+
+    def _publish_stats(self):
+        now = time.monotonic()
+        for conn in self.streams.values():
+            if conn.state != CONNECTED:
+                continue
+
+            elapsed = now - conn.frame_stats.window_start
+            if elapsed <= 0:
+                continue
+            bytes_read = conn.scanner.byte_count - conn.bytes_at_window
+            mbps_consumed = (bytes_read * 8) / (elapsed * 1000 * 1000)
+
+            conn.frame_stats.roll(now)
+            conn.publish(active=True, monitor_bandwidth=mbps_consumed, last_frame_time=time.time())
+            conn.bytes_at_window = conn.scanner.byte_count
+
+    def _close(self, conn):
+        if conn.sock is not None:
+            try:
+                self.selector.unregister(conn.sock)
+            except (KeyError, ValueError):
+                pass
+            conn.sock.close()
+            conn.sock = None
+
+    def _fail(self, conn, now):
+        """Drop the connection and schedule a reconnect with bounded exponential backoff"""
+        was_connected = conn.state == CONNECTED
+        self._close(conn)
+        conn.state = IDLE
+        conn.backoff = min(self.max_backoff, max(self.min_backoff, conn.backoff * 2))
+        conn.next_attempt = now + conn.backoff
+        if was_connected:
+            conn.reconnects += 1
+        conn.frame_stats.reset(now)
+        conn.publish(active=False)
+        if was_connected and conn.on_state is not None:
+            conn.on_state(False)
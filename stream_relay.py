@@ -0,0 +1,599 @@
+#!/usr/bin/env python3
+"""
+Stream Relay - One upstream connection per Pi stream, fanned out to local consumers
+
+The Pi encodes once but used to send every stream twice: once to the
+viewer and once to the monitor. The relay holds the only connection per
+port on the StreamEngine thread (the monitor counts frames from the same
+bytes). It serves any number of local consumers on port + relay_offset
+(10000 by default, see device_config.py) over loopback TCP, and optionally
+on Unix sockets. IMU datagrams are relayed the same way. One engine thread
+can relay every configured device.
+
+Each consumer has a bounded queue. A consumer that falls behind never
+slows the others. It keeps receiving up to the next cut point, then skips
+data until its queue has drained and the next sync point arrives.
+  H.264: cut at any NAL start, resume at the next SPS (keyframe)
+  Depth: cut and resume at frame starts, so it only ever misses whole frames
+New consumers also start at a sync point. When the upstream connection
+drops, its consumers are disconnected, as they would be by the Pi.
+"""
+
+import os
+import selectors
+import socket
+import time
+from bisect import bisect_left
+from collections import deque
+
+from depth_codecs import negotiation_message, resolve_codecs
+from device_config import DEFAULT_RELAY_OFFSET, add_device_arguments, devices_from_args
+from imu_protocol import ACK_MESSAGE, IMU_REREGISTER_SECONDS, REGISTER_MESSAGE
+from stream_engine import StreamEngine
+from stream_scanner import FRAME_SIZE_PREFIX, START_CODE, scanner_for_kind
+
+# Per-consumer queue limits: ~2s of 8 Mbps video, ~8 raw 1280x720 depth frames
+VIDEO_QUEUE_BYTES = 2 * 1024 * 1024
+DEPTH_QUEUE_BYTES = 16 * 1024 * 1024
+# Buffers handed to one sendmsg call
+MAX_SEND_BUFFERS = 64
+# ICMP errors (consumer port closed) before an IMU consumer is dropped
+IMU_CONSUMER_MAX_ERRORS = 3
+# Linux: per-destination ICMP errors on the IMU socket's error queue
+IP_RECVERR = getattr(socket, 'IP_RECVERR', 11)
+
+# Consumer states
+FORWARD = 'forward'    # queueing everything
+CUTTING = 'cutting'    # over the limit: queueing up to the next cut point
+SKIPPING = 'skipping'  # waiting for room and a sync point
+
+
+class AnnexBPoints:
+    """Cut points at every NAL start, sync points at every SPS (start codes split across chunks are missed)"""
+
+    def reset(self):
+        pass
+
+    def scan(self, data):
+        cuts = []
+        syncs = []
+        find = data.find
+        end = len(data)
+        pos = 0
+        while True:
+            hit = find(START_CODE, pos)
+            if hit == -1 or hit + 3 >= end:
+                break
+            # Include the leading zero of a 4-byte start code
+            start = hit - 1 if hit > pos and data[hit - 1] == 0 else hit
+            cuts.append(start)
+            if data[hit + 3] & 0x1F == 7:
+                syncs.append(start)
+            pos = hit + 3
+        return cuts, syncs
+
+
+class LengthPrefixPoints:
+    """Frame starts of the '>I' length-prefixed depth stream, both cut and sync points"""
+
+    def __init__(self):
+        self.remaining = 0    # bytes of the current frame still to come
+        self.partial = b''    # start of a prefix split across chunks
+
+    def reset(self):
+        self.remaining = 0
+        self.partial = b''
+
+    def scan(self, data):
+        points = []
+        end = len(data)
+        pos = 0
+        if self.partial:
+            need = FRAME_SIZE_PREFIX.size - len(self.partial)
+            if end < need:
+                self.partial += data
+                return points, points
+            self.remaining = FRAME_SIZE_PREFIX.unpack(self.partial + data[:need])[0]
+            self.partial = b''
+            pos = need
+        while True:
+            if self.remaining:
+                skip = min(self.remaining, end - pos)
+                self.remaining -= skip
+                pos += skip
+                if self.remaining:
+                    break
+            if pos >= end:
+                break
+            if end - pos < FRAME_SIZE_PREFIX.size:
+                self.partial = data[pos:]
+                break
+            points.append(pos)
+            self.remaining = FRAME_SIZE_PREFIX.unpack_from(data, pos)[0]
+            pos += FRAME_SIZE_PREFIX.size
+        return points, points
+
+
+class RelayConsumer:
+    """One local consumer socket and its bounded send queue"""
+
+    def __init__(self, sock, name, limit):
+        self.sock = sock
+        self.name = name
+        self.limit = limit
+        self.queue = deque()   # memoryviews still to send
+        self.queued = 0
+        self.state = SKIPPING  # start at a sync point
+        self.writing = False   # registered for EVENT_WRITE
+
+        self.bytes_sent = 0
+        self.bytes_skipped = 0
+        self.overflows = 0
+        self.connected_at = time.monotonic()
+
+    def enqueue(self, data):
+        if data:
+            self.queue.append(data)
+            self.queued += len(data)
+
+
+class PortRelay:
+    """Fan-out of one upstream stream (a StreamConnection) to local consumers"""
+
+    def __init__(self, engine, conn, points, limit, bind='127.0.0.1', local_port=None, unix_path=None):
+        self.engine = engine
+        self.conn = conn
+        self.points = points
+        self.limit = limit
+        self.local_port = local_port if local_port is not None else conn.port + DEFAULT_RELAY_OFFSET
+        self.unix_path = unix_path
+        self.consumers = []
+        self.listeners = []
+
+        self.chunks = 0
+        self.bytes_in = 0
+        self.disconnects = 0
+        self.overflows = 0      # totals over every consumer, including departed ones
+        self.bytes_skipped = 0
+
+        self.listen(socket.socket(socket.AF_INET, socket.SOCK_STREAM), (bind, self.local_port))
+        if unix_path:
+            if os.path.exists(unix_path):
+                os.unlink(unix_path)
+            self.listen(socket.socket(socket.AF_UNIX, socket.SOCK_STREAM), unix_path)
+
+        conn.scanner.tap = self.on_data
+        conn.on_state = self.on_upstream
+
+    def listen(self, server, address):
+        if server.family == socket.AF_INET:
+            server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind(address)
+        server.listen(16)
+        server.setblocking(False)
+        self.listeners.append(server)
+        self.engine.add_handler(server, selectors.EVENT_READ, lambda mask: self.accept(server))
+
+    def accept(self, server):
+        try:
+            sock, addr = server.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            print(f"⚠️  Relay {self.conn.name}: accept failed: {e}")
+            return
+        sock.setblocking(False)
+        if sock.family == socket.AF_INET:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # Room for a few depth frames (or seconds of video) in the kernel as well
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4 * 1024 * 1024)
+        consumer = RelayConsumer(sock, addr or 'unix', self.limit)
+        self.consumers.append(consumer)
+        self.engine.add_handler(sock, selectors.EVENT_READ, lambda mask: self.on_consumer(consumer, mask))
+
+    def on_upstream(self, connected):
+        """Upstream (re)connected or lost: consumers cannot follow a new stream mid-frame"""
+        self.points.reset()
+        if not connected:
+            for consumer in list(self.consumers):
+                self.close(consumer)
+
+    def on_data(self, view):
+        """Scanner tap: one received upstream chunk (engine thread)"""
+        data = bytes(view)  # one copy shared by every consumer
+        self.chunks += 1
+        self.bytes_in += len(data)
+        if not self.consumers:
+            self.points.scan(data)
+            return
+        cuts, syncs = self.points.scan(data)
+        view = memoryview(data)
+        for consumer in list(self.consumers):
+            self.offer(consumer, view, cuts, syncs)
+            if consumer.queue and not consumer.writing:
+                self.flush(consumer)
+
+    def offer(self, consumer, view, cuts, syncs):
+        """Queue what the consumer's drop policy lets through of one chunk"""
+        end = len(view)
+        pos = 0
+        if consumer.state == FORWARD and consumer.queued + end > consumer.limit:
+            consumer.state = CUTTING
+            consumer.overflows += 1
+            self.overflows += 1
+        if consumer.state == CUTTING:
+            if not cuts:
+                # Finish the unit in progress; a consumer that stopped reading altogether goes
+                if consumer.queued + end > 2 * consumer.limit:
+                    print(f"⚠️  Relay {self.conn.name}: consumer {consumer.name} stalled, disconnecting")
+                    self.close(consumer)
+                    return
+                consumer.enqueue(view)
+                return
+            consumer.enqueue(view[:cuts[0]])
+            consumer.state = SKIPPING
+            pos = cuts[0]
+        if consumer.state == SKIPPING:
+            index = bisect_left(syncs, pos)
+            if index == len(syncs) or consumer.queued > consumer.limit // 2:
+                consumer.bytes_skipped += end - pos
+                self.bytes_skipped += end - pos
+                return
+            consumer.bytes_skipped += syncs[index] - pos
+            self.bytes_skipped += syncs[index] - pos
+            pos = syncs[index]
+            consumer.state = FORWARD
+        consumer.enqueue(view[pos:] if pos else view)
+
+    def flush(self, consumer):
+        """Send as much of the queue as the socket takes without blocking"""
+        queue = consumer.queue
+        try:
+            while queue:
+                buffers = [queue[i] for i in range(min(len(queue), MAX_SEND_BUFFERS))]
+                sent = consumer.sock.sendmsg(buffers)
+                consumer.bytes_sent += sent
+                consumer.queued -= sent
+                while sent:
+                    head = queue[0]
+                    if sent >= len(head):
+                        sent -= len(head)
+                        queue.popleft()
+                    else:
+                        queue[0] = head[sent:]
+                        sent = 0
+        except (BlockingIOError, InterruptedError):
+            pass
+        except OSError:
+            self.close(consumer)
+            return
+        writing = bool(queue)
+        if writing != consumer.writing:
+            consumer.writing = writing
+            events = selectors.EVENT_READ | (selectors.EVENT_WRITE if writing else 0)
+            self.engine.modify_handler(consumer.sock, events, lambda mask: self.on_consumer(consumer, mask))
+
+    def on_consumer(self, consumer, mask):
+        if mask & selectors.EVENT_READ:
+            # Consumers only ever send requests the relay does not forward (e.g. DEPTH_CODECS); EOF means gone
+            try:
+                if not consumer.sock.recv(4096):
+                    self.close(consumer)
+                    return
+            except (BlockingIOError, InterruptedError):
+                pass
+            except OSError:
+                self.close(consumer)
+                return
+        if mask & selectors.EVENT_WRITE:
+            self.flush(consumer)
+
+    def close(self, consumer):
+        if consumer in self.consumers:
+            self.consumers.remove(consumer)
+            self.disconnects += 1
+        self.engine.remove_handler(consumer.sock)
+        consumer.sock.close()
+        consumer.queue.clear()
+        consumer.queued = 0
+
+    def stop(self):
+        for consumer in list(self.consumers):
+            self.close(consumer)
+        for server in self.listeners:
+            self.engine.remove_handler(server)
+            server.close()
+        if self.unix_path and os.path.exists(self.unix_path):
+            os.unlink(self.unix_path)
+
+    def summary(self):
+        """Plain-dict stats for display"""
+        return {
+            'name': self.conn.name,
+            'port': self.conn.port,
+            'local_port': self.local_port,
+            'consumers': len(self.consumers),
+            'bytes_in': self.bytes_in,
+            'queued': sum(c.queued for c in self.consumers),
+            'overflows': self.overflows,
+            'skipped': self.bytes_skipped,
+            'disconnects': self.disconnects,
+        }
+
+
+class IMURelay:
+    """
+    IMU UDP port: registers once with the Pi and forwards every datagram to the
+    local consumers that registered on the relay port. A local REGISTER_IMU
+    is only acknowledged while the Pi is answering, so readiness probes
+    still mean "the Pi is streaming". Clock probes are not relayed: run
+    clock_sync.py against the Pi itself.
+
+    Registrations waiting for the Pi expire after IMU_REREGISTER_SECONDS
+    (the consumer has given up or will ask again), and a consumer whose
+    port has closed is dropped after IMU_CONSUMER_MAX_ERRORS ICMP errors,
+    so readiness probes do not pile up as subscribers.
+    """
+
+    def __init__(self, engine, pi_ip, port=5004, bind='127.0.0.1', local_port=None):
+        self.engine = engine
+        try:
+            # Numeric, so it compares equal to the source address of the Pi's datagrams
+            pi_ip = socket.gethostbyname(pi_ip)
+        except OSError:
+            pass
+        self.upstream_addr = (pi_ip, port)
+        self.local_port = local_port if local_port is not None else port + DEFAULT_RELAY_OFFSET
+        self.subscribers = {}     # addr -> ICMP errors since it registered
+        self.pending = {}         # registered locally, waiting for the Pi's ACK: addr -> monotonic time
+        self.last_rx = 0.0
+        self.registered = False
+
+        self.datagrams = 0
+        self.send_errors = 0
+        self.foreign = 0          # upstream datagrams not from the Pi's IMU port (dropped)
+
+        self.upstream = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.upstream.setblocking(False)
+        self.local = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.local.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.local.bind((bind, self.local_port))
+        self.local.setblocking(False)
+        # Queue ICMP errors with the consumer address they belong to (sendto errors cannot be attributed)
+        self.error_queue = hasattr(socket, 'MSG_ERRQUEUE')
+        if self.error_queue:
+            try:
+                self.local.setsockopt(socket.IPPROTO_IP, IP_RECVERR, 1)
+            except OSError:
+                self.error_queue = False
+
+        engine.add_handler(self.upstream, selectors.EVENT_READ, lambda mask: self.on_upstream())
+        engine.add_handler(self.local, selectors.EVENT_READ, lambda mask: self.on_local())
+        engine.add_timer(1.0, self.check_upstream)
+
+    def register(self):
+        try:
+            self.upstream.sendto(REGISTER_MESSAGE, self.upstream_addr)
+        except OSError:
+            pass
+
+    def check_upstream(self):
+        """Register (again) while there are subscribers and the Pi has gone quiet"""
+        now = time.monotonic()
+        for addr, since in list(self.pending.items()):
+            if now - since > IMU_REREGISTER_SECONDS:
+                del self.pending[addr]
+        if now - self.last_rx > IMU_REREGISTER_SECONDS:
+            self.registered = False
+            if self.subscribers or self.pending:
+                self.register()
+
+    def on_upstream(self):
+        while True:
+            try:
+                data, addr = self.upstream.recvfrom(65535)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                # ICMP port unreachable from an earlier send: the Pi is not listening yet
+                self.registered = False
+                return
+            if addr != self.upstream_addr:
+                # Anyone on the LAN can reach this port: never fan out (or ACK) their datagrams
+                self.foreign += 1
+                continue
+            self.last_rx = time.monotonic()
+            if data == ACK_MESSAGE:
+                self.registered = True
+                for addr in self.pending:
+                    self.ack(addr)
+                    self.subscribers[addr] = 0
+                self.pending.clear()
+                continue
+            self.datagrams += 1
+            for addr in self.subscribers:
+                try:
+                    self.local.sendto(data, addr)
+                except OSError:
+                    self.send_errors += 1
+
+    def on_local(self):
+        # An error queue entry also wakes the selector; drain it first so it cannot spin
+        self.drain_errors()
+        while True:
+            try:
+                data, addr = self.local.recvfrom(1024)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                continue
+            if data.strip() != REGISTER_MESSAGE:
+                continue
+            if self.registered and time.monotonic() - self.last_rx < IMU_REREGISTER_SECONDS:
+                self.subscribers[addr] = 0
+                self.ack(addr)
+            else:
+                self.pending[addr] = time.monotonic()
+                self.register()
+
+    def drain_errors(self):
+        """Count queued ICMP errors per consumer and drop consumers whose port has closed"""
+        if not self.error_queue:
+            return
+        while True:
+            try:
+                _, _, _, addr = self.local.recvmsg(1, 0, socket.MSG_ERRQUEUE)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            self.pending.pop(addr, None)
+            errors = self.subscribers.get(addr)
+            if errors is None:
+                continue
+            if errors + 1 >= IMU_CONSUMER_MAX_ERRORS:
+                del self.subscribers[addr]
+            else:
+                self.subscribers[addr] = errors + 1
+
+    def ack(self, addr):
+        try:
+            self.local.sendto(ACK_MESSAGE, addr)
+        except OSError:
+            self.send_errors += 1
+
+    def stop(self):
+        for sock in (self.upstream, self.local):
+            self.engine.remove_handler(sock)
+            sock.close()
+
+    def summary(self):
+        return {
+            'name': 'IMU',
+            'port': self.upstream_addr[1],
+            'local_port': self.local_port,
+            'consumers': len(self.subscribers),
+            'datagrams': self.datagrams,
+            'registered': self.registered,
+            'send_errors': self.send_errors,
+            'foreign': self.foreign,
+        }
+
+
+class StreamRelay:
+    """
+    Relays for the streams of one device (plus its IMU) on port +
+    device.relay_offset. Pass the engine and connections of a
+    MonitorCollector to relay and monitor over the same connections, or let
+    the relay create its own engine.
+    """
+
+    def __init__(self, device, engine=None, connections=None, imu=True,
+                 bind='127.0.0.1', unix_dir=None, depth_codecs=None):
+        self.device = device
+        self.own_engine = engine is None
+        self.engine = engine or StreamEngine(connect_timeout=2.0, idle_timeout=2.0)
+        kinds = {port: kind for port, name, kind in device.tcp_streams()}
+        if connections is None:
+            connections = {port: self.engine.add_stream(device.ip, port, name, scanner_for_kind(kind))
+                           for port, name, kind in device.tcp_streams()}
+
+        self.relays = {}
+        for port, conn in connections.items():
+            depth = kinds[port] == 'depth'
+            if depth and depth_codecs:
+                # Frames are forwarded as they arrive; DepthStreamReceiver decodes any codec
+                conn.hello = negotiation_message(depth_codecs)
+            unix_path = os.path.join(unix_dir, f'oak-{device.name}-{port}.sock') if unix_dir else None
+            self.relays[port] = PortRelay(
+                self.engine, conn, LengthPrefixPoints() if depth else AnnexBPoints(),
+                DEPTH_QUEUE_BYTES if depth else VIDEO_QUEUE_BYTES, bind,
+                local_port=port + device.relay_offset, unix_path=unix_path)
+        imu_port = device.port('imu')
+        self.imu = None
+        if imu and imu_port is not None:
+            self.imu = IMURelay(self.engine, device.ip, imu_port, bind, local_port=imu_port + device.relay_offset)
+
+    def start(self):
+        if self.own_engine:
+            self.engine.start()
+
+    def stop(self):
+        if self.own_engine:
+            self.engine.stop()
+        for relay in self.relays.values():
+            relay.stop()
+        if self.imu is not None:
+            self.imu.stop()
+
+    def summary(self):
+        rows = [relay.summary() for relay in self.relays.values()]
+        if self.imu is not None:
+            rows.append(self.imu.summary())
+        return rows
+
+
+def print_summary(relays, previous, elapsed):
+    """One line per relayed stream: upstream rate, consumers, queued bytes, overflows"""
+    print(f"{'Device':<10} {'Stream':<7} {'Local':>6} {'In Mbps':>8} {'Clients':>7} {'Queued KB':>10} {'Overflows':>9}")
+    for relay in relays:
+        name = relay.device.name
+        for row in relay.summary():
+            if 'bytes_in' in row:
+                key = (name, row['port'])
+                rate = (row['bytes_in'] - previous.get(key, 0)) * 8 / elapsed / 1e6
+                previous[key] = row['bytes_in']
+                print(f"{name:<10} {row['name']:<7} {row['local_port']:>6} {rate:>8.1f} {row['consumers']:>7} "
+                      f"{row['queued'] / 1024:>10.0f} {row['overflows']:>9}")
+            else:
+                state = 'registered' if row['registered'] else 'waiting'
+                print(f"{name:<10} {row['name']:<7} {row['local_port']:>6} {row['datagrams']:>8} dgrams "
+                      f"{row['consumers']:>7} {state:>10}")
+    print("")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Relay the Pi streams to local consumers over one connection each')
+    add_device_arguments(parser, multiple=True)
+    parser.add_argument('--bind', default='127.0.0.1', help='Local listen address (default: 127.0.0.1)')
+    parser.add_argument('--unix-dir', help='Also serve each stream on DIR/oak-DEVICE-PORT.sock')
+    parser.add_argument('--depth-codec', metavar='A,B',
+                        help='Ask the Pi for compressed depth (codec names or "auto"); consumers decode it')
+    parser.add_argument('--no-imu', action='store_true', help='Do not relay IMU datagrams')
+    parser.add_argument('--interval', type=float, default=5.0, help='Seconds between status lines (default: 5)')
+
+    args = parser.parse_args()
+
+    devices = devices_from_args(args)
+    codecs = resolve_codecs(args.depth_codec) if args.depth_codec else None
+    # Every device's streams on one engine thread
+    engine = StreamEngine(connect_timeout=2.0, idle_timeout=2.0)
+    relays = []
+    try:
+        for device in devices:
+            relays.append(StreamRelay(device, engine=engine, imu=not args.no_imu, bind=args.bind,
+                                      unix_dir=args.unix_dir, depth_codecs=codecs))
+    except OSError as e:
+        print(f"❌ Cannot listen on the relay ports: {e}")
+        raise SystemExit(1)
+    engine.start()
+    for device in devices:
+        print(f"✅ Relaying {device.name} ({device.ip}) on {args.bind}: ports +{device.relay_offset}")
+    print("Ctrl+C to stop")
+
+    previous = {}
+    last = time.monotonic()
+    try:
+        while True:
+            time.sleep(args.interval)
+            now = time.monotonic()
+            print_summary(relays, previous, now - last)
+            last = now
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.stop()
+        for relay in relays:
+            relay.stop()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Stream Scanner - Zero-copy frame counters for the Pi TCP streams
+Counts H.264 access units, JPEG images and length-prefixed depth frames
+straight out of a preallocated receive buffer filled with recv_into
+"""
+
+import struct
+
+# Start code shared by every Annex B NAL unit (the 4-byte form ends with it too)
+START_CODE = b'\x00\x00\x01'
+
+# NAL unit types that open a new access unit when they precede its first slice
+# (access unit delimiter, SPS, PPS, SEI and the reserved 14-18 range)
+AU_PREFIX_NAL_TYPES = frozenset((6, 7, 8, 9, 14, 15, 16, 17, 18))
+# Coded slice of a non-IDR / IDR picture
+VCL_NAL_TYPES = frozenset((1, 5))
+
+FRAME_SIZE_PREFIX = struct.Struct('>I')
+
+
+class StreamScanner:
+    """Base scanner: owns the receive buffer and the carried-over tail"""
+
+    # Bytes that may have to survive a chunk boundary (see subclasses)
+    overlap = 0
+    # Optional tap(view): sees every received chunk before it is scanned (the view is only valid during the call)
+    tap = None
+
+    def __init__(self, chunk_size=65536):
+        self.chunk_size = chunk_size
+        self.buffer = bytearray(chunk_size + self.overlap)
+        self.view = memoryview(self.buffer)
+        self.carry = 0          # valid bytes at the front of the buffer kept from the last chunk
+        self.frame_count = 0    # frames seen since creation
+        self.byte_count = 0     # payload bytes consumed since creation
+
+    def recv_from(self, sock):
+        """Receive one chunk straight into the scan buffer, returns bytes read (0 on EOF)"""
+        nbytes = sock.recv_into(self.view[self.carry:])
+        if nbytes:
+            if self.tap is not None:
+                self.tap(self.view[self.carry:self.carry + nbytes])
+            self._consume(nbytes)
+        return nbytes
+
+    def feed(self, data):
+        """Scan bytes that were received elsewhere, returns frames found"""
+        before = self.frame_count
+        data = memoryview(data)
+        room = len(self.buffer) - self.carry
+        while data:
+            nbytes = min(room, len(data))
+            self.view[self.carry:self.carry + nbytes] = data[:nbytes]
+            self._consume(nbytes)
+            data = data[nbytes:]
+            room = len(self.buffer) - self.carry
+        return self.frame_count - before
+
+    def reset(self):
+        """Forget any partial state (e.g. after a reconnect)"""
+        self.carry = 0
+
+    def _consume(self, nbytes):
+        end = self.carry + nbytes
+        self.byte_count += nbytes
+        keep_from = self._scan(end)
+        keep = end - keep_from
+        if keep:
+            self.buffer[:keep] = self.buffer[keep_from:end]
+        self.carry = keep
+
+    def _scan(self, end):
+        """Scan buffer[0:end], returns the offset of the tail to carry into the next chunk"""
+        raise NotImplementedError
+
+
+class H264AccessUnitScanner(StreamScanner):
+    """
+    Counts H.264 access units (pictures) in an Annex B byte stream.
+
+    A new access unit starts at an AUD, at the first SPS/PPS/SEI after a
+    picture, or at a slice whose first_mb_in_slice is 0 when no such prefix
+    was seen. Counting raw start codes instead would report SPS, PPS and
+    extra slices as frames.
+    """
+
+    # A start code split across chunks needs its first 2 bytes; a complete one
+    # also needs the NAL header and first slice byte, so keep up to 4 bytes
+    overlap = 4
+
+    def __init__(self, chunk_size=65536):
+        super().__init__(chunk_size)
+        self.in_prefix = False  # AU already counted by an AUD/SPS/PPS/SEI, waiting for its slice
+
+    def reset(self):
+        super().reset()
+        self.in_prefix = False
+
+    def _scan(self, end):
+        buf = self.buffer
+        find = buf.find
+        pos = 0
+        consumed = 0
+        while True:
+            hit = find(START_CODE, pos, end)
+            if hit == -1:
+                break
+            if hit + 4 >= end:
+                # NAL header or first slice byte not received yet
+                return hit
+            self._on_nal(buf[hit + 3] & 0x1F, hit)
+            pos = consumed = hit + 3
+        # Keep the last 2 bytes in case they are the start of a split start code
+        return max(end - 2, consumed)
+
+    def _on_nal(self, nal_type, offset):
+        """Called for every NAL unit; offset is where its start code sits in the buffer"""
+        if nal_type in VCL_NAL_TYPES:
+            # first_mb_in_slice is ue(v); a leading 1 bit means it is 0
+            if self.buffer[offset + 4] & 0x80:
+                if self.in_prefix:
+                    self.in_prefix = False
+                else:
+                    self.frame_count += 1
+        elif nal_type in AU_PREFIX_NAL_TYPES and not self.in_prefix:
+            self.frame_count += 1
+            self.in_prefix = True
+
+
+class JPEGFrameScanner(StreamScanner):
+    """Counts JPEG images by their SOI marker (0xFFD8)"""
+
+    # A marker split across chunks needs its first byte
+    overlap = 1
+
+    def _scan(self, end):
+        buf = self.buffer
+        find = buf.find
+        pos = 0
+        while True:
+            hit = find(b'\xff\xd8', pos, end)
+            if hit == -1:
+                break
+            self.frame_count += 1
+            pos = hit + 2
+        return max(end - 1, pos)
+
+
+class LengthPrefixedFrameScanner(StreamScanner):
+    """
+    Counts frames of a '>I' length-prefixed stream (the raw depth stream on 5003)
+    without looking at the payload, so it only ever touches the 4-byte prefixes.
+    """
+
+    overlap = 4
+
+    def __init__(self, chunk_size=65536):
+        super().__init__(chunk_size)
+        self.remaining = 0  # payload bytes of the current frame still to skip
+
+    def reset(self):
+        super().reset()
+        self.remaining = 0
+
+    def _scan(self, end):
+        pos = 0
+        while True:
+            if self.remaining:
+                skip = min(self.remaining, end - pos)
+                self.remaining -= skip
+                pos += skip
+                if self.remaining:
+                    return end
+            if end - pos < 4:
+                return pos
+            self.remaining = FRAME_SIZE_PREFIX.unpack_from(self.buffer, pos)[0]
+            self.frame_count += 1
+            pos += 4
+
+
+def scanner_for_port(port, chunk_size=65536):
+    """Scanner matching the payload carried on a Pi stream port"""
+    return scanner_for_kind('depth' if port == 5003 else 'rgb', chunk_size)
+
+
+def scanner_for_kind(kind, chunk_size=65536):
+    """Scanner matching the payload of a stream kind (device_config.py)"""
+    if kind == 'depth':
+        return LengthPrefixedFrameScanner(chunk_size)
+    return H264AccessUnitScanner(chunk_size)
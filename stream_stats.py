@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Stream Stats - Per-stream frame arrival statistics for the stream engine
+
+Every frame arrival goes into a fixed-size ring of arrival times and a log
+histogram of inter-frame intervals, so jitter and stalls show up even when
+the per-second FPS looks fine. The engine thread is the only writer; readers
+get an immutable StreamSnapshot that is replaced by reference once per tick.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from log_histogram import LogHistogram
+
+# Published per stream once per tick; intervals in seconds over the recent window
+StreamSnapshot = namedtuple('StreamSnapshot', [
+    'name', 'active', 'frame_count', 'fps', 'avg_fps', 'max_fps',
+    'monitor_bandwidth', 'last_frame_time', 'reconnects', 'transport',
+    'interval_p50', 'interval_p99', 'interval_max', 'interval_p99_all',
+    'stalls', 'recent_stalls', 'stall_threshold',
+])
+
+
+class StreamStats:
+    """
+    Arrival ring + interval histogram + FPS history of one stream.
+
+    A stall is an inter-frame interval longer than stall_factor times the
+    recent median interval (at least min_stall seconds); the threshold is
+    refreshed with every snapshot. Frames found in the same receive chunk
+    share its arrival time, so their intervals are 0. A reconnect does not
+    restart the intervals: the gap it leaves is a stall like any other.
+    """
+
+    __slots__ = ('arrivals', 'count', 'last_arrival', 'intervals', 'stalls',
+                 'stall_factor', 'min_stall', 'stall_threshold', 'window',
+                 'fps', 'fps_count', 'window_start', 'window_frames')
+
+    def __init__(self, capacity=2048, history=10, window=10.0, stall_factor=3.0, min_stall=0.05):
+        self.arrivals = np.zeros(capacity)    # monotonic arrival times, ring
+        self.count = 0                        # frames recorded since creation
+        self.last_arrival = None              # None until the first frame
+        self.intervals = LogHistogram(min_value=1e-4, max_value=60.0)
+        self.stalls = 0
+        self.stall_factor = stall_factor
+        self.min_stall = min_stall
+        self.stall_threshold = 0.25           # until the first snapshot with recent intervals
+        self.window = window                  # seconds covered by the recent interval percentiles
+
+        self.fps = np.zeros(history)          # per-tick FPS, ring
+        self.fps_count = 0
+        self.window_start = 0.0
+        self.window_frames = 0
+
+    def reset(self, now):
+        """(Re)connect or disconnect: the FPS history starts over"""
+        self.fps_count = 0
+        self.window_start = now
+        self.window_frames = 0
+
+    def record(self, frames, now):
+        """frames arrived in a chunk received at monotonic time now"""
+        capacity = len(self.arrivals)
+        last = self.last_arrival
+        for _ in range(frames):
+            self.arrivals[self.count % capacity] = now
+            self.count += 1
+            if last is not None:
+                interval = now - last
+                self.intervals.record(interval)
+                if interval > self.stall_threshold:
+                    self.stalls += 1
+            last = now
+        self.last_arrival = last
+        self.window_frames += frames
+
+    def recent_intervals(self, now):
+        """Intervals between the frames of the last window seconds (new array)"""
+        capacity = len(self.arrivals)
+        n = min(self.count, capacity)
+        if n < 2:
+            return np.empty(0)
+        start = self.count - n
+        times = np.roll(self.arrivals, -(start % capacity))[:n] if n == capacity else self.arrivals[:n]
+        first = int(np.searchsorted(times, now - self.window))
+        return np.diff(times[max(first - 1, 0):])
+
+    def roll(self, now):
+        """End the current FPS window, returns its FPS"""
+        elapsed = now - self.window_start
+        fps = self.window_frames / elapsed if elapsed > 0 else 0.0
+        self.fps[self.fps_count % len(self.fps)] = fps
+        self.fps_count += 1
+        self.window_start = now
+        self.window_frames = 0
+        return fps
+
+    def snapshot(self, now, **fields):
+        """StreamSnapshot of the current state; fields fill in the engine's connection values"""
+        history = self.fps[:min(self.fps_count, len(self.fps))]
+        recent = self.recent_intervals(now)
+        if len(recent):
+            p50, p99 = np.percentile(recent, (50, 99))
+            interval_max = float(recent.max())
+            self.stall_threshold = max(self.min_stall, self.stall_factor * float(p50))
+            recent_stalls = int(np.count_nonzero(recent > self.stall_threshold))
+        else:
+            p50 = p99 = interval_max = 0.0
+            recent_stalls = 0
+        return StreamSnapshot(
+            frame_count=self.count,
+            fps=float(self.fps[(self.fps_count - 1) % len(self.fps)]) if self.fps_count else 0.0,
+            avg_fps=float(history.mean()) if len(history) else 0.0,
+            max_fps=float(history.max()) if len(history) else 0.0,
+            interval_p50=float(p50),
+            interval_p99=float(p99),
+            interval_max=interval_max,
+            interval_p99_all=self.intervals.percentile(99),
+            stalls=self.stalls,
+            recent_stalls=recent_stalls,
+            stall_threshold=self.stall_threshold,
+            **fields,
+        )
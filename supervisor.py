@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Supervisor - Start the PC receivers as soon as the Pi is ready, keep them running
+
+Every component waits only for its own readiness probe (TCP streams: the
+port accepts and sends its first bytes; IMU: REGISTER_IMU is answered with
+IMU_ACK), so all receivers come up in parallel the moment the Pi can serve
+them instead of after fixed sleeps. Children are tracked by PID in their own
+process group, restarted with exponential backoff when they crash, and
+stopped with SIGTERM (then SIGKILL) on exit. With several devices, each one
+adds its viewers; the IMU window and the monitor serve all of them.
+"""
+
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from device_config import CONFIG_ENV, add_device_arguments, device_arguments, devices_from_args
+from imu_protocol import register_imu
+
+# Component states
+WAITING = 'waiting'    # probing the Pi
+RUNNING = 'running'
+BACKOFF = 'backoff'    # crashed, restart scheduled
+STOPPED = 'stopped'    # exited cleanly (window closed) or supervisor stopping
+FAILED = 'failed'      # probe never passed within ready_timeout (strict mode)
+
+# A child that ran this long is considered healthy again: backoff resets
+STABLE_SECONDS = 30.0
+
+
+def probe_tcp(host, port, timeout=1.0):
+    """True once host:port accepts a connection and sends data (the stream is live)"""
+    try:
+        with socket.create_connection((host, port), timeout=timeout) as sock:
+            sock.settimeout(timeout)
+            return bool(sock.recv(1))
+    except OSError:
+        return False
+
+
+def probe_imu(host, port, timeout=1.0):
+    """True once the IMU server answers REGISTER_IMU"""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(timeout)
+        try:
+            return register_imu(sock, host, port)
+        except OSError:
+            return False
+
+
+class Component:
+    """One supervised receiver process and its readiness probe"""
+
+    def __init__(self, name, command, probe=None, restart=True):
+        self.name = name
+        self.command = command
+        self.probe = probe          # callable() -> bool, or None to start immediately
+        self.restart = restart
+
+        self.state = WAITING
+        self.process = None
+        self.started_at = None      # monotonic time of the current spawn
+        self.backoff = 0.0
+        self.next_start = 0.0
+        self.restarts = 0
+        self.last_exit = None
+
+        # Startup timings (seconds since supervisor start)
+        self.ready_time = None
+        self.spawn_time = None
+
+    @property
+    def pid(self):
+        return self.process.pid if self.process else None
+
+
+class Supervisor:
+    """Parallel readiness-gated start, PID tracking, restart with backoff"""
+
+    def __init__(self, components, ready_timeout=30.0, probe_interval=0.2,
+                 min_backoff=1.0, max_backoff=30.0, stop_timeout=3.0, strict=False):
+        self.components = components
+        self.ready_timeout = ready_timeout
+        self.probe_interval = probe_interval
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.stop_timeout = stop_timeout
+        self.strict = strict
+
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.t0 = time.monotonic()
+        self.start_threads = []
+
+    def elapsed(self):
+        return time.monotonic() - self.t0
+
+    def spawn(self, component):
+        """Start the component's process in its own process group"""
+        try:
+            process = subprocess.Popen(component.command, start_new_session=True)
+        except OSError as e:
+            print(f"❌ {component.name}: cannot start {component.command[0]}: {e}")
+            self.schedule_restart(component, time.monotonic())
+            return
+        with self.lock:
+            if self.stopping.is_set():
+                # stop() already ran: do not leave an orphan behind
+                os.killpg(process.pid, signal.SIGTERM)
+                process.wait()
+                return
+            component.process = process
+            component.started_at = time.monotonic()
+            component.state = RUNNING
+            if component.spawn_time is None:
+                component.spawn_time = self.elapsed()
+        print(f"✅ {component.name} started (PID {process.pid}) at +{self.elapsed():.2f}s")
+
+    def wait_ready(self, component, deadline=None):
+        """Probe until ready; False if deadline passed or stopping"""
+        if component.probe is None:
+            return True
+        while not self.stopping.is_set():
+            if component.probe():
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            self.stopping.wait(self.probe_interval)
+        return False
+
+    def start_component(self, component, deadline=None):
+        """Probe then spawn (runs on a per-component thread)"""
+        if not self.wait_ready(component, deadline):
+            if not self.stopping.is_set():
+                component.state = FAILED
+                print(f"❌ {component.name}: not ready after {self.ready_timeout:.0f}s")
+            return
+        if component.ready_time is None:
+            component.ready_time = self.elapsed()
+        if not self.stopping.is_set():
+            self.spawn(component)
+
+    def schedule_restart(self, component, now):
+        with self.lock:
+            component.backoff = min(self.max_backoff, max(self.min_backoff, component.backoff * 2))
+            component.next_start = now + component.backoff
+            component.state = BACKOFF
+        print(f"🔄 {component.name}: restarting in {component.backoff:.0f}s")
+
+    def start(self):
+        """Probe and start every component in parallel (returns immediately)"""
+        self.t0 = time.monotonic()
+        deadline = self.t0 + self.ready_timeout
+        self.start_threads = [threading.Thread(target=self.start_component, args=(c, deadline), daemon=True)
+                              for c in self.components]
+        for thread in self.start_threads:
+            thread.start()
+
+    def poll(self):
+        """Reap exited children and restart crashed ones whose backoff expired"""
+        now = time.monotonic()
+        for component in self.components:
+            if component.state == RUNNING:
+                code = component.process.poll()
+                if code is None:
+                    if now - component.started_at >= STABLE_SECONDS:
+                        component.backoff = 0.0
+                    continue
+                component.last_exit = code
+                component.process = None
+                if code == 0 or not component.restart:
+                    # Window closed by the user: leave it closed
+                    component.state = STOPPED
+                    print(f"⚪ {component.name} exited (code {code})")
+                else:
+                    print(f"⚠️  {component.name} crashed (code {code})")
+                    self.schedule_restart(component, now)
+            elif component.state == BACKOFF and now >= component.next_start:
+                component.restarts += 1
+                component.state = WAITING
+                # Probe again first: the crash may have been the Pi going away
+                threading.Thread(target=self.start_component, args=(component,), daemon=True).start()
+
+    def run(self):
+        """
+        Supervise until every component stopped or stop() was called; returns
+        False if strict and a component never became ready
+        """
+        reported = False
+        while not self.stopping.is_set():
+            self.poll()
+            if not reported and not any(t.is_alive() for t in self.start_threads):
+                reported = True
+                self.report()
+                if self.strict and any(c.state == FAILED for c in self.components):
+                    return False
+                print("Press Ctrl+C to stop all receivers")
+            if reported and all(c.state in (STOPPED, FAILED) for c in self.components):
+                print("All components stopped")
+                break
+            self.stopping.wait(0.2)
+        return True
+
+    def stop(self):
+        """SIGTERM every child's process group, SIGKILL whatever is left after stop_timeout"""
+        with self.lock:
+            self.stopping.set()
+            running = [c for c in self.components if c.process is not None and c.process.poll() is None]
+        for component in running:
+            try:
+                os.killpg(component.process.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + self.stop_timeout
+        for component in running:
+            try:
+                component.process.wait(max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                print(f"⚠️  {component.name} (PID {component.pid}) did not exit, killing")
+                try:
+                    os.killpg(component.process.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                component.process.wait()
+            component.state = STOPPED
+
+    def report(self):
+        """Per-component startup timings"""
+        print("")
+        print(f"{'Component':<14} {'State':<9} {'PID':>7} {'Ready':>8} {'Started':>8} {'Restarts':>8}")
+        for c in self.components:
+            ready = f"+{c.ready_time:.2f}s" if c.ready_time is not None else '-'
+            spawned = f"+{c.spawn_time:.2f}s" if c.spawn_time is not None else '-'
+            print(f"{c.name:<14} {c.state:<9} {c.pid or '-':>7} {ready:>8} {spawned:>8} {c.restarts:>8}")
+        print("")
+
+
+# Decoder caps per video stream kind
+VIDEO_CAPS = {
+    'rgb': ['videoscale', '!', 'video/x-raw,width=1280,height=720,framerate=30/1', '!'],
+    'left': ['video/x-raw,framerate=30/1', '!'],
+    'right': ['video/x-raw,framerate=30/1', '!'],
+}
+
+
+def default_components(devices, python=sys.executable, relay=False):
+    """
+    The receivers of test_quad_with_imu.sh: a viewer per video/depth stream
+    of every device, one IMU window and one monitor for all devices. With
+    relay, the monitor holds the only Pi connections and the viewers use
+    its local ports. Names get a "device:" prefix when there are several.
+    """
+    components = []
+    for device in devices:
+        prefix = f"{device.name}:" if len(devices) > 1 else ''
+        target = device.relayed() if relay else device
+        host = target.ip
+
+        for port, name, kind in target.tcp_streams():
+            if kind == 'depth':
+                command = [python, 'depth_viewer.py', '--ip', host, '--port', str(port)]
+            else:
+                command = ['gst-launch-1.0', '-v', 'tcpclientsrc', f'host={host}', f'port={port}', '!',
+                           'h264parse', '!', 'avdec_h264', 'max-threads=1', '!', 'videoconvert', '!'] + \
+                          VIDEO_CAPS[kind] + ['autovideosink', 'sync=false']
+            components.append(Component(prefix + name, command, lambda host=host, port=port: probe_tcp(host, port)))
+
+    imu_targets = [(d.relayed() if relay else d) for d in devices if d.port('imu')]
+    if imu_targets:
+        # One window for every device; it starts once any of them answers and waits for the rest itself
+        components.append(Component(
+            'IMU', [python, 'launch_imu_window.py'] + device_arguments(devices, relayed=relay),
+            lambda: any(probe_imu(d.ip, d.port('imu')) for d in imu_targets)))
+    # The monitor reconnects on its own and should see the streams come up
+    components.append(Component(
+        'Stats', [python, 'dual_interface_monitor.py'] + device_arguments(devices) + (['--relay'] if relay else [])))
+    return components
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Start and supervise the PC receivers')
+    add_device_arguments(parser, multiple=True)
+    parser.add_argument('--ready-timeout', type=float, default=30.0,
+                        help='Seconds to wait for the Pi before giving up on a component (default: 30)')
+    parser.add_argument('--strict', action='store_true', help='Exit with status 1 if any component never became ready')
+    parser.add_argument('--only', nargs='+', metavar='NAME',
+                        help='Supervise only these components (e.g. RGB Depth IMU, or rig2:RGB)')
+    parser.add_argument('--no-restart', action='store_true', help='Do not restart crashed receivers')
+    parser.add_argument('--relay', action='store_true',
+                        help='One Pi connection per stream: viewers go through the monitor\'s relay')
+
+    args = parser.parse_args()
+
+    devices = devices_from_args(args)
+    if args.config:
+        # Children select devices by name from the same file
+        os.environ[CONFIG_ENV] = os.path.abspath(args.config)
+
+    # Commands use paths relative to the repository
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    components = default_components(devices, relay=args.relay)
+    if args.only:
+        # "RGB" matches the RGB viewer of every device, "rig2:RGB" only that one
+        wanted = {name.lower() for name in args.only}
+        components = [c for c in components
+                      if c.name.lower() in wanted or c.name.split(':')[-1].lower() in wanted]
+    for component in components:
+        component.restart = not args.no_restart
+
+    supervisor = Supervisor(components, ready_timeout=args.ready_timeout, strict=args.strict)
+    signal.signal(signal.SIGTERM, lambda signum, frame: supervisor.stopping.set())
+
+    targets = ', '.join(f"{device.name} ({device.ip})" for device in devices)
+    print(f"Waiting for {targets} (up to {args.ready_timeout:.0f}s per component)...")
+    exit_code = 0
+    try:
+        supervisor.start()
+        if not supervisor.run():
+            print("❌ Some components never became ready - stopping")
+            exit_code = 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("Stopping receivers...")
+        supervisor.stop()
+    sys.exit(exit_code)
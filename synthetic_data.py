@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Synthetic Data - Deterministic stand-ins for the Pi streams
+
+H.264 access units with real SPS/PPS/slice headers (the payload is filler, so
+scanners and parsers see a valid Annex B stream but a decoder shows garbage),
+16-bit depth frames and IMU samples. Used by the Pi emulator and benchmarks.
+"""
+
+import numpy as np
+
+GRAVITY = 9.80665
+
+
+class BitWriter:
+    """MSB-first bit writer with Exp-Golomb codes, for H.264 headers"""
+
+    def __init__(self):
+        self.bits = []
+
+    def u(self, value, nbits):
+        self.bits.extend((value >> shift) & 1 for shift in range(nbits - 1, -1, -1))
+
+    def ue(self, value):
+        code = value + 1
+        self.u(0, code.bit_length() - 1)
+        self.u(code, code.bit_length())
+
+    def se(self, value):
+        self.ue(2 * value - 1 if value > 0 else -2 * value)
+
+    def rbsp_bytes(self):
+        """Bits plus rbsp_stop_one_bit and byte alignment"""
+        bits = self.bits + [1]
+        bits += [0] * (-len(bits) % 8)
+        return bytes(np.packbits(np.array(bits, dtype=np.uint8)))
+
+
+def escape_rbsp(rbsp):
+    """Insert emulation prevention bytes (00 00 0x -> 00 00 03 0x for x <= 3)"""
+    out = bytearray()
+    zeros = 0
+    for byte in rbsp:
+        if zeros >= 2 and byte <= 3:
+            out.append(3)
+            zeros = 0
+        out.append(byte)
+        zeros = zeros + 1 if byte == 0 else 0
+    return bytes(out)
+
+
+def nal_unit(nal_type, rbsp, nal_ref_idc=3):
+    """Annex B NAL unit with 4-byte start code"""
+    return b'\x00\x00\x00\x01' + bytes([(nal_ref_idc << 5) | nal_type]) + escape_rbsp(rbsp)
+
+
+def h264_sps(width=1280, height=720, profile_idc=66, level_idc=31):
+    """Baseline-profile SPS for a width x height progressive stream (cropped to size)"""
+    mb_width = (width + 15) // 16
+    mb_height = (height + 15) // 16
+    bits = BitWriter()
+    bits.u(profile_idc, 8)
+    bits.u(0xC0 if profile_idc == 66 else 0, 8)  # constraint_set0/1 for baseline
+    bits.u(level_idc, 8)
+    bits.ue(0)               # seq_parameter_set_id
+    if profile_idc in (100, 110, 122, 244, 44, 83, 86, 118, 128):
+        bits.ue(1)           # chroma_format_idc 4:2:0
+        bits.ue(0)           # bit_depth_luma_minus8
+        bits.ue(0)           # bit_depth_chroma_minus8
+        bits.u(0, 1)         # qpprime_y_zero_transform_bypass_flag
+        bits.u(0, 1)         # seq_scaling_matrix_present_flag
+    bits.ue(0)               # log2_max_frame_num_minus4
+    bits.ue(2)               # pic_order_cnt_type
+    bits.ue(1)               # max_num_ref_frames
+    bits.u(0, 1)             # gaps_in_frame_num_value_allowed_flag
+    bits.ue(mb_width - 1)    # pic_width_in_mbs_minus1
+    bits.ue(mb_height - 1)   # pic_height_in_map_units_minus1
+    bits.u(1, 1)             # frame_mbs_only_flag
+    bits.u(1, 1)             # direct_8x8_inference_flag
+    crop_right = (mb_width * 16 - width) // 2
+    crop_bottom = (mb_height * 16 - height) // 2
+    if crop_right or crop_bottom:
+        bits.u(1, 1)         # frame_cropping_flag
+        bits.ue(0)
+        bits.ue(crop_right)
+        bits.ue(0)
+        bits.ue(crop_bottom)
+    else:
+        bits.u(0, 1)
+    bits.u(0, 1)             # vui_parameters_present_flag
+    return nal_unit(7, bits.rbsp_bytes())
+
+
+def h264_pps():
+    bits = BitWriter()
+    bits.ue(0)               # pic_parameter_set_id
+    bits.ue(0)               # seq_parameter_set_id
+    bits.u(0, 1)             # entropy_coding_mode_flag (CAVLC)
+    bits.u(0, 1)             # bottom_field_pic_order_in_frame_present_flag
+    bits.ue(0)               # num_slice_groups_minus1
+    bits.ue(0)               # num_ref_idx_l0_default_active_minus1
+    bits.ue(0)               # num_ref_idx_l1_default_active_minus1
+    bits.u(0, 1)             # weighted_pred_flag
+    bits.u(0, 2)             # weighted_bipred_idc
+    bits.se(0)               # pic_init_qp_minus26
+    bits.se(0)               # pic_init_qs_minus26
+    bits.se(0)               # chroma_qp_index_offset
+    bits.u(1, 1)             # deblocking_filter_control_present_flag
+    bits.u(0, 1)             # constrained_intra_pred_flag
+    bits.u(0, 1)             # redundant_pic_cnt_present_flag
+    return nal_unit(8, bits.rbsp_bytes())
+
+
+def h264_aud(idr):
+    # primary_pic_type 0 (I only) for IDR access units, 1 (I/P) otherwise
+    bits = BitWriter()
+    bits.u(0 if idr else 1, 3)
+    return nal_unit(9, bits.rbsp_bytes(), nal_ref_idc=0)
+
+
+def h264_slice(idr, frame_num, filler):
+    """Slice NAL: real header fields up to the QP delta, then filler bytes"""
+    bits = BitWriter()
+    bits.ue(0)                          # first_mb_in_slice
+    bits.ue(7 if idr else 5)            # slice_type (all I / all P)
+    bits.ue(0)                          # pic_parameter_set_id
+    bits.u(frame_num & 0xF, 4)          # frame_num (log2_max_frame_num = 4)
+    if idr:
+        bits.ue(0)                      # idr_pic_id
+    header = bytes(np.packbits(np.array(bits.bits + [0] * (-len(bits.bits) % 8), dtype=np.uint8)))
+    return nal_unit(5 if idr else 1, header + filler)
+
+
+class SyntheticH264:
+    """
+    One GOP of access units (AUD [+ SPS + PPS] + slice), generated once and
+    cycled. I frames are iframe_ratio times the size of P frames and the
+    average matches bitrate at fps.
+    """
+
+    def __init__(self, width=1280, height=720, fps=30.0, bitrate=3000000, gop=30, iframe_ratio=5.0, seed=0):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.gop = gop
+        rng = np.random.default_rng(seed)
+
+        frame_bytes = bitrate / 8.0 / fps
+        p_size = int(frame_bytes * gop / (gop - 1 + iframe_ratio))
+        i_size = int(p_size * iframe_ratio)
+        # Filler never contains 00 bytes, so no start code or escape is needed
+        filler = rng.integers(1, 256, size=i_size, dtype=np.uint8).tobytes()
+
+        sps = h264_sps(width, height)
+        pps = h264_pps()
+        self.access_units = []
+        for n in range(gop):
+            idr = n == 0
+            parts = [h264_aud(idr)]
+            if idr:
+                parts += [sps, pps]
+            parts.append(h264_slice(idr, n, filler[:i_size if idr else p_size]))
+            self.access_units.append(b''.join(parts))
+        self.keyframes = [n == 0 for n in range(gop)]
+
+    def __len__(self):
+        return len(self.access_units)
+
+    def access_unit(self, n):
+        return self.access_units[n % self.gop]
+
+    def stream(self, num_frames):
+        """Contiguous Annex B byte stream of num_frames access units"""
+        return b''.join(self.access_unit(n) for n in range(num_frames))
+
+
+class SyntheticDepth:
+    """
+    uint16 depth in mm: a tilted floor plane with a sphere moving across it,
+    sensor noise and a few invalid (0) patches. pool_size frames are rendered
+    up front and cycled, so producing a frame costs nothing.
+    """
+
+    def __init__(self, width=1280, height=720, fps=30.0, pool_size=30, seed=0):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        rng = np.random.default_rng(seed)
+
+        y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+        plane = 800.0 + 3200.0 * (y / height)
+        noise = rng.standard_normal(size=(height, width), dtype=np.float32) * 0.002
+        self.frames = []
+        for n in range(pool_size):
+            phase = 2 * np.pi * n / pool_size
+            cx = width * (0.5 + 0.3 * np.cos(phase))
+            cy = height * (0.5 + 0.2 * np.sin(phase))
+            radius = height * 0.2
+            r2 = ((x - cx) ** 2 + (y - cy) ** 2) / radius ** 2
+            sphere = np.where(r2 < 1.0, 1200.0 - 400.0 * np.sqrt(np.clip(1.0 - r2, 0, 1)), np.inf)
+            depth = np.minimum(plane, sphere)
+            depth *= 1.0 + np.roll(noise, 37 * n, axis=1)
+            frame = depth.astype(np.uint16)
+            # Invalid stereo matches show up as zeros on the real sensor
+            for _ in range(4):
+                hx = int(rng.integers(0, width - 64))
+                hy = int(rng.integers(0, height - 64))
+                frame[hy:hy + 64, hx:hx + 64] = 0
+            self.frames.append(frame)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def frame(self, n):
+        return self.frames[n % len(self.frames)]
+
+
+class SyntheticIMU:
+    """
+    IMU samples at rate Hz: gravity seen through a slowly swaying orientation,
+    matching gyro rates, constant gyro bias and white noise. sample() is
+    vectorized over any index range, so batches cost one numpy pass.
+    """
+
+    def __init__(self, rate=200.0, accel_noise=0.02, gyro_noise=0.002,
+                 gyro_bias=(0.003, -0.002, 0.001), seed=0):
+        self.rate = rate
+        self.accel_noise = accel_noise
+        self.gyro_noise = gyro_noise
+        self.gyro_bias = np.asarray(gyro_bias, dtype=np.float64)
+        self.rng = np.random.default_rng(seed)
+
+    def samples(self, start, count):
+        """(count, 7) array for sample indices start..start+count-1 (t, ax..az, gx..gz)"""
+        t = (start + np.arange(count)) / self.rate
+        # Roll/pitch sway (rad) and their derivatives
+        roll = 0.1 * np.sin(2 * np.pi * 0.5 * t)
+        pitch = 0.05 * np.sin(2 * np.pi * 0.3 * t)
+        roll_rate = 0.1 * 2 * np.pi * 0.5 * np.cos(2 * np.pi * 0.5 * t)
+        pitch_rate = 0.05 * 2 * np.pi * 0.3 * np.cos(2 * np.pi * 0.3 * t)
+
+        out = np.empty((count, 7))
+        out[:, 0] = t
+        out[:, 1] = -GRAVITY * np.sin(pitch)
+        out[:, 2] = GRAVITY * np.sin(roll) * np.cos(pitch)
+        out[:, 3] = GRAVITY * np.cos(roll) * np.cos(pitch)
+        out[:, 4] = roll_rate
+        out[:, 5] = pitch_rate
+        out[:, 6] = 0.0
+        out[:, 1:4] += self.rng.normal(0.0, self.accel_noise, size=(count, 3))
+        out[:, 4:7] += self.gyro_bias + self.rng.normal(0.0, self.gyro_noise, size=(count, 3))
+        return out
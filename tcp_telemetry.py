@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+TCP Telemetry - Kernel transport state of a receiving TCP socket
+
+TCP_INFO gives RTT/variance, retransmits, the receive space and bytes
+received; FIONREAD (SIOCINQ) gives how many received bytes are still queued
+in the kernel waiting for the application. A queue that keeps growing means
+the consumer is falling behind and adding latency, long before frames
+visibly lag.
+
+On a socket that only receives, rtt/rttvar mostly reflect the handshake and
+the few ACKed segments we sent; rcv_rtt is the kernel's receive-side RTT
+estimate and is the better latency signal for the Pi streams.
+"""
+
+import array
+import fcntl
+import socket
+import struct
+import termios
+from collections import namedtuple
+
+import numpy as np
+
+# struct tcp_info (linux/tcp.h) up to tcpi_bytes_received:
+# 8 x u8 (state ... wscale bitfields), 24 x u32 (rto ... total_retrans),
+# 4 x u64 (pacing_rate, max_pacing_rate, bytes_acked, bytes_received)
+TCP_INFO_STRUCT = struct.Struct('=8B24I4Q')
+_U32 = 8  # tuple index of the first u32 field
+_U64 = _U32 + 24
+
+TCP_INFO_FIELDS = {
+    'state': 0,
+    'retransmits': 2,
+    'last_data_recv_ms': _U32 + 11,
+    'rcv_ssthresh': _U32 + 14,
+    'rtt_us': _U32 + 15,
+    'rttvar_us': _U32 + 16,
+    'rcv_rtt_us': _U32 + 21,
+    'rcv_space': _U32 + 22,
+    'total_retrans': _U32 + 23,
+    'bytes_received': _U64 + 3,
+}
+
+TCPInfo = namedtuple('TCPInfo', list(TCP_INFO_FIELDS))
+
+# Series columns
+COLUMNS = ('rtt_ms', 'rttvar_ms', 'rcv_rtt_ms', 'rcv_space_kb', 'total_retrans', 'bytes_received', 'queue_bytes')
+RTT_MS, RTTVAR_MS, RCV_RTT_MS, RCV_SPACE_KB, TOTAL_RETRANS, BYTES_RECEIVED, QUEUE_BYTES = range(len(COLUMNS))
+
+# Queue growth (bytes/s over the trend window) that counts as "falling behind"
+GROWING_BYTES_PER_S = 64 * 1024
+
+HAVE_TCP_INFO = hasattr(socket, 'TCP_INFO')
+
+
+def read_tcp_info(sock):
+    """TCPInfo for sock, or None where TCP_INFO is unavailable"""
+    if not HAVE_TCP_INFO:
+        return None
+    try:
+        raw = sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_INFO, TCP_INFO_STRUCT.size)
+    except OSError:
+        return None
+    if len(raw) < TCP_INFO_STRUCT.size:
+        # Older kernel: missing trailing fields read as 0
+        raw = raw.ljust(TCP_INFO_STRUCT.size, b'\0')
+    values = TCP_INFO_STRUCT.unpack(raw)
+    return TCPInfo(*(values[index] for index in TCP_INFO_FIELDS.values()))
+
+
+class TransportSeries:
+    """
+    Time series of one socket's transport state, sampled by the caller
+    (the stream engine) into a mirrored numpy ring like IMURing.
+    """
+
+    def __init__(self, capacity=240):
+        self.capacity = capacity  # 240 x 250 ms = 1 minute
+        self.times = np.zeros(2 * capacity)
+        self.data = np.zeros((2 * capacity, len(COLUMNS)))
+        self.count = 0
+        self.queue_buf = array.array('i', [0])
+
+    def receive_queue(self, sock):
+        """Bytes received by the kernel but not yet read (FIONREAD / SIOCINQ)"""
+        try:
+            fcntl.ioctl(sock.fileno(), termios.FIONREAD, self.queue_buf, True)
+        except OSError:
+            return 0
+        return self.queue_buf[0]
+
+    def sample(self, sock, now):
+        """Record TCP_INFO and the receive queue of sock at monotonic time now"""
+        info = read_tcp_info(sock)
+        row = np.empty(len(COLUMNS))
+        if info is not None:
+            row[RTT_MS] = info.rtt_us / 1000.0
+            row[RTTVAR_MS] = info.rttvar_us / 1000.0
+            row[RCV_RTT_MS] = info.rcv_rtt_us / 1000.0
+            row[RCV_SPACE_KB] = info.rcv_space / 1024.0
+            row[TOTAL_RETRANS] = info.total_retrans
+            row[BYTES_RECEIVED] = info.bytes_received
+        else:
+            row[:QUEUE_BYTES] = np.nan
+        row[QUEUE_BYTES] = self.receive_queue(sock)
+
+        pos = self.count % self.capacity
+        for base in (pos, pos + self.capacity):
+            self.times[base] = now
+            self.data[base] = row
+        self.count += 1
+
+    def clear(self):
+        """Forget the series (new connection: counters restart)"""
+        self.count = 0
+
+    def recent(self, seconds=None):
+        """(times, data) views of the newest samples covering seconds (default: all)"""
+        n = min(self.count, self.capacity)
+        start = (self.count - n) % self.capacity
+        times = self.times[start:start + n]
+        data = self.data[start:start + n]
+        if seconds is not None and n:
+            first = int(np.searchsorted(times, times[-1] - seconds, side='left'))
+            times, data = times[first:], data[first:]
+        return times, data
+
+    def summary(self, trend_seconds=10.0):
+        """Plain dict for displays, or None before the first sample"""
+        times, data = self.recent()
+        if not len(times):
+            return None
+        latest = data[-1]
+        trend_times, trend = self.recent(trend_seconds)
+        queue = trend[:, QUEUE_BYTES]
+
+        growth = 0.0
+        if len(trend_times) >= 3 and trend_times[-1] > trend_times[0]:
+            # Least-squares slope of the queue depth
+            growth = float(np.polyfit(trend_times - trend_times[0], queue, 1)[0])
+
+        span = times[-1] - times[0]
+        received = data[:, BYTES_RECEIVED]
+        goodput = (received[-1] - received[0]) * 8 / (span * 1e6) if span > 0 else 0.0
+        return {
+            'rtt_ms': float(latest[RTT_MS]),
+            'rttvar_ms': float(latest[RTTVAR_MS]),
+            'rcv_rtt_ms': float(latest[RCV_RTT_MS]),
+            'rcv_space_kb': float(latest[RCV_SPACE_KB]),
+            'retrans_window': int(np.nan_to_num(data[-1, TOTAL_RETRANS] - data[0, TOTAL_RETRANS])),
+            'total_retrans': int(np.nan_to_num(latest[TOTAL_RETRANS])),
+            'goodput_mbps': float(np.nan_to_num(goodput)),
+            'queue_bytes': int(latest[QUEUE_BYTES]),
+            'queue_max_bytes': int(queue.max()),
+            'queue_growth': growth,  # bytes/s
+            'queue_growing': growth > GROWING_BYTES_PER_S,
+            'window_seconds': float(span),
+        }